@@ -1,4 +1,5 @@
 import logging
+import os
 from typing import List
 
 from pydantic import Field, field_validator
@@ -150,6 +151,20 @@ class Settings(BaseSettings):
     # Scraper settings
     selenium_timeout: int = Field(default=30, description="Selenium timeout")
     cloudscraper_timeout: int = Field(default=30, description="CloudScraper timeout")
+    per_domain_concurrency: int = Field(default=8, description="Max concurrent scrapes per target domain")
+    max_response_bytes: int = Field(
+        default=10 * 1024 * 1024,
+        description="Maximum response body size read by scrapers, in bytes"
+    )
+    selenium_pool_size: int = Field(default=4, description="Maximum number of pooled Selenium drivers")
+    selenium_grid_url: str = Field(
+        default="",
+        description="Selenium Grid hub URL for remote drivers, e.g. http://grid:4444"
+    )
+    scraper_thread_pool_size: int = Field(
+        default=(os.cpu_count() or 1) * 5,
+        description="Worker threads shared by all scrapers for blocking calls"
+    )
 
     # Development settings
     use_in_memory_queue: bool = Field(default=True, description="Use in-memory queue")
@@ -127,8 +127,9 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         # Check for forwarded headers first
         forwarded_for = request.headers.get("x-forwarded-for")
         if forwarded_for:
-            # Take the first IP in the chain
-            return forwarded_for.split(",")[0].strip()
+            # Take the first IP in the chain without splitting the whole header
+            end = forwarded_for.find(",")
+            return (forwarded_for if end < 0 else forwarded_for[:end]).strip()
 
         real_ip = request.headers.get("x-real-ip")
         if real_ip:
@@ -19,7 +19,10 @@ from app.monitoring import (
 from app.monitoring.apm import setup_apm_instrumentation
 from app.monitoring.error_tracking import ErrorTracker
 from app.monitoring.middleware import MonitoringMiddleware
-from app.security.audit import AuditMiddleware
+from app.scrapers.base import shutdown_scraper_executor
+from app.scrapers.driver_pool import shutdown_driver_pool
+from app.scrapers.playwright_scraper import shutdown_playwright
+from app.security.audit import AuditMiddleware, shutdown_audit_logger
 # Import security components
 from app.security.headers import SecurityHeadersMiddleware
 from app.utils.proxy_manager import initialize_proxy_system, shutdown_proxy_system
@@ -59,6 +62,10 @@ async def lifespan(app: FastAPI):
     print("Shutting down cfscraper API...")
     await shutdown_proxy_system()  # Cleanup proxy system
     await shutdown_webhook_system()  # Cleanup webhook system
+    await shutdown_audit_logger()  # Write queued audit events
+    shutdown_driver_pool()  # Quit pooled browser drivers
+    await shutdown_playwright()  # Close the shared Playwright browser
+    shutdown_scraper_executor()  # Stop scraper worker threads
 
 
 app = FastAPI(
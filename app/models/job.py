@@ -18,6 +18,7 @@ class JobStatus(str, Enum):
 class ScraperType(str, Enum):
     CLOUDSCRAPER = "cloudscraper"
     SELENIUM = "selenium"
+    PLAYWRIGHT = "playwright"
 
 
 class Job(Base):
@@ -4,27 +4,58 @@ Monitoring middleware for request tracking and metrics collection
 
 import time
 import uuid
-from typing import Callable
+from typing import Optional
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import Request
+from starlette.datastructures import MutableHeaders
 
 from .logging import set_request_context, StructuredLogger
 from .metrics import record_request_metrics, update_app_uptime
 
+# User-agent prefixes mapped to a coarse client class; the raw header is not
+# logged since it can be hundreds of bytes per request
+_USER_AGENT_CLASSES = (
+    ("Mozilla/", "browser"),
+    ("curl/", "curl"),
+    ("python-requests/", "requests"),
+    ("python-httpx/", "httpx"),
+)
 
-class MonitoringMiddleware(BaseHTTPMiddleware):
-    """Middleware for monitoring requests and collecting metrics"""
+
+def classify_user_agent(user_agent: Optional[str] = None) -> str:
+    """Reduce a user-agent header to a small client class for logging"""
+    if not user_agent:
+        return "unknown"
+    for prefix, client_class in _USER_AGENT_CLASSES:
+        if user_agent.startswith(prefix):
+            return client_class
+    return "other"
+
+
+# Shared by every middleware instance in the process
+_LOGGER = StructuredLogger(__name__)
+
+
+class MonitoringMiddleware:
+    """Middleware for monitoring requests and collecting metrics
+
+    Implemented as plain ASGI middleware so exceptions are handled in a single
+    try/except instead of travelling through BaseHTTPMiddleware's task group.
+    """
 
     def __init__(self, app, start_time: float = None):
-        super().__init__(app)
+        self.app = app
         self.start_time = start_time or time.time()
-        self.logger = StructuredLogger(__name__)
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    async def __call__(self, scope, receive, send):
         """Process request with monitoring and logging"""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
         start_time = time.time()
         request_id = str(uuid.uuid4())
+        request = Request(scope)
 
         # Set request context for logging
         set_request_context(
@@ -35,63 +66,45 @@ class MonitoringMiddleware(BaseHTTPMiddleware):
         # Extract request information
         method = request.method
         url_path = request.url.path
-        user_agent = request.headers.get("user-agent", "unknown")
+        user_agent = classify_user_agent(request.headers.get("user-agent"))
         ip_address = request.client.host if request.client else "unknown"
 
         # Log request start
-        self.logger.log_request_start(
+        _LOGGER.log_request_start(
             method=method,
             url=str(request.url),
             user_agent=user_agent,
             ip_address=ip_address
         )
 
-        try:
-            # Process request
-            response = await call_next(request)
+        status_code = None
 
-            # Calculate response time
-            response_time = time.time() - start_time
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
 
-            # Record metrics
-            record_request_metrics(
-                method=method,
-                endpoint=url_path,
-                status_code=response.status_code,
-                duration=response_time
-            )
-
-            # Update app uptime
-            update_app_uptime(self.start_time)
-
-            # Log request completion
-            self.logger.log_request_end(
-                method=method,
-                url=str(request.url),
-                status_code=response.status_code,
-                response_time=response_time
-            )
-
-            # Add monitoring headers
-            response.headers["X-Request-ID"] = request_id
-            response.headers["X-Response-Time"] = f"{response_time:.3f}s"
-
-            return response
+                # Add monitoring headers
+                headers = MutableHeaders(scope=message)
+                headers["X-Request-ID"] = request_id
+                headers["X-Response-Time"] = f"{time.time() - start_time:.3f}s"
+            await send(message)
 
+        try:
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
-            # Calculate response time for failed requests
             response_time = time.time() - start_time
 
-            # Record error metrics
+            # Only a failure before the response started is recorded as a 500
             record_request_metrics(
                 method=method,
                 endpoint=url_path,
-                status_code=500,
+                status_code=status_code or 500,
                 duration=response_time
             )
 
             # Log error
-            self.logger.log_error(
+            _LOGGER.log_error(
                 error=e,
                 context={
                     "method": method,
@@ -105,39 +118,60 @@ class MonitoringMiddleware(BaseHTTPMiddleware):
             # Re-raise the exception
             raise
 
+        # Calculate response time
+        response_time = time.time() - start_time
 
-class MetricsCollectionMiddleware(BaseHTTPMiddleware):
+        # An app that returns without starting a response is served a 500 by the server
+        status_code = status_code or 500
+
+        # Record metrics
+        record_request_metrics(
+            method=method,
+            endpoint=url_path,
+            status_code=status_code,
+            duration=response_time
+        )
+
+        # Update app uptime
+        update_app_uptime(self.start_time)
+
+        # Log request completion
+        _LOGGER.log_request_end(
+            method=method,
+            url=str(request.url),
+            status_code=status_code,
+            response_time=response_time
+        )
+
+
+class MetricsCollectionMiddleware:
     """Lightweight middleware focused only on metrics collection"""
 
     def __init__(self, app):
-        super().__init__(app)
+        self.app = app
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    async def __call__(self, scope, receive, send):
         """Collect metrics for requests"""
-        start_time = time.time()
-
-        try:
-            response = await call_next(request)
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-            # Record successful request metrics
-            response_time = time.time() - start_time
-            record_request_metrics(
-                method=request.method,
-                endpoint=request.url.path,
-                status_code=response.status_code,
-                duration=response_time
-            )
+        start_time = time.time()
+        status_code = 500
 
-            return response
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
 
-        except Exception as e:
-            # Record failed request metrics
-            response_time = time.time() - start_time
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Failed requests keep the default 500 unless a response started
             record_request_metrics(
-                method=request.method,
-                endpoint=request.url.path,
-                status_code=500,
-                duration=response_time
+                method=scope["method"],
+                endpoint=scope["path"],
+                status_code=status_code,
+                duration=time.time() - start_time
             )
-
-            raise
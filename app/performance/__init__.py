@@ -24,6 +24,7 @@ from .profiling import (
     memory_profiling,
     optimize_gc_settings,
     get_memory_efficient_dict,
+    profile,
     profile_function,
     profile_async_function
 )
@@ -36,6 +37,7 @@ __all__ = [
     'memory_profiling',
     'optimize_gc_settings',
     'get_memory_efficient_dict',
+    'profile',
     'profile_function',
     'profile_async_function',
     'bottleneck_analyzer',
@@ -9,32 +9,92 @@ This module provides:
 - Bottleneck identification and documentation
 """
 
+import array
 import asyncio
 import cProfile
+import heapq
 import io
 import logging
 import pstats
+import random
+import re
+import sys
+import threading
 import time
-from collections import defaultdict
+import traceback
+from collections import defaultdict, deque
 from contextlib import contextmanager
-from dataclasses import dataclass, asdict
-from typing import Dict, Any, List
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
 
 from prometheus_client import Histogram, Counter, Gauge
 from sqlalchemy import event
 from sqlalchemy.engine import Engine
 
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+
+    HAS_PYINSTRUMENT = True
+except ImportError:
+    HAS_PYINSTRUMENT = False
+
 logger = logging.getLogger(__name__)
 
+
+class _LazyMetric:
+    """Labelled Prometheus metric that is only created and registered on first use
+
+    Profiling is off by default, so these metrics would otherwise add empty
+    families to every scrape of the default registry.
+    """
+
+    def __init__(self, metric_class, *args, **kwargs):
+        self._metric_class = metric_class
+        self._args = args
+        self._kwargs = kwargs
+        self._metric = None
+        self._lock = threading.Lock()
+
+    def labels(self, *args, **kwargs):
+        """Get the labelled child, registering the metric if needed"""
+        metric = self._metric
+        if metric is None:
+            with self._lock:
+                if self._metric is None:
+                    self._metric = self._metric_class(*self._args, **self._kwargs)
+                metric = self._metric
+        return metric.labels(*args, **kwargs)
+
+
 # Performance metrics
-endpoint_response_time = Histogram('endpoint_response_time_seconds', 'Endpoint response time', ['endpoint', 'method'])
-database_query_time = Histogram('database_query_time_seconds', 'Database query execution time', ['query_type'])
-slow_queries_total = Counter('slow_queries_total', 'Total slow database queries', ['query_type'])
-bottlenecks_detected = Counter('bottlenecks_detected_total', 'Total bottlenecks detected', ['type'])
+endpoint_response_time = _LazyMetric(Histogram, 'endpoint_response_time_seconds', 'Endpoint response time', ['endpoint', 'method'])
+database_query_time = _LazyMetric(Histogram, 'database_query_time_seconds', 'Database query execution time', ['query_type'])
+slow_queries_total = _LazyMetric(Counter, 'slow_queries_total', 'Total slow database queries', ['query_type'])
+bottlenecks_detected = _LazyMetric(Counter, 'bottlenecks_detected_total', 'Total bottlenecks detected', ['type'])
 active_profiling_sessions = Gauge('active_profiling_sessions', 'Currently active profiling sessions')
+database_query_sample_rate = Gauge('database_query_sample_rate', 'Fraction of queries recorded in query statistics')
+
+# Leading SQL keyword; only the start of the statement is scanned
+_QUERY_TYPE_RE = re.compile(r'\s*([A-Za-z]+)')
+_QUERY_TYPE_CACHE_SIZE = 256
+_query_type_cache: Dict[str, str] = {}
+
 
+def classify_query(statement: str) -> str:
+    """Return the leading SQL keyword of a statement (SELECT, INSERT, ...)"""
+    query_type = _query_type_cache.get(statement)
+    if query_type is None:
+        match = _QUERY_TYPE_RE.match(statement, 0, 64)
+        query_type = match.group(1).upper() if match else "UNKNOWN"
 
-@dataclass
+        # Statements are mostly reused compiled strings, so a small cache is enough
+        if len(_query_type_cache) >= _QUERY_TYPE_CACHE_SIZE:
+            _query_type_cache.clear()
+        _query_type_cache[statement] = query_type
+    return query_type
+
+
+@dataclass(slots=True)
 class PerformanceIssue:
     """Performance issue data structure"""
     type: str  # 'slow_query', 'high_cpu', 'memory_leak', 'slow_endpoint'
@@ -45,8 +105,20 @@ class PerformanceIssue:
     timestamp: str
     suggestions: List[str]
 
+    def as_dict(self) -> Dict[str, Any]:
+        """Shallow dict for reports; metrics and suggestions are shared, not copied"""
+        return {
+            'type': self.type,
+            'severity': self.severity,
+            'description': self.description,
+            'location': self.location,
+            'metrics': self.metrics,
+            'timestamp': self.timestamp,
+            'suggestions': self.suggestions
+        }
 
-@dataclass
+
+@dataclass(slots=True)
 class QueryProfile:
     """Database query profiling data"""
     query: str
@@ -54,17 +126,90 @@ class QueryProfile:
     rows_affected: int
     query_type: str  # SELECT, INSERT, UPDATE, DELETE
     timestamp: str
-    stack_trace: List[str]
+    stack_trace: List[tuple]  # (filename, lineno, name, line) entries, innermost last
 
+    @property
+    def formatted_stack(self) -> List[str]:
+        """Stack trace formatted like traceback.format_stack()"""
+        return traceback.format_list(self.stack_trace)
 
-class DatabaseProfiler:
-    """Database query performance profiler"""
 
-    def __init__(self, slow_query_threshold: float = 1.0):
+@dataclass(slots=True, frozen=True)
+class EndpointSample:
+    """Single endpoint request sample"""
+    execution_time: float
+    timestamp: float
+
+
+@dataclass(slots=True)
+class EndpointAgg:
+    """Running response time aggregate for one endpoint"""
+    count: int = 0
+    sum: float = 0.0
+    max: float = 0.0
+    reservoir: List[EndpointSample] = field(default_factory=list)
+
+    def add(self, execution_time: float, timestamp: float, reservoir_size: int):
+        """Fold one sample into the aggregate"""
+        self.count += 1
+        self.sum += execution_time
+        if execution_time > self.max:
+            self.max = execution_time
+
+        # Keep a uniform sample of individual requests (reservoir sampling)
+        sample = EndpointSample(execution_time, timestamp)
+        if len(self.reservoir) < reservoir_size:
+            self.reservoir.append(sample)
+        else:
+            index = random.randrange(self.count)
+            if index < reservoir_size:
+                self.reservoir[index] = sample
+
+
+class DatabaseProfiler:
+    """Database query performance profiler
+
+    Slow queries are appended as raw tuples to a per-thread buffer on the
+    database thread and turned into QueryProfile records by flush_pending(),
+    which also emits a single batched warning for everything it drained.
+    The flush runs periodically while profiling is active in an event loop,
+    whenever results are read, and on the database thread when a buffer
+    is full.
+    """
+
+    def __init__(self, slow_query_threshold: float = 1.0, buffer_size: int = 256,
+                 max_profiles: int = 1000, sample_rate: float = 1.0):
         self.slow_query_threshold = slow_query_threshold
-        self.query_profiles: List[QueryProfile] = []
-        self.query_stats = defaultdict(list)
+        self.set_sample_rate(sample_rate)
+        self._sample_credit = 0.0
+        self.query_profiles: deque = deque(maxlen=max_profiles)
+        self.query_stats: Dict[str, array.array] = defaultdict(lambda: array.array('d'))
         self.enabled = False
+        self.buffer_size = buffer_size
+        self._local = threading.local()
+        # Buffers of the threads that recorded slow queries
+        self._buffers: Dict[threading.Thread, deque] = {}
+        self._buffers_lock = threading.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._query_time_children: Dict[str, Any] = {}
+
+    def set_sample_rate(self, sample_rate: float):
+        """Set the fraction of queries recorded in the histogram and statistics
+
+        Slow queries are always recorded regardless of the sample rate.
+        """
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        database_query_sample_rate.set(self.sample_rate)
+
+    def _get_buffer(self) -> deque:
+        """Get the pending slow-query buffer of the calling thread"""
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = deque(maxlen=self.buffer_size)
+            self._local.buffer = buffer
+            with self._buffers_lock:
+                self._buffers[threading.current_thread()] = buffer
+        return buffer
 
     def enable(self):
         """Enable database profiling"""
@@ -72,7 +217,7 @@ class DatabaseProfiler:
 
         @event.listens_for(Engine, "before_cursor_execute")
         def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
-            context._query_start_time = time.time()
+            context._query_start_time = time.perf_counter_ns()
             context._query_statement = statement
 
         @event.listens_for(Engine, "after_cursor_execute")
@@ -80,40 +225,110 @@ class DatabaseProfiler:
             if not self.enabled:
                 return
 
-            execution_time = time.time() - context._query_start_time
+            execution_time = (time.perf_counter_ns() - context._query_start_time) * 1e-9
+
+            # Deterministic sampling: record one query per 1/sample_rate queries
+            self._sample_credit += self.sample_rate
+            sampled = self._sample_credit >= 1.0
+            if sampled:
+                self._sample_credit -= 1.0
+            elif execution_time <= self.slow_query_threshold:
+                return
 
             # Determine query type
-            query_type = statement.strip().split()[0].upper() if statement.strip() else "UNKNOWN"
+            query_type = classify_query(statement)
+
+            if sampled:
+                # Record metrics
+                histogram = self._query_time_children.get(query_type)
+                if histogram is None:
+                    histogram = database_query_time.labels(query_type=query_type)
+                    self._query_time_children[query_type] = histogram
+                histogram.observe(execution_time)
 
-            # Record metrics
-            database_query_time.labels(query_type=query_type).observe(execution_time)
+                # Update statistics
+                self.query_stats[query_type].append(execution_time)
 
             # Check for slow queries
             if execution_time > self.slow_query_threshold:
                 slow_queries_total.labels(query_type=query_type).inc()
 
-                # Get stack trace
-                import traceback
-                stack_trace = traceback.format_stack()
-
-                # Create query profile
-                profile = QueryProfile(
-                    query=statement[:500],  # Truncate long queries
-                    execution_time=execution_time,
-                    rows_affected=cursor.rowcount if hasattr(cursor, 'rowcount') else 0,
-                    query_type=query_type,
-                    timestamp=time.strftime('%Y-%m-%d %H:%M:%S'),
-                    stack_trace=stack_trace[-5:]  # Last 5 stack frames
-                )
-
-                self.query_profiles.append(profile)
-
-                logger.warning(
-                    f"Slow query detected: {execution_time:.3f}s - {statement[:100]}..."
-                )
-
-            # Update statistics
-            self.query_stats[query_type].append(execution_time)
+                # Capture the last 5 stack frames without formatting them
+                stack_trace = []
+                frame = sys._getframe()
+                while frame is not None and len(stack_trace) < 5:
+                    stack_trace.append((frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name, None))
+                    frame = frame.f_back
+                stack_trace.reverse()
+
+                buffer = self._get_buffer()
+                if len(buffer) == buffer.maxlen:
+                    # Flush here rather than let the oldest record drop out
+                    self.flush_pending()
+                buffer.append((
+                    statement,
+                    execution_time,
+                    cursor.rowcount if hasattr(cursor, 'rowcount') else 0,
+                    query_type,
+                    time.time(),
+                    stack_trace
+                ))
+
+    def flush_pending(self) -> int:
+        """Move buffered slow queries into query_profiles and log them"""
+        # Drained under the lock, as the database thread flushes its full buffer itself
+        pending = []
+        with self._buffers_lock:
+            for thread, buffer in list(self._buffers.items()):
+                while buffer:
+                    pending.append(buffer.popleft())
+                if not thread.is_alive():
+                    # The buffer of a finished thread is not written to anymore
+                    del self._buffers[thread]
+
+        if not pending:
+            return 0
+
+        for statement, execution_time, rows_affected, query_type, recorded_at, stack_trace in pending:
+            self.query_profiles.append(QueryProfile(
+                query=statement[:500],  # Truncate long queries
+                execution_time=execution_time,
+                rows_affected=rows_affected,
+                query_type=query_type,
+                timestamp=time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(recorded_at)),
+                stack_trace=stack_trace
+            ))
+
+        logger.warning(
+            f"{len(pending)} slow queries detected: " + "; ".join(
+                f"{execution_time:.3f}s - {statement[:100]}..."
+                for statement, execution_time, *_ in pending
+            )
+        )
+        return len(pending)
+
+    def start_flushing(self, interval: float = 5.0):
+        """Start flushing buffered slow queries periodically in the running event loop"""
+        if self._flush_task:
+            return
+
+        self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop(interval))
+
+    def stop_flushing(self):
+        """Stop the periodic flush and drain what is left"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self.flush_pending()
+
+    async def _flush_loop(self, interval: float):
+        """Slow query flush loop"""
+        while True:
+            try:
+                self.flush_pending()
+            except Exception as e:
+                logger.error(f"Error flushing slow queries: {e}")
+            await asyncio.sleep(interval)
 
     def disable(self):
         """Disable database profiling"""
@@ -121,11 +336,8 @@ class DatabaseProfiler:
 
     def get_slow_queries(self, limit: int = 10) -> List[QueryProfile]:
         """Get slowest queries"""
-        return sorted(
-            self.query_profiles,
-            key=lambda x: x.execution_time,
-            reverse=True
-        )[:limit]
+        self.flush_pending()
+        return heapq.nlargest(limit, self.query_profiles, key=lambda x: x.execution_time)
 
     def get_query_statistics(self) -> Dict[str, Dict[str, float]]:
         """Get query performance statistics"""
@@ -133,12 +345,13 @@ class DatabaseProfiler:
 
         for query_type, times in self.query_stats.items():
             if times:
+                total_time = sum(times)
                 stats[query_type] = {
                     'count': len(times),
-                    'avg_time': sum(times) / len(times),
+                    'avg_time': total_time / len(times),
                     'max_time': max(times),
                     'min_time': min(times),
-                    'total_time': sum(times)
+                    'total_time': total_time
                 }
 
         return stats
@@ -147,9 +360,10 @@ class DatabaseProfiler:
 class EndpointProfiler:
     """API endpoint performance profiler"""
 
-    def __init__(self, slow_endpoint_threshold: float = 2.0):
+    def __init__(self, slow_endpoint_threshold: float = 2.0, reservoir_size: int = 1000):
         self.slow_endpoint_threshold = slow_endpoint_threshold
-        self.endpoint_profiles = defaultdict(list)
+        self.reservoir_size = reservoir_size
+        self.endpoint_profiles: Dict[str, EndpointAgg] = defaultdict(EndpointAgg)
         self.enabled = False
 
     def profile_endpoint(self, endpoint: str, method: str = "GET"):
@@ -160,24 +374,24 @@ class EndpointProfiler:
                 if not self.enabled:
                     return await func(*args, **kwargs)
 
-                start_time = time.time()
+                start_time = time.perf_counter_ns()
                 try:
                     result = await func(*args, **kwargs)
                     return result
                 finally:
-                    execution_time = time.time() - start_time
+                    execution_time = (time.perf_counter_ns() - start_time) * 1e-9
                     self._record_endpoint_performance(endpoint, method, execution_time)
 
             def sync_wrapper(*args, **kwargs):
                 if not self.enabled:
                     return func(*args, **kwargs)
 
-                start_time = time.time()
+                start_time = time.perf_counter_ns()
                 try:
                     result = func(*args, **kwargs)
                     return result
                 finally:
-                    execution_time = time.time() - start_time
+                    execution_time = (time.perf_counter_ns() - start_time) * 1e-9
                     self._record_endpoint_performance(endpoint, method, execution_time)
 
             if asyncio.iscoroutinefunction(func):
@@ -191,10 +405,9 @@ class EndpointProfiler:
         """Record endpoint performance metrics"""
         endpoint_response_time.labels(endpoint=endpoint, method=method).observe(execution_time)
 
-        self.endpoint_profiles[f"{method} {endpoint}"].append({
-            'execution_time': execution_time,
-            'timestamp': time.time()
-        })
+        self.endpoint_profiles[f"{method} {endpoint}"].add(
+            execution_time, time.time(), self.reservoir_size
+        )
 
         if execution_time > self.slow_endpoint_threshold:
             logger.warning(
@@ -213,16 +426,13 @@ class EndpointProfiler:
         """Get slowest endpoints"""
         slow_endpoints = []
 
-        for endpoint, profiles in self.endpoint_profiles.items():
-            if profiles:
-                avg_time = sum(p['execution_time'] for p in profiles) / len(profiles)
-                max_time = max(p['execution_time'] for p in profiles)
-
+        for endpoint, agg in self.endpoint_profiles.items():
+            if agg.count:
                 slow_endpoints.append({
                     'endpoint': endpoint,
-                    'avg_time': avg_time,
-                    'max_time': max_time,
-                    'request_count': len(profiles)
+                    'avg_time': agg.sum / agg.count,
+                    'max_time': agg.max,
+                    'request_count': agg.count
                 })
 
         return sorted(slow_endpoints, key=lambda x: x['avg_time'], reverse=True)[:limit]
@@ -244,36 +454,58 @@ class BottleneckAnalyzer:
         self.endpoint_profiler.enable()
         active_profiling_sessions.inc()
 
+        try:
+            self.db_profiler.start_flushing()
+        except RuntimeError:
+            # No event loop: buffered slow queries are flushed when results are read
+            pass
+
         logger.info("Bottleneck analysis started")
 
     def stop_analysis(self):
         """Stop bottleneck analysis"""
         self.analysis_enabled = False
         self.db_profiler.disable()
+        self.db_profiler.stop_flushing()
         self.endpoint_profiler.disable()
         active_profiling_sessions.dec()
 
         logger.info("Bottleneck analysis stopped")
 
     @contextmanager
-    def profile_code_block(self, name: str):
-        """Context manager to profile a code block"""
-        start_time = time.time()
-        profiler = cProfile.Profile()
-        profiler.enable()
+    def profile_code_block(self, name: str, use_cprofile: bool = False):
+        """Context manager to profile a code block
+
+        Uses the pyinstrument sampling profiler when it is installed so the
+        overhead does not grow with the number of calls in the block; pass
+        use_cprofile=True to get a deterministic cProfile report instead.
+        """
+        start_time = time.perf_counter_ns()
+        if HAS_PYINSTRUMENT and not use_cprofile:
+            profiler = SamplingProfiler(interval=0.01, async_mode='enabled')
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
 
         try:
             yield
         finally:
-            profiler.disable()
-            execution_time = time.time() - start_time
+            if isinstance(profiler, cProfile.Profile):
+                profiler.disable()
+
+                # Generate profile report
+                s = io.StringIO()
+                ps = pstats.Stats(profiler, stream=s).sort_stats('cumulative')
+                ps.print_stats(10)
+                report = s.getvalue()
+            else:
+                profiler.stop()
+                report = profiler.output_text(unicode=True)
 
-            # Generate profile report
-            s = io.StringIO()
-            ps = pstats.Stats(profiler, stream=s).sort_stats('cumulative')
-            ps.print_stats(10)
+            execution_time = (time.perf_counter_ns() - start_time) * 1e-9
 
-            logger.info(f"Code block '{name}' profile:\n{s.getvalue()}")
+            logger.info(f"Code block '{name}' profile:\n{report}")
 
             if execution_time > 1.0:  # Slow code block threshold
                 self._add_performance_issue(
@@ -344,9 +576,12 @@ class BottleneckAnalyzer:
                 )
                 issues.append(issue)
 
-        # Update metrics
+        # Update metrics, one increment per issue type
+        issue_counts = defaultdict(int)
         for issue in issues:
-            bottlenecks_detected.labels(type=issue.type).inc()
+            issue_counts[issue.type] += 1
+        for issue_type, count in issue_counts.items():
+            bottlenecks_detected.labels(type=issue_type).inc(count)
 
         self.performance_issues.extend(issues)
         return issues
@@ -371,11 +606,10 @@ class BottleneckAnalyzer:
         """Generate comprehensive performance report"""
         issues = self.analyze_performance_issues()
 
-        # Categorize issues by severity
-        critical_issues = [i for i in issues if i.severity == "critical"]
-        high_issues = [i for i in issues if i.severity == "high"]
-        medium_issues = [i for i in issues if i.severity == "medium"]
-        low_issues = [i for i in issues if i.severity == "low"]
+        # Count issues by severity in a single pass
+        severity_counts = defaultdict(int)
+        for issue in issues:
+            severity_counts[issue.severity] += 1
 
         # Get database statistics
         db_stats = self.db_profiler.get_query_statistics()
@@ -387,12 +621,12 @@ class BottleneckAnalyzer:
             "timestamp": time.strftime('%Y-%m-%d %H:%M:%S'),
             "summary": {
                 "total_issues": len(issues),
-                "critical_issues": len(critical_issues),
-                "high_issues": len(high_issues),
-                "medium_issues": len(medium_issues),
-                "low_issues": len(low_issues)
+                "critical_issues": severity_counts["critical"],
+                "high_issues": severity_counts["high"],
+                "medium_issues": severity_counts["medium"],
+                "low_issues": severity_counts["low"]
             },
-            "issues": [asdict(issue) for issue in issues],
+            "issues": [issue.as_dict() for issue in issues],
             "database_performance": db_stats,
             "endpoint_performance": endpoint_stats,
             "recommendations": self._generate_recommendations(issues)
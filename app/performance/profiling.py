@@ -12,6 +12,7 @@ This module provides:
 import asyncio
 import gc
 import logging
+import os
 import sys
 import time
 import weakref
@@ -22,6 +23,8 @@ from typing import Dict, Any, Optional, Generator, Iterator, List
 import psutil
 from prometheus_client import Gauge, Counter, Histogram
 
+from app.utils.serialization import dumps_json
+
 logger = logging.getLogger(__name__)
 
 # Memory metrics
@@ -32,7 +35,17 @@ gc_duration = Histogram('gc_duration_seconds', 'Garbage collection duration')
 memory_allocations = Counter('memory_allocations_total', 'Total memory allocations', ['size_category'])
 
 
-@dataclass
+# Allocation size buckets: < 1 KiB, < 1 MiB, larger
+_SIZE_CATEGORIES = ("small", "medium", "large")
+
+
+def _size_category_index(size: int) -> int:
+    """Map a byte size to an index into _SIZE_CATEGORIES without branching"""
+    # bit_length() - 1 is floor(log2(size)); each bucket spans 10 powers of two
+    return min(((size | 1).bit_length() - 1) // 10, 2)
+
+
+@dataclass(slots=True)
 class MemoryStats:
     """Memory usage statistics"""
     rss: int  # Resident Set Size
@@ -44,52 +57,85 @@ class MemoryStats:
     @classmethod
     def current(cls) -> 'MemoryStats':
         """Get current memory statistics"""
-        process = psutil.Process()
-        memory_info = process.memory_info()
-        memory_percent = process.memory_percent()
-        virtual_memory = psutil.virtual_memory()
+        memory_info = _get_process().memory_info()
+        virtual_memory = _get_virtual_memory()
 
         return cls(
             rss=memory_info.rss,
             vms=memory_info.vms,
-            percent=memory_percent,
+            percent=memory_info.rss / virtual_memory.total * 100,
             available=virtual_memory.available,
             total=virtual_memory.total
         )
 
 
+# Cached process handle and system memory snapshot used by MemoryStats
+_process: Optional[psutil.Process] = None
+_virtual_memory = None
+_virtual_memory_expires = 0.0
+_VIRTUAL_MEMORY_TTL = 1.0
+
+
+def _get_process() -> psutil.Process:
+    """Get the psutil handle for this process, recreating it after a fork"""
+    global _process
+    if _process is None or _process.pid != os.getpid():
+        _process = psutil.Process()
+    return _process
+
+
+def _get_virtual_memory():
+    """Get system memory statistics, cached for _VIRTUAL_MEMORY_TTL seconds"""
+    global _virtual_memory, _virtual_memory_expires
+    now = time.monotonic()
+    if _virtual_memory is None or now >= _virtual_memory_expires:
+        _virtual_memory = psutil.virtual_memory()
+        _virtual_memory_expires = now + _VIRTUAL_MEMORY_TTL
+    return _virtual_memory
+
+
 class MemoryProfiler:
     """Memory profiler for detecting leaks and monitoring usage"""
 
     def __init__(self):
-        self.tracked_objects: Dict[str, weakref.WeakSet] = {}
+        # category -> [alive, created]
+        self.tracked_counts: Dict[str, List[int]] = {}
         self.baseline_stats: Optional[MemoryStats] = None
         self.monitoring_enabled = True
         self._monitoring_task: Optional[asyncio.Task] = None
 
+        # Pre-resolved metric children for the allocation fast path,
+        # indexed by _size_category_index()
+        self._alloc = tuple(
+            memory_allocations.labels(size_category=category)
+            for category in _SIZE_CATEGORIES
+        )
+        self._usage_rss = memory_usage_bytes.labels(type='rss')
+        self._usage_vms = memory_usage_bytes.labels(type='vms')
+        self._usage_available = memory_usage_bytes.labels(type='available')
+
     def track_object(self, obj: Any, category: str = "general"):
         """Track an object for memory leak detection"""
-        if category not in self.tracked_objects:
-            self.tracked_objects[category] = weakref.WeakSet()
+        counts = self.tracked_counts.get(category)
+        if counts is None:
+            counts = self.tracked_counts[category] = [0, 0]
+        counts[0] += 1
+        counts[1] += 1
 
-        self.tracked_objects[category].add(obj)
+        # Decrement the live count when the object is collected
+        weakref.finalize(obj, self._untrack, category)
 
         # Categorize allocation size
-        size = sys.getsizeof(obj)
-        if size < 1024:
-            size_category = "small"
-        elif size < 1024 * 1024:
-            size_category = "medium"
-        else:
-            size_category = "large"
+        self._alloc[_size_category_index(sys.getsizeof(obj))].inc()
 
-        memory_allocations.labels(size_category=size_category).inc()
+    def _untrack(self, category: str):
+        """Finalizer callback for a collected tracked object"""
+        self.tracked_counts[category][0] -= 1
 
     def get_tracked_count(self, category: str) -> int:
-        """Get count of tracked objects in a category"""
-        if category not in self.tracked_objects:
-            return 0
-        return len(self.tracked_objects[category])
+        """Get count of live tracked objects in a category"""
+        counts = self.tracked_counts.get(category)
+        return counts[0] if counts else 0
 
     def set_baseline(self):
         """Set memory baseline for leak detection"""
@@ -103,7 +149,7 @@ class MemoryProfiler:
         leak_info = {
             'current_memory': current_stats,
             'baseline_memory': self.baseline_stats,
-            'tracked_objects': {cat: len(objs) for cat, objs in self.tracked_objects.items()},
+            'tracked_objects': {cat: counts[0] for cat, counts in self.tracked_counts.items()},
             'potential_leaks': []
         }
 
@@ -120,8 +166,8 @@ class MemoryProfiler:
                 memory_leaks_detected.inc()
 
         # Check for object count growth
-        for category, objects in self.tracked_objects.items():
-            count = len(objects)
+        for category, counts in self.tracked_counts.items():
+            count = counts[0]
             if count > 10000:  # Arbitrary threshold
                 leak_info['potential_leaks'].append({
                     'type': 'object_count',
@@ -134,19 +180,18 @@ class MemoryProfiler:
 
     def force_gc(self) -> Dict[str, int]:
         """Force garbage collection and return statistics"""
-        start_time = time.time()
+        start_time = time.perf_counter_ns()
 
         # Collect statistics before GC
         before_stats = MemoryStats.current()
 
-        # Force garbage collection for all generations
-        collected = {}
-        for generation in range(3):
-            collected[f'gen_{generation}'] = gc.collect(generation)
-            gc_collections.labels(generation=str(generation)).inc()
+        # A full collection also collects the younger generations, so a
+        # single gc.collect(2) covers all three
+        collected = {'gen_0': 0, 'gen_1': 0, 'gen_2': gc.collect(2)}
+        gc_collections.labels(generation='2').inc()
 
         # Record GC duration
-        duration = time.time() - start_time
+        duration = (time.perf_counter_ns() - start_time) * 1e-9
         gc_duration.observe(duration)
 
         # Get statistics after GC
@@ -163,12 +208,14 @@ class MemoryProfiler:
             'after_rss_mb': after_stats.rss / 1024 / 1024
         }
 
-    async def start_monitoring(self, interval: int = 60):
+    async def start_monitoring(self, interval: int = 60, leak_check_interval: int = 600):
         """Start continuous memory monitoring"""
         if self._monitoring_task:
             return
 
-        self._monitoring_task = asyncio.create_task(self._monitoring_loop(interval))
+        self._monitoring_task = asyncio.create_task(
+            self._monitoring_loop(interval, leak_check_interval)
+        )
         logger.info(f"Memory monitoring started with {interval}s interval")
 
     async def stop_monitoring(self):
@@ -182,16 +229,19 @@ class MemoryProfiler:
             self._monitoring_task = None
             logger.info("Memory monitoring stopped")
 
-    async def _monitoring_loop(self, interval: int):
+    async def _monitoring_loop(self, interval: int, leak_check_interval: int):
         """Memory monitoring loop"""
+        # Leak checks run on their own clock so a short interval stays cheap
+        next_leak_check = time.monotonic() + leak_check_interval
+
         while self.monitoring_enabled:
             try:
                 stats = MemoryStats.current()
 
                 # Update metrics
-                memory_usage_bytes.labels(type='rss').set(stats.rss)
-                memory_usage_bytes.labels(type='vms').set(stats.vms)
-                memory_usage_bytes.labels(type='available').set(stats.available)
+                self._usage_rss.set(stats.rss)
+                self._usage_vms.set(stats.vms)
+                self._usage_available.set(stats.available)
 
                 # Check for high memory usage
                 if stats.percent > 80:
@@ -203,12 +253,8 @@ class MemoryProfiler:
                         self.force_gc()
 
                 # Check for leaks periodically
-                if hasattr(self, '_leak_check_counter'):
-                    self._leak_check_counter += 1
-                else:
-                    self._leak_check_counter = 1
-
-                if self._leak_check_counter % 10 == 0:  # Every 10 intervals
+                if time.monotonic() >= next_leak_check:
+                    next_leak_check += leak_check_interval
                     leak_info = self.check_for_leaks()
                     if leak_info['potential_leaks']:
                         logger.warning(f"Potential memory leaks detected: {leak_info['potential_leaks']}")
@@ -226,32 +272,32 @@ class StreamingProcessor:
     def __init__(self, chunk_size: int = 8192):
         self.chunk_size = chunk_size
 
-    def stream_json_array(self, data: List[Dict[str, Any]]) -> Generator[str, None, None]:
-        """Stream JSON array in chunks to reduce memory usage"""
-        yield "["
+    def stream_json_array(self, data: List[Dict[str, Any]]) -> Generator[bytes, None, None]:
+        """Stream a JSON array as byte chunks of roughly chunk_size bytes"""
+        buffer = bytearray(b"[")
 
         for i, item in enumerate(data):
             if i > 0:
-                yield ","
-
-            # Convert item to JSON string
-            import json
-            yield json.dumps(item)
+                buffer += b","
+            buffer += dumps_json(item)
 
-            # Yield control periodically to prevent blocking
-            if i % 100 == 0:
-                yield ""
+            if len(buffer) >= self.chunk_size:
+                yield bytes(buffer)
+                buffer.clear()
 
-        yield "]"
+        buffer += b"]"
+        yield bytes(buffer)
 
     def stream_csv_data(self, data: Iterator[Dict[str, Any]], headers: List[str]) -> Generator[str, None, None]:
         """Stream CSV data in chunks"""
         import csv
         import io
 
-        # Yield headers
+        # One buffer and writer are reused for the whole stream
         output = io.StringIO()
         writer = csv.DictWriter(output, fieldnames=headers)
+
+        # Yield headers
         writer.writeheader()
         yield output.getvalue()
 
@@ -261,16 +307,16 @@ class StreamingProcessor:
             chunk.append(item)
 
             if len(chunk) >= self.chunk_size:
-                output = io.StringIO()
-                writer = csv.DictWriter(output, fieldnames=headers)
+                output.seek(0)
+                output.truncate()
                 writer.writerows(chunk)
                 yield output.getvalue()
                 chunk = []
 
         # Yield remaining data
         if chunk:
-            output = io.StringIO()
-            writer = csv.DictWriter(output, fieldnames=headers)
+            output.seek(0)
+            output.truncate()
             writer.writerows(chunk)
             yield output.getvalue()
 
@@ -340,62 +386,101 @@ def get_memory_efficient_dict() -> Dict[str, Any]:
 
 # Performance profiling decorators and utilities
 import cProfile
-import pstats
+import inspect
 import io
+import pstats
+import random
 from functools import wraps
 
+try:
+    from pyinstrument import Profiler as SamplingProfiler
 
-def profile_function(sort_by='cumulative', lines_to_print=20):
-    """Decorator to profile a function's performance"""
+    HAS_PYINSTRUMENT = True
+except ImportError:
+    HAS_PYINSTRUMENT = False
 
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            profiler = cProfile.Profile()
-            profiler.enable()
 
-            try:
-                result = func(*args, **kwargs)
-            finally:
-                profiler.disable()
+def _start_profiler():
+    """Start a sampling profiler, or cProfile when pyinstrument is missing"""
+    if HAS_PYINSTRUMENT:
+        profiler = SamplingProfiler(interval=0.001)
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    return profiler
 
-                # Generate profile report
-                s = io.StringIO()
-                ps = pstats.Stats(profiler, stream=s).sort_stats(sort_by)
-                ps.print_stats(lines_to_print)
 
-                logger.info(f"Profile for {func.__name__}:\n{s.getvalue()}")
+def _log_profile(profiler, name: str, sort_by: str, lines_to_print: int):
+    """Stop a profiler started by _start_profiler and log its report"""
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
 
-            return result
+        # Generate profile report
+        s = io.StringIO()
+        ps = pstats.Stats(profiler, stream=s).sort_stats(sort_by)
+        ps.print_stats(lines_to_print)
+        report = s.getvalue()
+    else:
+        profiler.stop()
+        report = profiler.output_text(unicode=True)
 
-        return wrapper
+    logger.info(f"Profile for {name}:\n{report}")
 
-    return decorator
 
+def profile(func=None, *, sample_rate: float = 0.01, sort_by: str = 'cumulative', lines_to_print: int = 20):
+    """
+    Decorator to profile a sampled fraction of calls to a sync or async function
 
-def profile_async_function(sort_by='cumulative', lines_to_print=20):
-    """Decorator to profile an async function's performance"""
+    Calls that are not sampled go straight to the wrapped function. Can be
+    used bare (@profile) or with arguments (@profile(sample_rate=1.0)).
+
+    Args:
+        func: Function to wrap when used without arguments
+        sample_rate: Fraction of calls to profile (0-1)
+        sort_by: pstats sort key, used with the cProfile fallback
+        lines_to_print: Number of pstats lines, used with the cProfile fallback
+    """
 
     def decorator(func):
+        # Pick the wrapper once at decoration time
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if random.random() >= sample_rate:
+                    return await func(*args, **kwargs)
+
+                profiler = _start_profiler()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    _log_profile(profiler, func.__name__, sort_by, lines_to_print)
+
+            return async_wrapper
+
         @wraps(func)
-        async def wrapper(*args, **kwargs):
-            profiler = cProfile.Profile()
-            profiler.enable()
+        def wrapper(*args, **kwargs):
+            if random.random() >= sample_rate:
+                return func(*args, **kwargs)
 
+            profiler = _start_profiler()
             try:
-                result = await func(*args, **kwargs)
+                return func(*args, **kwargs)
             finally:
-                profiler.disable()
+                _log_profile(profiler, func.__name__, sort_by, lines_to_print)
+
+        return wrapper
 
-                # Generate profile report
-                s = io.StringIO()
-                ps = pstats.Stats(profiler, stream=s).sort_stats(sort_by)
-                ps.print_stats(lines_to_print)
+    if func is not None:
+        return decorator(func)
+    return decorator
 
-                logger.info(f"Profile for {func.__name__}:\n{s.getvalue()}")
 
-            return result
+def profile_function(sort_by='cumulative', lines_to_print=20):
+    """Decorator to profile every call of a function"""
+    return profile(sample_rate=1.0, sort_by=sort_by, lines_to_print=lines_to_print)
 
-        return wrapper
 
-    return decorator
+def profile_async_function(sort_by='cumulative', lines_to_print=20):
+    """Decorator to profile every call of an async function"""
+    return profile(sample_rate=1.0, sort_by=sort_by, lines_to_print=lines_to_print)
@@ -1,31 +1,149 @@
+import asyncio
+import hashlib
 import logging
 import time
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Awaitable, Callable, Mapping, Optional, Set, Tuple, Union
+from urllib.parse import urlencode, urlsplit, urlunsplit
+
+from app.core.config import settings
+from app.utils.serialization import dumps_json
 
 logger = logging.getLogger(__name__)
 
+# Thread pool shared by all scrapers for their blocking calls
+_scraper_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_scraper_executor() -> ThreadPoolExecutor:
+    """Get the shared scraper thread pool, creating it on first use"""
+    global _scraper_executor
+    if _scraper_executor is None:
+        _scraper_executor = ThreadPoolExecutor(
+            max_workers=settings.scraper_thread_pool_size,
+            thread_name_prefix="scraper"
+        )
+    return _scraper_executor
+
+
+def shutdown_scraper_executor():
+    """Shut down the shared scraper thread pool"""
+    global _scraper_executor
+    if _scraper_executor is not None:
+        _scraper_executor.shutdown(wait=False, cancel_futures=True)
+        _scraper_executor = None
+
+
+def build_url(url: str, params: Optional[Mapping[str, Any]] = None) -> str:
+    """Append URL-encoded query parameters to a URL, keeping any existing query"""
+    if not params:
+        return url
+    parts = urlsplit(url)
+    query = urlencode(params, doseq=True)
+    return urlunsplit(parts._replace(query=f"{parts.query}&{query}" if parts.query else query))
+
+
+# Recently seen large response bodies, so identical pages (challenge or error pages,
+# boilerplate) share one object. Bodies must be strongly held: str and bytes do not
+# support weak references
+_BODY_INTERN: "OrderedDict[Tuple[type, bytes], Union[str, bytes]]" = OrderedDict()
+_BODY_INTERN_MIN_LENGTH = 4096
+_BODY_INTERN_MAX_BYTES = 16 * 1024 * 1024
+_body_intern_bytes = 0
+
+
+def _intern_body(body: Union[str, bytes]) -> Union[str, bytes]:
+    """Return a previously seen body equal to this one, or remember this one"""
+    global _body_intern_bytes
+    size = len(body)
+    if size < _BODY_INTERN_MIN_LENGTH or size > _BODY_INTERN_MAX_BYTES:
+        return body
+
+    data = body.encode('utf-8', 'surrogatepass') if isinstance(body, str) else body
+    key = (type(body), hashlib.blake2b(data, digest_size=16).digest())
+    interned = _BODY_INTERN.get(key)
+    if interned is not None:
+        _BODY_INTERN.move_to_end(key)
+        return interned
+
+    _BODY_INTERN[key] = body
+    _body_intern_bytes += size
+    while _body_intern_bytes > _BODY_INTERN_MAX_BYTES:
+        _, evicted = _BODY_INTERN.popitem(last=False)
+        _body_intern_bytes -= len(evicted)
+    return body
+
+
+# Keys of ScraperResult.to_dict(), shared by every serialized result
+_KEY_STATUS_CODE = "status_code"
+_KEY_CONTENT = "content"
+_KEY_HEADERS = "headers"
+_KEY_RESPONSE_TIME = "response_time"
+_KEY_ERROR = "error"
+_KEY_TIMESTAMP = "timestamp"
+_KEY_SUCCESS = "success"
+_KEY_METADATA = "metadata"
+
 
 class ScraperResult:
     """Container for scraper results"""
 
+    __slots__ = (
+        "status_code", "_content", "_encoding", "headers", "response_time",
+        "error", "metadata", "_ts_ns", "_timestamp", "_timestamp_iso"
+    )
+
     def __init__(
             self,
             status_code: int,
-            content: str,
-            headers: Dict[str, str],
+            content: Union[str, bytes],
+            headers: Mapping[str, str],
             response_time: float,
             error: Optional[str] = None,
-            metadata: Optional[Dict[str, Any]] = None
+            metadata: Optional[Dict[str, Any]] = None,
+            encoding: Optional[str] = None
     ):
         self.status_code = status_code
-        self.content = content
+        # Raw bytes are kept as-is and only decoded when the content is read
+        self._content = _intern_body(content)
+        self._encoding = encoding
         self.headers = headers
         self.response_time = response_time
         self.error = error
         self.metadata = metadata or {}
-        self.timestamp = datetime.now()
+        # The datetime is only built when the timestamp is read
+        self._ts_ns = time.time_ns()
+        self._timestamp: Optional[datetime] = None
+        self._timestamp_iso: Optional[str] = None
+
+    @property
+    def timestamp(self) -> datetime:
+        """Time the result was created"""
+        if self._timestamp is None:
+            self._timestamp = datetime.fromtimestamp(self._ts_ns / 1e9)
+        return self._timestamp
+
+    @property
+    def timestamp_iso(self) -> str:
+        """Creation time in ISO 8601 format, formatted once"""
+        if self._timestamp_iso is None:
+            self._timestamp_iso = self.timestamp.isoformat()
+        return self._timestamp_iso
+
+    @property
+    def content(self) -> str:
+        """Response body, decoded on first access"""
+        content = self._content
+        if isinstance(content, bytes):
+            try:
+                content = content.decode(self._encoding or 'utf-8', errors='replace')
+            except LookupError:
+                content = content.decode('utf-8', errors='replace')
+            content = self._content = _intern_body(content)
+        return content
 
     def is_success(self) -> bool:
         """Check if the scraping was successful"""
@@ -34,25 +152,50 @@ class ScraperResult:
     def to_dict(self) -> Dict[str, Any]:
         """Convert result to dictionary"""
         result = {
-            "status_code": self.status_code,
-            "content": self.content,
-            "headers": self.headers,
-            "response_time": self.response_time,
-            "error": self.error,
-            "timestamp": self.timestamp.isoformat(),
-            "success": self.is_success()
+            _KEY_STATUS_CODE: self.status_code,
+            _KEY_CONTENT: self.content,
+            _KEY_HEADERS: dict(self.headers),
+            _KEY_RESPONSE_TIME: self.response_time,
+            _KEY_ERROR: self.error,
+            _KEY_TIMESTAMP: self.timestamp_iso,
+            _KEY_SUCCESS: self.status_code == 200 and self.error is None
         }
         if self.metadata:
-            result["metadata"] = self.metadata
+            result[_KEY_METADATA] = self.metadata
         return result
 
+    def to_json(self) -> bytes:
+        """Serialize the result to JSON bytes"""
+        return dumps_json(self.to_dict(), default=str)
+
 
 class BaseScraper(ABC):
     """Abstract base class for all scrapers"""
 
+    # Validators of cacheable GET responses shared by all scrapers, in LRU order:
+    # cache key -> (etag, last_modified, result, body size). Bounded by entry count
+    # and by the total size of the cached bodies
+    _response_cache: "OrderedDict[str, Tuple[Optional[str], Optional[str], ScraperResult, int]]" = OrderedDict()
+    _response_cache_size = 256
+    _response_cache_max_bytes = 64 * 1024 * 1024
+    _response_cache_bytes = 0
+
+    # Attributes that change what a scrape returns; only scrapers of the same type
+    # with equal values share an in-flight request
+    _SETTINGS_ATTRS: Tuple[str, ...] = ("timeout",)
+
+    # Concurrency limit per target domain, and identical GETs currently in flight
+    # as [fetch task, number of requests waiting for it]. A domain's semaphore is
+    # dropped once no scrape holds or waits for it
+    _domain_semaphores: Dict[str, asyncio.Semaphore] = {}
+    _domain_users: Dict[str, int] = {}
+    _inflight: Dict[tuple, list] = {}
+
     def __init__(self, timeout: int = 30):
         self.timeout = timeout
         self.logger = logging.getLogger(self.__class__.__name__)
+        # Bookkeeping tasks (e.g. proxy reports) that run after the result is returned
+        self._background_tasks: Set[asyncio.Task] = set()
 
     @abstractmethod
     async def scrape(
@@ -83,9 +226,163 @@ class BaseScraper(ABC):
         """Clean up resources"""
         pass
 
-    def _measure_time(self, start_time: float) -> float:
-        """Calculate response time in milliseconds"""
-        return round((time.time() - start_time) * 1000, 2)
+    async def _run_scrape(
+            self,
+            url: str,
+            method: str,
+            headers: Optional[Dict[str, str]],
+            data: Optional[Dict[str, Any]],
+            params: Optional[Dict[str, str]],
+            fetch: Callable[[], Awaitable[ScraperResult]]
+    ) -> ScraperResult:
+        """
+        Run a scrape under the per-domain concurrency limit
+
+        Identical GET requests made while one is already in flight, by a scraper
+        of the same type and settings, wait for and share its result instead of
+        hitting the site again.
+
+        Args:
+            url: The URL to scrape
+            method: HTTP method
+            headers: Request headers
+            data: Request body data
+            params: Query parameters
+            fetch: Callable performing the actual scrape
+
+        Returns:
+            ScraperResult object containing the response
+        """
+        if method.upper() != 'GET' or data:
+            return await self._fetch_limited(url, fetch)
+
+        key = (
+            type(self),
+            tuple(getattr(self, attr) for attr in self._SETTINGS_ATTRS),
+            self._cache_key(url, params),
+            tuple(sorted(headers.items())) if headers else ()
+        )
+        entry = self._inflight.get(key)
+        if entry is None:
+            # The fetch runs as its own task, so cancelling one of the requests
+            # sharing it does not cancel the others
+            task = asyncio.ensure_future(self._fetch_limited(url, fetch))
+            entry = self._inflight[key] = [task, 0]
+            task.add_done_callback(lambda done: self._on_inflight_done(key, entry, done))
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            if not entry[1] and not task.done():
+                # Nobody is waiting for the result anymore
+                task.cancel()
+
+    def _on_inflight_done(self, key: tuple, entry: list, task: asyncio.Task):
+        """Forget a finished shared fetch"""
+        if self._inflight.get(key) is entry:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved when every request had stopped waiting
+            task.exception()
+
+    async def _fetch_limited(self, url: str, fetch: Callable[[], Awaitable[ScraperResult]]) -> ScraperResult:
+        """Run a fetch under the concurrency limit of the URL's domain"""
+        domain = urlsplit(url).netloc
+        semaphore = self._domain_semaphores.get(domain)
+        if semaphore is None:
+            semaphore = self._domain_semaphores[domain] = asyncio.Semaphore(settings.per_domain_concurrency)
+        self._domain_users[domain] = self._domain_users.get(domain, 0) + 1
+
+        try:
+            async with semaphore:
+                return await fetch()
+        finally:
+            users = self._domain_users.pop(domain) - 1
+            if users:
+                self._domain_users[domain] = users
+            else:
+                del self._domain_semaphores[domain]
+
+    def _run_in_background(self, coro: Awaitable[Any]):
+        """Run bookkeeping without delaying the scrape result"""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._on_background_done)
+
+    def _on_background_done(self, task: asyncio.Task):
+        """Forget a finished background task and log its failure"""
+        self._background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.warning(f"Background task failed: {str(task.exception())}")
+
+    async def _drain_background_tasks(self):
+        """Wait for pending bookkeeping tasks to finish"""
+        if self._background_tasks:
+            await asyncio.gather(*self._background_tasks, return_exceptions=True)
+
+    def _measure_time(self, start_ns: int) -> float:
+        """Calculate response time in milliseconds from a time.monotonic_ns() start"""
+        return (time.monotonic_ns() - start_ns) / 1e6
+
+    @staticmethod
+    def _cache_key(url: str, params: Optional[Dict[str, str]] = None) -> str:
+        """Build the response cache key for a GET request"""
+        return build_url(url, params)
+
+    def _add_validators(self, cache_key: str, headers: Optional[Dict[str, str]]) -> Optional[Dict[str, str]]:
+        """Add If-None-Match / If-Modified-Since headers for a previously cached response"""
+        entry = self._response_cache.get(cache_key)
+        if entry is None:
+            return headers
+
+        etag, last_modified, _, _ = entry
+        headers = dict(headers) if headers else {}
+        if etag:
+            headers.setdefault('If-None-Match', etag)
+        if last_modified:
+            headers.setdefault('If-Modified-Since', last_modified)
+        return headers
+
+    def _revalidated_result(self, cache_key: str, response_time: float) -> Optional[ScraperResult]:
+        """Return a fresh copy of the cached result after a 304 Not Modified response"""
+        entry = self._response_cache.get(cache_key)
+        if entry is None:
+            return None
+
+        self._response_cache.move_to_end(cache_key)
+        cached = entry[2]
+        return ScraperResult(
+            status_code=cached.status_code,
+            content=cached.content,
+            headers=cached.headers,
+            response_time=response_time,
+            metadata={**cached.metadata, "not_modified": True}
+        )
+
+    def _cache_response(self, cache_key: str, response_headers: Mapping[str, str], result: ScraperResult):
+        """Store a successful result if the response carries validators and allows caching"""
+        if result.status_code != 200:
+            return
+
+        etag = response_headers.get('ETag')
+        last_modified = response_headers.get('Last-Modified')
+        if not (etag or last_modified) or 'no-store' in response_headers.get('Cache-Control', '').lower():
+            return
+
+        size = len(result._content)
+        if size > self._response_cache_max_bytes:
+            return
+
+        cache = self._response_cache
+        replaced = cache.pop(cache_key, None)
+        total = BaseScraper._response_cache_bytes + size - (replaced[3] if replaced else 0)
+        cache[cache_key] = (etag, last_modified, result, size)
+        while len(cache) > 1 and (len(cache) > self._response_cache_size or total > self._response_cache_max_bytes):
+            total -= cache.popitem(last=False)[1][3]
+        BaseScraper._response_cache_bytes = total
 
     def _handle_error(self, error: Exception, url: str) -> ScraperResult:
         """Handle scraping errors"""
@@ -1,25 +1,89 @@
 import asyncio
+import re
 import time
-from concurrent.futures import ThreadPoolExecutor
-from typing import Dict, Any, Optional
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
 
 try:
     import cloudscraper
     from requests import Response
+    from requests.adapters import HTTPAdapter
 
     HAS_CLOUDSCRAPER = True
 except ImportError:
     HAS_CLOUDSCRAPER = False
 
-from app.scrapers.base import BaseScraper, ScraperResult
+try:
+    import h2  # noqa: F401
+
+    HAS_H2 = True
+except ImportError:
+    HAS_H2 = False
+
+from app.scrapers.base import BaseScraper, ScraperResult, get_scraper_executor
 from app.core.config import settings
 from app.utils.proxy_manager import get_proxy_pool, get_user_agent_rotator
 from app.utils.stealth_manager import get_stealth_manager, get_captcha_detector
 
+# Responses that mean Cloudflare wants a challenge solved before serving the page.
+# The byte markers are a cheap substring prefilter; the regex only runs when one is present
+_CHALLENGE_STATUS_CODES = frozenset({403, 503})
+_CHALLENGE_MARKERS = (b"cf-chl", b"cf_chl", b"Just a moment")
+_CHALLENGE_RE = re.compile(rb"cf[-_]chl[-_](?:bypass|jschl|rc|opt|tk)|Just a moment")
+_CLEARANCE_COOKIES = frozenset({"cf_clearance", "__cf_bm"})
+
+# Methods the async client may send first: a challenged request is sent again
+# through cloudscraper, which is only safe for requests without side effects
+_FAST_PATH_METHODS = frozenset({"GET", "HEAD"})
+
+# Clearance cookies obtained by cloudscraper and the user agent that solved the
+# challenge, keyed by domain in LRU order. Shared by all scrapers, as the job
+# executors create a new scraper for every job
+_CLEARANCE_CACHE: "OrderedDict[str, Tuple[Dict[str, str], Optional[str]]]" = OrderedDict()
+_CLEARANCE_CACHE_SIZE = 1024
+
+# Connections kept alive per host by the cloudscraper session
+_POOL_SIZE = 64
+
+_READ_CHUNK_SIZE = 65536
+
+
+def _is_challenge(status_code: int, body: bytes) -> bool:
+    """Check whether a response is a Cloudflare challenge page"""
+    if status_code in _CHALLENGE_STATUS_CODES:
+        return True
+    return any(marker in body for marker in _CHALLENGE_MARKERS) and _CHALLENGE_RE.search(body) is not None
+
+
+def _domain_matches(host: str, domain: str) -> bool:
+    """Check whether a cookie domain covers a host: the domain itself or one of its subdomains"""
+    return host == domain or host.endswith('.' + domain)
+
+
+def _check_content_length(headers, limit: int):
+    """Reject a response up front when its declared length exceeds the limit"""
+    length = headers.get('Content-Length')
+    if length and length.isdigit() and int(length) > limit:
+        raise ValueError(f"Response body of {length} bytes exceeds the {limit} byte limit")
+
+
+def _append_chunk(chunks: list, chunk: bytes, total: int, limit: int) -> int:
+    """Append a body chunk and return the new total, failing once the limit is exceeded"""
+    total += len(chunk)
+    if total > limit:
+        raise ValueError(f"Response body exceeds the {limit} byte limit")
+    chunks.append(chunk)
+    return total
+
 
 class CloudScraperScraper(BaseScraper):
     """CloudScraper-based scraper for bypassing Cloudflare protection"""
 
+    _SETTINGS_ATTRS = ("timeout", "use_proxy_rotation", "use_user_agent_rotation", "use_stealth_mode")
+
     def __init__(self, timeout: int = None, use_proxy_rotation: bool = True, use_user_agent_rotation: bool = True,
                  use_stealth_mode: bool = True):
         super().__init__(timeout or settings.cloudscraper_timeout)
@@ -27,10 +91,27 @@ class CloudScraperScraper(BaseScraper):
             raise ImportError("cloudscraper is not installed. Install it with: pip install cloudscraper")
         self.session = cloudscraper.create_scraper()
         self.session.timeout = self.timeout
-        self.executor = ThreadPoolExecutor(max_workers=1)
+        # Keep more connections per host alive than the requests default of 10. The https
+        # adapter reuses cloudscraper's TLS context so its cipher suite is preserved
+        https_adapter = self.session.get_adapter("https://")
+        self.session.mount("https://", cloudscraper.CipherSuiteAdapter(
+            ssl_context=https_adapter.ssl_context,
+            source_address=https_adapter.source_address,
+            pool_connections=_POOL_SIZE,
+            pool_maxsize=_POOL_SIZE
+        ))
+        self.session.mount("http://", HTTPAdapter(pool_connections=_POOL_SIZE, pool_maxsize=_POOL_SIZE))
+        self.session.headers.update({"Connection": "keep-alive"})
         self.use_proxy_rotation = use_proxy_rotation
         self.use_user_agent_rotation = use_user_agent_rotation
         self.use_stealth_mode = use_stealth_mode
+        # Native async client used while no challenge has to be solved
+        self._async_client = httpx.AsyncClient(
+            http2=HAS_H2,
+            timeout=self.timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(max_keepalive_connections=100, max_connections=200)
+        )
 
     async def scrape(
             self,
@@ -53,47 +134,101 @@ class CloudScraperScraper(BaseScraper):
         Returns:
             ScraperResult object containing the response
         """
-        start_time = time.time()
+        return await self._run_scrape(
+            url, method, headers, data, params,
+            lambda: self._scrape(url, method, headers, data, params)
+        )
+
+    async def _scrape(
+            self,
+            url: str,
+            method: str = "GET",
+            headers: Optional[Dict[str, str]] = None,
+            data: Optional[Dict[str, Any]] = None,
+            params: Optional[Dict[str, str]] = None
+    ) -> ScraperResult:
+        """Scrape a URL using CloudScraper without concurrency limiting or coalescing"""
+        start_ns = time.monotonic_ns()
         proxy_info = None
 
         try:
-            # Apply stealth features if enabled
+            # The preparation steps are independent, so run them concurrently:
+            # stealth headers (including the request delay), proxy selection and,
+            # when stealth mode does not set one, a rotated user agent
+            prep_steps = {}
             if self.use_stealth_mode:
-                stealth_manager = get_stealth_manager()
-                headers = await stealth_manager.prepare_request(headers)
-
-            # Get proxy if rotation is enabled
+                prep_steps['headers'] = get_stealth_manager().prepare_request(headers)
             if self.use_proxy_rotation and settings.proxy_list:
-                proxy_pool = get_proxy_pool()
-                proxy_info = await proxy_pool.get_proxy()
-
-            # Get user agent if rotation is enabled (and not already set by stealth mode)
+                prep_steps['proxy'] = get_proxy_pool().get_proxy()
             if self.use_user_agent_rotation and settings.user_agent_rotation_enabled and not self.use_stealth_mode:
-                user_agent_rotator = get_user_agent_rotator()
-                fingerprint = await user_agent_rotator.get_browser_fingerprint()
-                if headers is None:
-                    headers = {}
+                prep_steps['fingerprint'] = get_user_agent_rotator().get_browser_fingerprint()
+
+            prepared = dict(zip(prep_steps, await asyncio.gather(*prep_steps.values(), return_exceptions=True)))
+
+            # A failed step falls back to its default instead of failing the scrape
+            for step, value in prepared.items():
+                if isinstance(value, Exception):
+                    self.logger.warning(f"Request preparation step '{step}' failed: {str(value)}")
+
+            if not isinstance(prepared.get('headers'), (Exception, type(None))):
+                headers = prepared['headers']
+            if not isinstance(prepared.get('proxy'), Exception):
+                proxy_info = prepared.get('proxy')
+            fingerprint = prepared.get('fingerprint')
+            if fingerprint is not None and not isinstance(fingerprint, Exception):
+                headers = dict(headers) if headers else {}
                 headers['User-Agent'] = fingerprint['user_agent']
 
-            # Run cloudscraper in thread pool since it's blocking
-            response = await asyncio.get_event_loop().run_in_executor(
-                self.executor,
-                self._make_request,
-                url,
-                method,
-                headers,
-                data,
-                params,
-                proxy_info
-            )
+            # Revalidate previously cached GET responses instead of downloading them again
+            cache_key = self._cache_key(url, params) if method.upper() == 'GET' else None
+            if cache_key:
+                headers = self._add_validators(cache_key, headers)
+
+            domain = urlsplit(url).netloc
+            response = None
+
+            # Proxied requests go through cloudscraper, which applies the proxy per request
+            if not proxy_info and method.upper() in _FAST_PATH_METHODS:
+                response = await self._make_async_request(url, domain, method, headers, data, params)
+
+            if response is None:
+                # Run cloudscraper in thread pool since it's blocking
+                response = await asyncio.get_running_loop().run_in_executor(
+                    get_scraper_executor(),
+                    self._make_request,
+                    url,
+                    method,
+                    headers,
+                    data,
+                    params,
+                    proxy_info
+                )
+                if response.status_code == 200:
+                    self._store_clearance(domain, headers)
+
+            response_time = self._measure_time(start_ns)
 
-            response_time = self._measure_time(start_time)
+            if cache_key and response.status_code == 304:
+                revalidated = self._revalidated_result(cache_key, response_time)
+                if revalidated is not None:
+                    if proxy_info:
+                        proxy_pool = get_proxy_pool()
+                        self._run_in_background(proxy_pool.report_proxy_result(proxy_info, True, response_time))
+                    return revalidated
+
+            result = ScraperResult(
+                status_code=response.status_code,
+                content=response.content,
+                headers=response.headers,
+                response_time=response_time,
+                encoding=response.encoding
+            )
 
             # Check for captcha if stealth mode is enabled
             captcha_detected = False
             if self.use_stealth_mode:
                 captcha_detector = get_captcha_detector()
-                detection_result = await captcha_detector.detect_captcha(response.text, url)
+                detection_result = await captcha_detector.detect_captcha(result.content, url)
                 captcha_detected = detection_result["has_captcha"]
 
                 if captcha_detected:
@@ -101,25 +236,18 @@ class CloudScraperScraper(BaseScraper):
                     # Store cookies for session management
                     if hasattr(response, 'cookies'):
                         stealth_manager = get_stealth_manager()
-                        from urllib.parse import urlparse
-                        domain = urlparse(url).netloc
                         stealth_manager.store_cookies(domain, dict(response.cookies))
 
             # Report proxy success if used
             if proxy_info:
                 proxy_pool = get_proxy_pool()
-                await proxy_pool.report_proxy_result(proxy_info, True, response_time)
-
-            result = ScraperResult(
-                status_code=response.status_code,
-                content=response.text,
-                headers=dict(response.headers),
-                response_time=response_time
-            )
+                self._run_in_background(proxy_pool.report_proxy_result(proxy_info, True, response_time))
 
             # Add captcha detection metadata
             if captcha_detected:
                 result.metadata = {"captcha_detected": True, "captcha_info": detection_result}
+            elif cache_key:
+                self._cache_response(cache_key, response.headers, result)
 
             return result
 
@@ -127,10 +255,83 @@ class CloudScraperScraper(BaseScraper):
             # Report proxy failure if used
             if proxy_info:
                 proxy_pool = get_proxy_pool()
-                await proxy_pool.report_proxy_result(proxy_info, False)
+                self._run_in_background(proxy_pool.report_proxy_result(proxy_info, False))
 
             return self._handle_error(e, url)
 
+    async def _make_async_request(
+            self,
+            url: str,
+            domain: str,
+            method: str,
+            headers: Optional[Dict[str, str]],
+            data: Optional[Dict[str, Any]],
+            params: Optional[Dict[str, str]]
+    ) -> Optional[httpx.Response]:
+        """
+        Make the request with the native async client
+
+        Returns None when Cloudflare answers with a challenge, in which case
+        the caller falls back to cloudscraper to solve it.
+        """
+        request_headers = httpx.Headers(headers)
+        clearance = _CLEARANCE_CACHE.get(domain)
+        if clearance:
+            _CLEARANCE_CACHE.move_to_end(domain)
+            cookies, user_agent = clearance
+            # Clearance is bound to the user agent that solved the challenge
+            if user_agent:
+                request_headers['User-Agent'] = user_agent
+            # Keep the caller's cookies next to the clearance
+            clearance_cookies = '; '.join(f"{name}={value}" for name, value in cookies.items())
+            user_cookies = request_headers.get('Cookie')
+            request_headers['Cookie'] = f"{user_cookies}; {clearance_cookies}" if user_cookies else clearance_cookies
+
+        request = self._async_client.build_request(
+            method.upper(),
+            url,
+            headers=request_headers,
+            params=params,
+            data=data
+        )
+        response = await self._async_client.send(request, stream=True)
+
+        # Stream the body so oversized responses are abandoned instead of buffered
+        limit = settings.max_response_bytes
+        chunks = []
+        total = 0
+        try:
+            _check_content_length(response.headers, limit)
+            async for chunk in response.aiter_bytes(_READ_CHUNK_SIZE):
+                total = _append_chunk(chunks, chunk, total, limit)
+        finally:
+            await response.aclose()
+        response._content = b"".join(chunks)
+
+        if _is_challenge(response.status_code, response.content):
+            _CLEARANCE_CACHE.pop(domain, None)
+            return None
+
+        return response
+
+    def _store_clearance(self, domain: str, headers: Optional[Dict[str, str]]):
+        """Remember the Cloudflare clearance cookies cloudscraper obtained for a domain"""
+        host = domain.split(':', 1)[0].lower()
+        cookies = {
+            cookie.name: cookie.value
+            for cookie in self.session.cookies
+            if cookie.name in _CLEARANCE_COOKIES and _domain_matches(host, cookie.domain.lstrip('.'))
+        }
+        if not cookies:
+            return
+
+        # The request headers override the session's user agent
+        user_agent = httpx.Headers(headers).get('User-Agent') or self.session.headers.get('User-Agent')
+        _CLEARANCE_CACHE[domain] = (cookies, user_agent)
+        _CLEARANCE_CACHE.move_to_end(domain)
+        while len(_CLEARANCE_CACHE) > _CLEARANCE_CACHE_SIZE:
+            _CLEARANCE_CACHE.popitem(last=False)
+
     def _make_request(
             self,
             url: str,
@@ -144,39 +345,40 @@ class CloudScraperScraper(BaseScraper):
         if not HAS_CLOUDSCRAPER:
             raise ImportError("cloudscraper is not installed")
 
-        # Configure proxy if provided
-        if proxy_info:
-            self.session.proxies = {
-                'http': proxy_info.url,
-                'https': proxy_info.url
-            }
-        else:
-            self.session.proxies = {}
-
-        request_kwargs = {
-            'url': url,
-            'headers': headers or {},
-            'timeout': self.timeout
-        }
+        method = method.upper()
 
-        if method.upper() == 'GET':
-            request_kwargs['params'] = params
-            return self.session.get(**request_kwargs)
-        elif method.upper() == 'POST':
-            request_kwargs['data'] = data
-            request_kwargs['params'] = params
-            return self.session.post(**request_kwargs)
-        else:
-            # For other methods, use the generic request method
-            request_kwargs['method'] = method
-            request_kwargs['data'] = data
-            request_kwargs['params'] = params
-            return self.session.request(**request_kwargs)
+        # session.get/post are thin wrappers around request(), so a single call covers every method.
+        # The proxy is passed per request so the session's pooled connections are kept
+        response = self.session.request(
+            method,
+            url,
+            params=params,
+            data=None if method == 'GET' else data,
+            headers=headers or {},
+            timeout=self.timeout,
+            proxies={'http': proxy_info.url, 'https': proxy_info.url} if proxy_info else None,
+            stream=True
+        )
+
+        # Read the streamed body in chunks so oversized responses are abandoned instead of buffered
+        limit = settings.max_response_bytes
+        chunks = []
+        total = 0
+        try:
+            _check_content_length(response.headers, limit)
+            for chunk in response.iter_content(_READ_CHUNK_SIZE):
+                total = _append_chunk(chunks, chunk, total, limit)
+        except Exception:
+            response.close()
+            raise
+        response._content = b"".join(chunks)
+        return response
 
     async def close(self):
         """Clean up resources"""
+        await self._drain_background_tasks()
+        if hasattr(self, '_async_client'):
+            await self._async_client.aclose()
         if hasattr(self, 'session'):
             self.session.close()
-        if hasattr(self, 'executor'):
-            self.executor.shutdown(wait=True)
         self.logger.info("CloudScraper session closed")
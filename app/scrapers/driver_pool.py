@@ -0,0 +1,164 @@
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Hashable, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DriverPool:
+    """Bounded pool of browser drivers reused across scrape calls
+
+    Drivers are keyed by the configuration they were started with (proxy,
+    headless mode, stealth mode), so a driver is only handed out again for the
+    same configuration.
+    When the pool is full, the idle drivers of the least recently used
+    configuration are quit first. All methods are blocking and meant to be
+    called from worker threads.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        # Idle drivers per key, ordered from least to most recently released
+        self._idle: "OrderedDict[Hashable, List[Any]]" = OrderedDict()
+        self._size = 0
+        self._condition = threading.Condition()
+
+    @property
+    def size(self) -> int:
+        """Number of drivers currently alive (idle or in use)"""
+        return self._size
+
+    def acquire(self, key: Hashable, factory: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """
+        Take an idle driver for the key, or start a new one with the factory
+
+        Args:
+            key: Driver configuration key
+            factory: Callable creating a new driver for the key
+            timeout: Seconds to wait for a free slot when the pool is full
+
+        Returns:
+            A driver for exclusive use until it is released or discarded
+
+        Raises:
+            TimeoutError: If no slot became free in time
+        """
+        evicted = None
+        with self._condition:
+            while True:
+                idle = self._idle.get(key)
+                if idle:
+                    return idle.pop()
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                evicted = self._pop_idle()
+                if evicted is not None:
+                    # Reuse the slot of an idle driver started for another configuration
+                    break
+                if not self._condition.wait(timeout):
+                    raise TimeoutError("Timed out waiting for a free browser driver")
+
+        if evicted is not None:
+            self._quit(evicted)
+
+        try:
+            return factory()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+    def release(self, key: Hashable, driver: Any):
+        """Return a healthy driver to the pool after clearing its cookies"""
+        try:
+            driver.delete_all_cookies()
+        except Exception as e:
+            logger.warning(f"Discarding driver that failed to reset: {str(e)}")
+            self.discard(driver)
+            return
+
+        with self._condition:
+            self._idle.setdefault(key, []).append(driver)
+            self._idle.move_to_end(key)
+            self._condition.notify()
+
+    def discard(self, driver: Any):
+        """Quit a driver that should not be reused and free its slot"""
+        self._quit(driver)
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    def shutdown(self):
+        """Quit all idle drivers"""
+        with self._condition:
+            drivers = [driver for idle in self._idle.values() for driver in idle]
+            self._idle.clear()
+            self._size -= len(drivers)
+            self._condition.notify_all()
+
+        for driver in drivers:
+            self._quit(driver)
+
+    def _pop_idle(self) -> Optional[Any]:
+        """Remove and return the least recently used idle driver (caller holds the lock)"""
+        for key, idle in self._idle.items():
+            if idle:
+                driver = idle.pop(0)
+                if not idle:
+                    del self._idle[key]
+                return driver
+        return None
+
+    @staticmethod
+    def _quit(driver: Any):
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning(f"Error quitting driver: {str(e)}")
+
+
+# Global instances for easy access
+_driver_pool: Optional[DriverPool] = None
+# The pool is first requested from browser worker threads
+_driver_pool_lock = threading.Lock()
+# Browser work runs on its own threads, one per pooled driver, so waiting for a
+# driver never holds up the threads of the HTTP scrapers
+_driver_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_driver_pool() -> DriverPool:
+    """Get the global browser driver pool instance"""
+    global _driver_pool
+    if _driver_pool is None:
+        with _driver_pool_lock:
+            if _driver_pool is None:
+                _driver_pool = DriverPool(settings.selenium_pool_size)
+    return _driver_pool
+
+
+def get_driver_executor() -> ThreadPoolExecutor:
+    """Get the thread pool that runs browser driver work, creating it on first use"""
+    global _driver_executor
+    if _driver_executor is None:
+        _driver_executor = ThreadPoolExecutor(
+            max_workers=settings.selenium_pool_size,
+            thread_name_prefix="selenium"
+        )
+    return _driver_executor
+
+
+def shutdown_driver_pool():
+    """Stop the browser thread pool and quit all idle pooled browser drivers"""
+    global _driver_executor
+    if _driver_executor is not None:
+        _driver_executor.shutdown(wait=False, cancel_futures=True)
+        _driver_executor = None
+    if _driver_pool is not None:
+        _driver_pool.shutdown()
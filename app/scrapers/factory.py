@@ -1,27 +1,30 @@
+import importlib
+import importlib.util
+import inspect
 import logging
-from typing import Dict, Optional
+from functools import lru_cache
+from typing import Dict, FrozenSet, Optional, Tuple
 
 from app.models.job import ScraperType
 from app.scrapers.base import BaseScraper
 
 logger = logging.getLogger(__name__)
 
-# Try to import scrapers, but handle missing dependencies
-try:
-    from app.scrapers.cloudscraper_scraper import CloudScraperScraper
+# Built-in scrapers: type -> (module path, class name). Modules are imported on
+# first use so a process only pays for the scrapers it actually creates
+_SCRAPER_IMPORTS: Dict[ScraperType, Tuple[str, str]] = {
+    ScraperType.CLOUDSCRAPER: ("app.scrapers.cloudscraper_scraper", "CloudScraperScraper"),
+    ScraperType.SELENIUM: ("app.scrapers.selenium_scraper", "SeleniumScraper"),
+    ScraperType.PLAYWRIGHT: ("app.scrapers.playwright_scraper", "PlaywrightScraper"),
+}
 
-    HAS_CLOUDSCRAPER = True
-except ImportError:
-    HAS_CLOUDSCRAPER = False
-    CloudScraperScraper = None
+# Availability is checked without importing the heavy dependencies
+HAS_CLOUDSCRAPER = importlib.util.find_spec("cloudscraper") is not None
+HAS_SELENIUM = importlib.util.find_spec("seleniumbase") is not None
+HAS_PLAYWRIGHT = importlib.util.find_spec("playwright") is not None
 
-try:
-    from app.scrapers.selenium_scraper import SeleniumScraper
-
-    HAS_SELENIUM = True
-except ImportError:
-    HAS_SELENIUM = False
-    SeleniumScraper = None
+# Built-in scraper classes resolved so far
+_builtin_scrapers: Dict[ScraperType, type] = {}
 
 
 class ScraperFactory:
@@ -30,21 +33,56 @@ class ScraperFactory:
     # Class-level dictionary to store dynamically registered scrapers
     _registered_scrapers: Dict[ScraperType, type] = {}
 
-    @classmethod
-    def _get_scrapers(cls) -> Dict[ScraperType, type]:
-        """Get available scrapers based on installed dependencies"""
-        scrapers = {}
+    # Constructor parameter names of each scraper class
+    _param_cache: Dict[type, FrozenSet[str]] = {}
 
-        if HAS_CLOUDSCRAPER and CloudScraperScraper:
-            scrapers[ScraperType.CLOUDSCRAPER] = CloudScraperScraper
+    @classmethod
+    def _get_available_types(cls) -> Tuple[ScraperType, ...]:
+        """Get available scraper types based on installed dependencies"""
+        return cls._build_available_types(HAS_CLOUDSCRAPER, HAS_SELENIUM, HAS_PLAYWRIGHT)
 
-        if HAS_SELENIUM and SeleniumScraper:
-            scrapers[ScraperType.SELENIUM] = SeleniumScraper
+    @classmethod
+    @lru_cache(maxsize=8)
+    def _build_available_types(
+            cls,
+            has_cloudscraper: bool,
+            has_selenium: bool,
+            has_playwright: bool
+    ) -> Tuple[ScraperType, ...]:
+        """Build the available scraper types for a set of installed dependencies"""
+        available = {
+            ScraperType.CLOUDSCRAPER: has_cloudscraper,
+            ScraperType.SELENIUM: has_selenium,
+            ScraperType.PLAYWRIGHT: has_playwright
+        }
+        scraper_types = [scraper_type for scraper_type in _SCRAPER_IMPORTS if available[scraper_type]]
 
         # Include dynamically registered scrapers
-        scrapers.update(cls._registered_scrapers)
+        scraper_types.extend(
+            scraper_type for scraper_type in cls._registered_scrapers
+            if scraper_type not in scraper_types
+        )
 
-        return scrapers
+        return tuple(scraper_types)
+
+    @classmethod
+    def _get_scraper_class(cls, scraper_type: ScraperType) -> type:
+        """Resolve a scraper class, importing built-in scraper modules on first use"""
+        scraper_class = cls._registered_scrapers.get(scraper_type) or _builtin_scrapers.get(scraper_type)
+        if scraper_class is None:
+            module_path, class_name = _SCRAPER_IMPORTS[scraper_type]
+            scraper_class = getattr(importlib.import_module(module_path), class_name)
+            _builtin_scrapers[scraper_type] = scraper_class
+        return scraper_class
+
+    @classmethod
+    def _get_scraper_params(cls, scraper_class: type) -> FrozenSet[str]:
+        """Get the constructor parameter names accepted by a scraper class"""
+        params = cls._param_cache.get(scraper_class)
+        if params is None:
+            params = frozenset(inspect.signature(scraper_class.__init__).parameters) - {'self'}
+            cls._param_cache[scraper_class] = params
+        return params
 
     @classmethod
     def create_scraper(
@@ -67,25 +105,20 @@ class ScraperFactory:
         Raises:
             ValueError: If scraper type is not supported
         """
-        scrapers = cls._get_scrapers()
-
-        if scraper_type not in scrapers:
+        if scraper_type not in cls._get_available_types():
             if scraper_type == ScraperType.CLOUDSCRAPER and not HAS_CLOUDSCRAPER:
                 raise ValueError("CloudScraper is not available. Install it with: pip install cloudscraper")
             elif scraper_type == ScraperType.SELENIUM and not HAS_SELENIUM:
                 raise ValueError("Selenium is not available. Install it with: pip install seleniumbase")
+            elif scraper_type == ScraperType.PLAYWRIGHT and not HAS_PLAYWRIGHT:
+                raise ValueError("Playwright is not available. Install it with: pip install playwright")
             else:
                 raise ValueError(f"Unsupported scraper type: {scraper_type}")
 
-        scraper_class = scrapers[scraper_type]
-
-        # Create scraper with appropriate arguments
-        # Filter kwargs to only include parameters that the scraper accepts
-        import inspect
-        scraper_signature = inspect.signature(scraper_class.__init__)
-        scraper_params = set(scraper_signature.parameters.keys()) - {'self'}
+        scraper_class = cls._get_scraper_class(scraper_type)
 
         # Filter kwargs to only include valid parameters for this scraper
+        scraper_params = cls._get_scraper_params(scraper_class)
         filtered_kwargs = {
             k: v for k, v in kwargs.items()
             if k in scraper_params
@@ -96,7 +129,7 @@ class ScraperFactory:
     @classmethod
     def get_available_scrapers(cls) -> list[str]:
         """Get list of available scraper types"""
-        return list(cls._get_scrapers().keys())
+        return list(cls._get_available_types())
 
     @classmethod
     def register_scraper(cls, scraper_type: ScraperType, scraper_class: type):
@@ -112,6 +145,7 @@ class ScraperFactory:
 
         # Store the scraper class in the registry
         cls._registered_scrapers[scraper_type] = scraper_class
+        cls._build_available_types.cache_clear()
         logger.info(f"Registered scraper: {scraper_type}")
 
 
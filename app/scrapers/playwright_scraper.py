@@ -0,0 +1,230 @@
+import asyncio
+import time
+from typing import Dict, Any, Optional
+
+try:
+    from playwright.async_api import async_playwright
+
+    HAS_PLAYWRIGHT = True
+except ImportError:
+    HAS_PLAYWRIGHT = False
+
+from app.scrapers.base import BaseScraper, ScraperResult, build_url
+from app.core.config import settings
+from app.utils.proxy_manager import ProxyProtocol, get_proxy_pool, get_user_agent_rotator
+from app.utils.stealth_manager import get_stealth_manager, get_captcha_detector, get_js_bypass_manager
+
+# One Playwright driver process and one browser per headless mode, shared by all
+# scrapers; every request gets its own isolated browser context
+_playwright = None
+_browsers: Dict[bool, Any] = {}
+_browser_lock: Optional[asyncio.Lock] = None
+
+
+async def get_browser(headless: bool = True):
+    """Get the shared Chromium browser, launching it on first use"""
+    global _playwright, _browser_lock
+    browser = _browsers.get(headless)
+    if browser is not None and browser.is_connected():
+        return browser
+
+    if _browser_lock is None:
+        _browser_lock = asyncio.Lock()
+
+    async with _browser_lock:
+        browser = _browsers.get(headless)
+        if browser is None or not browser.is_connected():
+            if _playwright is None:
+                _playwright = await async_playwright().start()
+            browser = _browsers[headless] = await _playwright.chromium.launch(headless=headless)
+        return browser
+
+
+async def shutdown_playwright():
+    """Close the shared browsers and stop the Playwright driver"""
+    global _playwright, _browser_lock
+    for browser in _browsers.values():
+        try:
+            await browser.close()
+        except Exception:
+            pass
+    _browsers.clear()
+
+    if _playwright is not None:
+        await _playwright.stop()
+        _playwright = None
+    _browser_lock = None
+
+
+class PlaywrightScraper(BaseScraper):
+    """Playwright-based scraper for JavaScript-heavy websites, fully asynchronous"""
+
+    _SETTINGS_ATTRS = (
+        "timeout", "headless", "wait_for_selector",
+        "use_proxy_rotation", "use_user_agent_rotation", "use_stealth_mode"
+    )
+
+    def __init__(self, timeout: int = None, headless: bool = True, use_proxy_rotation: bool = True,
+                 use_user_agent_rotation: bool = True, use_stealth_mode: bool = True,
+                 wait_for_selector: Optional[str] = None):
+        super().__init__(timeout or settings.selenium_timeout)
+        if not HAS_PLAYWRIGHT:
+            raise ImportError("playwright is not installed. Install it with: pip install playwright")
+        self.headless = headless
+        # CSS selector to wait for before reading the page, for pages rendered client-side
+        self.wait_for_selector = wait_for_selector
+        self.use_proxy_rotation = use_proxy_rotation
+        self.use_user_agent_rotation = use_user_agent_rotation
+        self.use_stealth_mode = use_stealth_mode
+
+    async def scrape(
+            self,
+            url: str,
+            method: str = "GET",
+            headers: Optional[Dict[str, str]] = None,
+            data: Optional[Dict[str, Any]] = None,
+            params: Optional[Dict[str, str]] = None
+    ) -> ScraperResult:
+        """
+        Scrape a URL using Playwright
+
+        Args:
+            url: The URL to scrape
+            method: HTTP method (currently only GET is supported)
+            headers: Optional extra headers sent with every request of the page
+            data: Optional data (not applicable for GET requests)
+            params: Optional query parameters (will be added to URL)
+
+        Returns:
+            ScraperResult object containing the response
+        """
+        return await self._run_scrape(
+            url, method, headers, data, params,
+            lambda: self._scrape(url, method, headers, data, params)
+        )
+
+    async def _scrape(
+            self,
+            url: str,
+            method: str = "GET",
+            headers: Optional[Dict[str, str]] = None,
+            data: Optional[Dict[str, Any]] = None,
+            params: Optional[Dict[str, str]] = None
+    ) -> ScraperResult:
+        """Scrape a URL using Playwright without concurrency limiting or coalescing"""
+        if not HAS_PLAYWRIGHT:
+            raise ImportError("playwright is not installed")
+
+        if method.upper() != "GET":
+            raise ValueError("PlaywrightScraper currently only supports GET requests")
+        start_ns = time.monotonic_ns()
+        proxy_info = None
+
+        try:
+            context_options: Dict[str, Any] = {}
+
+            # Apply stealth features if enabled
+            if self.use_stealth_mode:
+                stealth_manager = get_stealth_manager()
+                await stealth_manager.delay_manager.wait_before_request()
+                viewport = await stealth_manager.get_viewport_config()
+                context_options["viewport"] = {"width": viewport["width"], "height": viewport["height"]}
+                if viewport.get("device_scale_factor"):
+                    context_options["device_scale_factor"] = viewport["device_scale_factor"]
+
+            # Get proxy if rotation is enabled
+            if self.use_proxy_rotation and settings.proxy_list:
+                proxy_pool = get_proxy_pool()
+                proxy_info = await proxy_pool.get_proxy()
+                if proxy_info:
+                    context_options["proxy"] = self._proxy_settings(proxy_info)
+
+            # Get user agent if rotation is enabled or stealth mode needs one
+            if self.use_stealth_mode or (self.use_user_agent_rotation and settings.user_agent_rotation_enabled):
+                fingerprint = await get_user_agent_rotator().get_browser_fingerprint()
+                context_options["user_agent"] = fingerprint['user_agent']
+
+            if headers:
+                context_options["extra_http_headers"] = headers
+
+            # Build URL with parameters
+            url = build_url(url, params)
+
+            status_code, response_headers, content = await self._scrape_with_playwright(url, context_options)
+
+            response_time = self._measure_time(start_ns)
+
+            # Check for captcha if stealth mode is enabled
+            captcha_detected = False
+            detection_result = {}
+            if self.use_stealth_mode:
+                captcha_detector = get_captcha_detector()
+                detection_result = await captcha_detector.detect_captcha(content, url)
+                captcha_detected = detection_result["has_captcha"]
+
+                if captcha_detected:
+                    self.logger.warning(f"Captcha detected: {detection_result}")
+
+            # Report proxy success if used
+            if proxy_info:
+                proxy_pool = get_proxy_pool()
+                self._run_in_background(proxy_pool.report_proxy_result(proxy_info, True, response_time))
+
+            result = ScraperResult(
+                status_code=status_code,
+                content=content,
+                headers=response_headers,
+                response_time=response_time
+            )
+
+            # Add captcha detection metadata
+            if captcha_detected:
+                result.metadata = {"captcha_detected": True, "captcha_info": detection_result}
+
+            return result
+
+        except Exception as e:
+            # Report proxy failure if used
+            if proxy_info:
+                proxy_pool = get_proxy_pool()
+                self._run_in_background(proxy_pool.report_proxy_result(proxy_info, False))
+
+            return self._handle_error(e, url)
+
+    async def _scrape_with_playwright(self, url: str, context_options: Dict[str, Any]):
+        """Load the page in a fresh browser context and return status, headers and HTML"""
+        browser = await get_browser(self.headless)
+        context = await browser.new_context(**context_options)
+        try:
+            if self.use_stealth_mode:
+                await context.add_init_script(get_js_bypass_manager().get_stealth_source())
+
+            page = await context.new_page()
+            response = await page.goto(url, timeout=self.timeout * 1000)
+
+            if self.wait_for_selector:
+                await page.wait_for_selector(self.wait_for_selector, timeout=self.timeout * 1000)
+
+            content = await page.content()
+            if response is None:
+                # Navigations to the same document do not produce a response
+                return 200, {}, content
+            return response.status, await response.all_headers(), content
+        finally:
+            await context.close()
+
+    @staticmethod
+    def _proxy_settings(proxy_info) -> Dict[str, str]:
+        """Convert a proxy to Playwright proxy settings"""
+        protocol = ProxyProtocol(proxy_info.protocol).value
+        proxy = {"server": f"{protocol}://{proxy_info.host}:{proxy_info.port}"}
+        if proxy_info.username and proxy_info.password:
+            proxy["username"] = proxy_info.username
+            proxy["password"] = proxy_info.password
+        return proxy
+
+    async def close(self):
+        """Clean up resources"""
+        await self._drain_background_tasks()
+        # The browser is shared by all Playwright scrapers and stays open
+        self.logger.info("Playwright scraper closed")
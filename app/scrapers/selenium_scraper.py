@@ -1,7 +1,8 @@
 import asyncio
 import time
-from concurrent.futures import ThreadPoolExecutor
+import weakref
 from typing import Dict, Any, Optional
+from urllib.parse import urlsplit
 
 try:
     from seleniumbase import BaseCase
@@ -13,29 +14,47 @@ try:
 except ImportError:
     HAS_SELENIUM = False
 
-from app.scrapers.base import BaseScraper, ScraperResult
+from app.scrapers.base import BaseScraper, ScraperResult, build_url
+from app.scrapers.driver_pool import get_driver_executor, get_driver_pool
 from app.core.config import settings
 from app.utils.proxy_manager import get_proxy_pool, get_user_agent_rotator
 from app.utils.stealth_manager import get_stealth_manager, get_captcha_detector, get_js_bypass_manager
 
+# Pooled drivers that already carry the stealth patches, so they are applied once per driver
+_stealth_drivers: "weakref.WeakSet" = weakref.WeakSet()
+# Pooled drivers whose user agent was overridden by an earlier lease
+_user_agent_drivers: "weakref.WeakSet" = weakref.WeakSet()
+
 
 class SeleniumScraper(BaseScraper):
     """SeleniumBase-based scraper for JavaScript-heavy websites"""
 
+    _SETTINGS_ATTRS = (
+        "timeout", "headless", "wait_for_selector",
+        "use_proxy_rotation", "use_user_agent_rotation", "use_stealth_mode"
+    )
+
     def __init__(self, timeout: int = None, headless: bool = True, use_proxy_rotation: bool = True,
-                 use_user_agent_rotation: bool = True, use_stealth_mode: bool = True):
+                 use_user_agent_rotation: bool = True, use_stealth_mode: bool = True,
+                 wait_for_selector: Optional[str] = None):
         super().__init__(timeout or settings.selenium_timeout)
         if not HAS_SELENIUM:
             raise ImportError("seleniumbase is not installed. Install it with: pip install seleniumbase")
         self.headless = headless
-        self.driver = None
-        self.executor = ThreadPoolExecutor(max_workers=1)
+        # CSS selector to wait for before reading the page, for pages rendered client-side
+        self.wait_for_selector = wait_for_selector
         self.use_proxy_rotation = use_proxy_rotation
         self.use_user_agent_rotation = use_user_agent_rotation
         self.use_stealth_mode = use_stealth_mode
         self.current_proxy = None
         self.current_user_agent = None
         self.current_viewport = None
+        # Shared services used on every scrape, resolved once per scraper
+        self._stealth_manager = get_stealth_manager() if use_stealth_mode else None
+        self._captcha_detector = get_captcha_detector() if use_stealth_mode else None
+        self._proxy_pool = get_proxy_pool() if use_proxy_rotation else None
+        self._user_agent_rotator = get_user_agent_rotator()
+        self._js_bypass_manager = get_js_bypass_manager()
 
     async def scrape(
             self,
@@ -58,18 +77,32 @@ class SeleniumScraper(BaseScraper):
         Returns:
             ScraperResult object containing the response
         """
+        return await self._run_scrape(
+            url, method, headers, data, params,
+            lambda: self._scrape(url, method, headers, data, params)
+        )
+
+    async def _scrape(
+            self,
+            url: str,
+            method: str = "GET",
+            headers: Optional[Dict[str, str]] = None,
+            data: Optional[Dict[str, Any]] = None,
+            params: Optional[Dict[str, str]] = None
+    ) -> ScraperResult:
+        """Scrape a URL using SeleniumBase without concurrency limiting or coalescing"""
         if not HAS_SELENIUM:
             raise ImportError("seleniumbase is not installed")
 
         if method.upper() != "GET":
             raise ValueError("SeleniumScraper currently only supports GET requests")
-        start_time = time.time()
+        start_ns = time.monotonic_ns()
         proxy_info = None
 
         try:
             # Apply stealth features if enabled
             if self.use_stealth_mode:
-                stealth_manager = get_stealth_manager()
+                stealth_manager = self._stealth_manager
                 # Apply intelligent delays
                 await stealth_manager.delay_manager.wait_before_request()
                 # Get viewport configuration
@@ -77,41 +110,43 @@ class SeleniumScraper(BaseScraper):
 
             # Get proxy if rotation is enabled
             if self.use_proxy_rotation and settings.proxy_list:
-                proxy_pool = get_proxy_pool()
-                proxy_info = await proxy_pool.get_proxy()
+                proxy_info = await self._proxy_pool.get_proxy()
                 self.current_proxy = proxy_info
 
             # Get user agent if rotation is enabled (and not using stealth mode)
             if self.use_user_agent_rotation and settings.user_agent_rotation_enabled and not self.use_stealth_mode:
-                user_agent_rotator = get_user_agent_rotator()
-                fingerprint = await user_agent_rotator.get_browser_fingerprint()
+                fingerprint = await self._user_agent_rotator.get_browser_fingerprint()
                 self.current_user_agent = fingerprint['user_agent']
             elif self.use_stealth_mode:
                 # Stealth mode handles user agent internally
-                user_agent_rotator = get_user_agent_rotator()
-                fingerprint = await user_agent_rotator.get_browser_fingerprint()
+                fingerprint = await self._user_agent_rotator.get_browser_fingerprint()
                 self.current_user_agent = fingerprint['user_agent']
 
             # Build URL with parameters
-            if params:
-                url_params = '&'.join([f"{k}={v}" for k, v in params.items()])
-                url = f"{url}?{url_params}" if '?' not in url else f"{url}&{url_params}"
+            url = build_url(url, params)
+
+            # Resolve the stealth scripts on the event loop so worker threads
+            # never call back into the stealth managers
+            stealth_source = self._js_bypass_manager.get_stealth_source() if self.use_stealth_mode else None
 
             # Run selenium in thread pool since it's blocking
-            content = await asyncio.get_event_loop().run_in_executor(
-                self.executor,
+            content = await asyncio.get_running_loop().run_in_executor(
+                get_driver_executor(),
                 self._scrape_with_selenium,
-                url
+                url,
+                proxy_info,
+                self.current_user_agent,
+                self.current_viewport,
+                stealth_source
             )
 
-            response_time = self._measure_time(start_time)
+            response_time = self._measure_time(start_ns)
 
             # Check for captcha if stealth mode is enabled
             captcha_detected = False
             detection_result = {}
             if self.use_stealth_mode:
-                captcha_detector = get_captcha_detector()
-                detection_result = await captcha_detector.detect_captcha(content, url)
+                detection_result = await self._captcha_detector.detect_captcha(content, url)
                 captcha_detected = detection_result["has_captcha"]
 
                 if captcha_detected:
@@ -119,8 +154,7 @@ class SeleniumScraper(BaseScraper):
 
             # Report proxy success if used
             if proxy_info:
-                proxy_pool = get_proxy_pool()
-                await proxy_pool.report_proxy_result(proxy_info, True, response_time)
+                self._run_in_background(self._proxy_pool.report_proxy_result(proxy_info, True, response_time))
 
             result = ScraperResult(
                 status_code=200,  # Selenium doesn't easily provide status codes
@@ -138,35 +172,64 @@ class SeleniumScraper(BaseScraper):
         except Exception as e:
             # Report proxy failure if used
             if proxy_info:
-                proxy_pool = get_proxy_pool()
-                await proxy_pool.report_proxy_result(proxy_info, False)
+                self._run_in_background(self._proxy_pool.report_proxy_result(proxy_info, False))
 
             return self._handle_error(e, url)
 
-    def _scrape_with_selenium(self, url: str) -> str:
-        """Perform the actual scraping with Selenium (blocking)"""
+    def _scrape_with_selenium(
+            self,
+            url: str,
+            proxy_info=None,
+            user_agent: Optional[str] = None,
+            viewport: Optional[Dict[str, int]] = None,
+            stealth_source: Optional[str] = None
+    ) -> str:
+        """Perform the actual scraping with a pooled Selenium driver (blocking)"""
+        driver_pool = get_driver_pool()
+        # Proxy and headless mode are fixed at launch and the stealth scripts stay registered
+        # once applied; user agent and viewport are set per lease
+        key = (proxy_info.url if proxy_info else None, self.headless, self.use_stealth_mode)
+        driver = driver_pool.acquire(key, lambda: self._create_driver(proxy_info), timeout=self.timeout)
+
         try:
-            # Initialize the driver if not already done
-            if not self.driver:
-                self._init_driver()
+            if self.use_stealth_mode and driver not in _stealth_drivers:
+                self._apply_stealth_features(driver, stealth_source)
+                _stealth_drivers.add(driver)
 
-            # Navigate to the URL
-            self.driver.get(url)
+            self._configure_driver(driver, user_agent, viewport)
 
-            # Wait for the page to load
-            WebDriverWait(self.driver, self.timeout).until(
-                EC.presence_of_element_located((By.TAG_NAME, "body"))
-            )
+            # Navigate to the URL; get() already blocks until the document has loaded
+            driver.get(url)
 
-            # Get the page source
-            return self.driver.page_source
+            if self.wait_for_selector:
+                WebDriverWait(driver, self.timeout).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, self.wait_for_selector))
+                )
+
+            content = self._get_page_html(driver)
 
         except Exception as e:
             self.logger.error(f"Selenium scraping failed: {str(e)}")
+            driver_pool.discard(driver)
             raise
 
-    def _init_driver(self):
-        """Initialize the Selenium driver"""
+        driver_pool.release(key, driver)
+        return content
+
+    def _get_page_html(self, driver) -> str:
+        """Read the rendered HTML with a single CDP call, falling back to page_source"""
+        try:
+            response = driver.execute_cdp_cmd("Runtime.evaluate", {
+                "expression": "document.documentElement.outerHTML",
+                "returnByValue": True
+            })
+            return response["result"]["value"]
+        except Exception as e:
+            self.logger.debug(f"CDP page read failed, using page_source: {str(e)}")
+            return driver.page_source
+
+    def _create_driver(self, proxy_info=None):
+        """Start a new Selenium driver"""
         try:
             from seleniumbase import Driver
 
@@ -178,101 +241,68 @@ class SeleniumScraper(BaseScraper):
                 "implicit_wait": 10
             }
 
-            # Add proxy if available
-            if self.current_proxy:
-                driver_options["proxy"] = self.current_proxy.url
-                self.logger.info(f"Using proxy: {self.current_proxy.host}:{self.current_proxy.port}")
-
-            # Add user agent if available
-            if self.current_user_agent:
-                driver_options["user_agent"] = self.current_user_agent
-                self.logger.info(f"Using user agent: {self.current_user_agent[:50]}...")
+            # Run the browser on a Selenium Grid hub when one is configured
+            if settings.selenium_grid_url:
+                grid = urlsplit(settings.selenium_grid_url)
+                driver_options["protocol"] = grid.scheme or "http"
+                driver_options["servername"] = grid.hostname
+                driver_options["port"] = grid.port or 4444
 
-            # Create driver with options
-            self.driver = Driver(**driver_options)
+            # Add proxy if available
+            if proxy_info:
+                driver_options["proxy"] = proxy_info.url
+                self.logger.info(f"Using proxy: {proxy_info.host}:{proxy_info.port}")
 
-            # Apply stealth features if enabled
-            if self.use_stealth_mode:
-                self._apply_stealth_features()
-
-            # Set viewport if available
-            if self.current_viewport:
-                try:
-                    self.driver.set_window_size(
-                        self.current_viewport["width"],
-                        self.current_viewport["height"]
-                    )
-                    self.logger.info(
-                        f"Set viewport: {self.current_viewport['width']}x{self.current_viewport['height']}")
-                except Exception as e:
-                    self.logger.warning(f"Failed to set viewport: {str(e)}")
+            # Create driver with options; stealth features are applied on first lease
+            driver = Driver(**driver_options)
 
             self.logger.info("Selenium driver initialized")
+            return driver
 
         except Exception as e:
             self.logger.error(f"Failed to initialize Selenium driver: {str(e)}")
             raise
 
-    def _apply_stealth_features(self):
-        """Apply stealth features to the Selenium driver"""
-        if not self.driver:
-            self.logger.warning("Driver not initialized, skipping stealth features")
-            return
-
-        try:
-            # Inject stealth scripts
-            js_bypass_manager = get_js_bypass_manager()
-            stealth_scripts = js_bypass_manager.get_stealth_scripts()
-
-            for script in stealth_scripts:
-                try:
-                    self.driver.execute_script(script)
-                except Exception as e:
-                    self.logger.warning(f"Failed to execute stealth script: {str(e)}")
-
-            # Additional stealth configurations
+    def _configure_driver(self, driver, user_agent: Optional[str], viewport: Optional[Dict[str, int]]):
+        """Apply the per-request user agent and viewport to a pooled driver"""
+        if user_agent:
             try:
-                # Disable automation indicators
-                self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-
-                # Override permissions API
-                self.driver.execute_script("""
-                    const originalQuery = window.navigator.permissions.query;
-                    window.navigator.permissions.query = (parameters) => (
-                        parameters.name === 'notifications' ?
-                            Promise.resolve({ state: Notification.permission }) :
-                            originalQuery(parameters)
-                    );
-                """)
-
-                self.logger.debug("Applied stealth features successfully")
+                driver.execute_cdp_cmd("Network.setUserAgentOverride", {"userAgent": user_agent})
+                _user_agent_drivers.add(driver)
+                self.logger.info(f"Using user agent: {user_agent[:50]}...")
+            except Exception as e:
+                self.logger.warning(f"Failed to set user agent: {str(e)}")
+        elif driver in _user_agent_drivers:
+            # An empty override restores the browser's own user agent
+            try:
+                driver.execute_cdp_cmd("Network.setUserAgentOverride", {"userAgent": ""})
+                _user_agent_drivers.discard(driver)
+            except Exception as e:
+                self.logger.warning(f"Failed to reset user agent: {str(e)}")
 
+        if viewport:
+            try:
+                driver.set_window_size(viewport["width"], viewport["height"])
+                self.logger.info(f"Set viewport: {viewport['width']}x{viewport['height']}")
             except Exception as e:
-                self.logger.warning(f"Failed to apply some stealth features: {str(e)}")
+                self.logger.warning(f"Failed to set viewport: {str(e)}")
 
+    def _apply_stealth_features(self, driver, source: Optional[str] = None):
+        """Apply stealth features to the Selenium driver"""
+        source = source or self._js_bypass_manager.get_stealth_source()
+        try:
+            # Registered once, the scripts run before any page script on every new document
+            driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": source})
+            self.logger.debug("Applied stealth features successfully")
         except Exception as e:
-            self.logger.warning(f"Failed to apply stealth features: {str(e)}")
-
-    async def close(self):
-        """Clean up resources"""
-        if self.driver:
+            self.logger.debug(f"CDP stealth injection failed, executing scripts directly: {str(e)}")
             try:
-                await asyncio.get_event_loop().run_in_executor(
-                    self.executor,
-                    self.driver.quit
-                )
-                self.driver = None
-                self.logger.info("Selenium driver closed")
+                driver.execute_script(source)
             except Exception as e:
-                self.logger.error(f"Error closing Selenium driver: {str(e)}")
-
-        if hasattr(self, 'executor'):
-            self.executor.shutdown(wait=True)
+                self.logger.warning(f"Failed to apply stealth features: {str(e)}")
 
-    def __del__(self):
-        """Cleanup on deletion"""
-        if self.driver:
-            try:
-                self.driver.quit()
-            except Exception:
-                pass
+    async def close(self):
+        """Clean up resources"""
+        await self._drain_background_tasks()
+        # Drivers belong to the shared pool and stay alive for other scrapers
+        self.logger.info("Selenium scraper closed")
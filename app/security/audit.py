@@ -5,11 +5,16 @@ Provides comprehensive audit logging for security events, API access,
 authentication attempts, and other security-relevant activities.
 """
 
+import asyncio
 import hashlib
+import io
 import json
 import logging
+import os
+import sys
+import threading
 import time
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 from datetime import datetime, timezone
 from enum import Enum
 from typing import Optional, Dict, Any
@@ -18,10 +23,50 @@ from fastapi import Request
 from starlette.middleware.base import BaseHTTPMiddleware
 
 from app.core.config import settings
+from app.utils.serialization import dumps_json
 from .encryption import anonymize_log_data, get_encryption_instance
 
 logger = logging.getLogger(__name__)
 
+# Events are written off the request path by a background task, in batches
+_AUDIT_QUEUE_SIZE = 10_000
+_AUDIT_BATCH_SIZE = 256
+_AUDIT_FLUSH_INTERVAL = 0.05
+
+# Guard the installation of the audit handler and the creation of the global logger
+_audit_handler_lock = threading.Lock()
+_audit_handler_installed = False
+_audit_logger_lock = threading.Lock()
+
+_UTC = timezone.utc
+# ISO format of the most recently formatted UTC second: (fields of the second, prefix)
+_iso_second: tuple = (None, "")
+
+
+def _utc_now() -> datetime:
+    """Current time as an aware UTC datetime"""
+    return datetime.now(_UTC)
+
+
+def _format_timestamp(timestamp: datetime) -> str:
+    """Format a timestamp like datetime.isoformat, reusing the formatted second for UTC times"""
+    global _iso_second
+    if timestamp.tzinfo is not _UTC:
+        return timestamp.isoformat()
+
+    second = (timestamp.year, timestamp.month, timestamp.day, timestamp.hour, timestamp.minute, timestamp.second)
+    # Read the shared cache once: another thread may replace it between two reads
+    cached = _iso_second
+    if cached[0] != second:
+        cached = (second, timestamp.replace(microsecond=0).isoformat()[:-6])
+        _iso_second = cached
+    prefix = cached[1]
+
+    microsecond = timestamp.microsecond
+    if microsecond:
+        return f"{prefix}.{microsecond:06d}+00:00"
+    return f"{prefix}+00:00"
+
 
 class AuditEventType(Enum):
     """Types of audit events"""
@@ -45,7 +90,18 @@ class AuditSeverity(Enum):
     CRITICAL = "critical"
 
 
-@dataclass
+# Enum values and log levels looked up per event, resolved once
+_EVENT_TYPE_VALUES = {event_type: event_type.value for event_type in AuditEventType}
+_SEVERITY_VALUES = {severity: severity.value for severity in AuditSeverity}
+_SEVERITY_LOG_LEVELS = {
+    AuditSeverity.LOW: logging.INFO,
+    AuditSeverity.MEDIUM: logging.WARNING,
+    AuditSeverity.HIGH: logging.ERROR,
+    AuditSeverity.CRITICAL: logging.ERROR
+}
+
+
+@dataclass(slots=True)
 class AuditEvent:
     """Audit event data structure"""
     event_type: AuditEventType
@@ -65,11 +121,61 @@ class AuditEvent:
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for logging"""
-        data = asdict(self)
-        data['event_type'] = self.event_type.value
-        data['severity'] = self.severity.value
-        data['timestamp'] = self.timestamp.isoformat()
-        return data
+        # Built by hand: asdict() reflects over the fields and deep-copies details
+        return {
+            'event_type': _EVENT_TYPE_VALUES[self.event_type],
+            'severity': _SEVERITY_VALUES[self.severity],
+            'timestamp': _format_timestamp(self.timestamp),
+            'user_id': self.user_id,
+            'session_id': self.session_id,
+            'ip_address': self.ip_address,
+            'user_agent': self.user_agent,
+            'endpoint': self.endpoint,
+            'method': self.method,
+            'status_code': self.status_code,
+            'message': self.message,
+            'details': self.details,
+            'request_id': self.request_id,
+            'api_key_id': self.api_key_id
+        }
+
+
+class AuditJSONHandler(logging.Handler):
+    """Write audit records as JSON lines straight to a file descriptor
+
+    Without a descriptor, stderr's is used; when stderr has none (it was
+    replaced or is captured), records are written to the stderr stream instead.
+    """
+
+    def __init__(self, fd: Optional[int] = None):
+        super().__init__()
+        self.stream = None
+        if fd is None:
+            try:
+                fd = sys.stderr.fileno()
+            except (AttributeError, io.UnsupportedOperation, ValueError):
+                self.stream = sys.stderr
+        self.fd = fd
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            audit_data = getattr(record, "audit_data", None)
+            if audit_data is not None:
+                payload = dict(audit_data)
+            else:
+                payload = {"timestamp": record.created, "message": record.getMessage()}
+            payload["level"] = record.levelname
+
+            data = dumps_json(payload, default=str) + b"\n"
+            if self.fd is None:
+                if self.stream is not None:
+                    self.stream.write(data.decode())
+                    self.stream.flush()
+                return
+            while data:
+                data = data[os.write(self.fd, data):]
+        except Exception:
+            self.handleError(record)
 
 
 class AuditLogger:
@@ -79,18 +185,26 @@ class AuditLogger:
         self.encryption = get_encryption_instance()
         self.audit_logger = logging.getLogger("audit")
         self._setup_audit_logger()
+        # Queue and writer task of the event loop the events are logged from
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self.dropped_events = 0
 
     def _setup_audit_logger(self):
-        """Setup dedicated audit logger"""
-        # Create audit-specific handler if not exists
-        if not self.audit_logger.handlers:
-            handler = logging.StreamHandler()
-            formatter = logging.Formatter(
-                '%(asctime)s - AUDIT - %(levelname)s - %(message)s'
-            )
-            handler.setFormatter(formatter)
-            self.audit_logger.addHandler(handler)
-            self.audit_logger.setLevel(logging.INFO)
+        """Setup dedicated audit logger, once per process"""
+        global _audit_handler_installed
+        if _audit_handler_installed:
+            return
+
+        with _audit_handler_lock:
+            # The "audit" logger is process-wide: only the first instance configures it
+            if not _audit_handler_installed:
+                if not self.audit_logger.handlers:
+                    # One JSON object per line, including the full anonymized event
+                    self.audit_logger.addHandler(AuditJSONHandler())
+                    self.audit_logger.setLevel(logging.INFO)
+                _audit_handler_installed = True
 
     def log_event(self, event: AuditEvent):
         """Log an audit event"""
@@ -98,28 +212,80 @@ class AuditLogger:
             return
 
         try:
-            # Anonymize sensitive data
-            event_data = anonymize_log_data(event.to_dict())
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Not on an event loop: write the event right away
+            self._write_event(event)
+            return
+
+        if self._loop is not loop:
+            self._start_writer(loop)
+
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped_events += 1
+
+    def _start_writer(self, loop: asyncio.AbstractEventLoop):
+        """Create the event queue and its writer task on the given loop"""
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=_AUDIT_QUEUE_SIZE)
+        self._writer_task = loop.create_task(self._write_events(self._queue))
+
+    async def _write_events(self, queue: asyncio.Queue):
+        """Write queued events in batches until cancelled"""
+        while True:
+            batch = [await queue.get()]
+            # Give concurrent requests a moment to add to the batch
+            await asyncio.sleep(_AUDIT_FLUSH_INTERVAL)
+            while len(batch) < _AUDIT_BATCH_SIZE and not queue.empty():
+                batch.append(queue.get_nowait())
+
+            for event in batch:
+                self._write_event(event)
+
+    async def flush(self):
+        """Stop the writer task and write all events still queued"""
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+            self._writer_task = None
+
+        if self._queue is not None:
+            while not self._queue.empty():
+                self._write_event(self._queue.get_nowait())
+        self._loop = None
+        self._queue = None
+
+        if self.dropped_events:
+            logger.warning(f"Dropped {self.dropped_events} audit events because the queue was full")
+
+    def _write_event(self, event: AuditEvent):
+        """Anonymize, hash and write an audit event"""
+        try:
+            # Anonymize sensitive data; the dict is built here, so no copy is needed
+            event_data = anonymize_log_data(event.to_dict(), in_place=True)
 
             # Add integrity hash
             event_data['integrity_hash'] = self._calculate_integrity_hash(event_data)
 
             # Log the event
-            log_message = f"AUDIT: {event.event_type.value} - {event.message}"
-
-            if event.severity in [AuditSeverity.HIGH, AuditSeverity.CRITICAL]:
-                self.audit_logger.error(log_message, extra={"audit_data": event_data})
-            elif event.severity == AuditSeverity.MEDIUM:
-                self.audit_logger.warning(log_message, extra={"audit_data": event_data})
-            else:
-                self.audit_logger.info(log_message, extra={"audit_data": event_data})
+            log_message = f"AUDIT: {_EVENT_TYPE_VALUES[event.event_type]} - {event.message}"
+            self.audit_logger.log(
+                _SEVERITY_LOG_LEVELS[event.severity], log_message, extra={"audit_data": event_data}
+            )
 
         except Exception as e:
             logger.error(f"Failed to log audit event: {e}")
 
     def _calculate_integrity_hash(self, event_data: Dict[str, Any]) -> str:
         """Calculate integrity hash for audit event"""
-        # Create a deterministic string representation
+        # Hash a deterministic representation. The standard library serializer is
+        # used on purpose: orjson output differs (e.g. for datetimes), and the hash
+        # must not depend on which libraries are installed
         sorted_data = json.dumps(event_data, sort_keys=True, default=str)
         return hashlib.sha256(sorted_data.encode()).hexdigest()
 
@@ -135,7 +301,7 @@ class AuditLogger:
         event = AuditEvent(
             event_type=AuditEventType.AUTHENTICATION_SUCCESS,
             severity=AuditSeverity.LOW,
-            timestamp=datetime.now(timezone.utc),
+            timestamp=_utc_now(),
             user_id=user_id,
             session_id=None,
             ip_address=ip_address,
@@ -161,7 +327,7 @@ class AuditLogger:
         event = AuditEvent(
             event_type=AuditEventType.AUTHENTICATION_FAILURE,
             severity=AuditSeverity.MEDIUM,
-            timestamp=datetime.now(timezone.utc),
+            timestamp=_utc_now(),
             user_id=None,
             session_id=None,
             ip_address=ip_address,
@@ -198,7 +364,7 @@ class AuditLogger:
         event = AuditEvent(
             event_type=AuditEventType.API_ACCESS,
             severity=severity,
-            timestamp=datetime.now(timezone.utc),
+            timestamp=_utc_now(),
             user_id=user_id,
             session_id=None,
             ip_address=ip_address,
@@ -229,7 +395,7 @@ class AuditLogger:
         event = AuditEvent(
             event_type=AuditEventType.SECURITY_VIOLATION,
             severity=AuditSeverity.HIGH,
-            timestamp=datetime.now(timezone.utc),
+            timestamp=_utc_now(),
             user_id=None,
             session_id=None,
             ip_address=ip_address,
@@ -256,7 +422,7 @@ class AuditLogger:
         event = AuditEvent(
             event_type=AuditEventType.RATE_LIMIT_EXCEEDED,
             severity=AuditSeverity.MEDIUM,
-            timestamp=datetime.now(timezone.utc),
+            timestamp=_utc_now(),
             user_id=None,
             session_id=None,
             ip_address=ip_address,
@@ -277,18 +443,24 @@ class AuditMiddleware(BaseHTTPMiddleware):
 
     def __init__(self, app):
         super().__init__(app)
-        self.audit_logger = AuditLogger()
+        self.audit_logger = get_audit_logger()
+        self._enabled = settings.audit_logging_enabled
 
     async def dispatch(self, request: Request, call_next):
         """Log request and response"""
+        if not self._enabled:
+            return await call_next(request)
+
         start_time = time.time()
         request_id = request.headers.get("X-Request-ID", "unknown")
 
         # Extract request info
         ip_address = self._get_client_ip(request)
         user_agent = request.headers.get("user-agent", "unknown")
-        endpoint = str(request.url.path)
-        method = request.method
+        # Read straight from the ASGI scope rather than building a URL object
+        scope = request.scope
+        endpoint = scope.get("path", "")
+        method = scope.get("method", "")
 
         # Process request
         response = await call_next(request)
@@ -297,8 +469,11 @@ class AuditMiddleware(BaseHTTPMiddleware):
         response_time = time.time() - start_time
 
         # Extract user info if available
-        user_id = getattr(request.state, 'user_id', None)
-        api_key_id = getattr(request.state, 'api_key_id', None)
+        # request.state stores its attributes in scope["state"]; read the dict directly
+        # rather than probing attributes that are usually missing
+        state = scope.get("state") or {}
+        user_id = state.get('user_id')
+        api_key_id = state.get('api_key_id')
 
         # Log API access
         self.audit_logger.log_api_access(
@@ -320,7 +495,9 @@ class AuditMiddleware(BaseHTTPMiddleware):
         # Check for forwarded headers first
         forwarded_for = request.headers.get("x-forwarded-for")
         if forwarded_for:
-            return forwarded_for.split(",")[0].strip()
+            # Take the first IP in the chain without splitting the whole header
+            end = forwarded_for.find(",")
+            return (forwarded_for if end < 0 else forwarded_for[:end]).strip()
 
         real_ip = request.headers.get("x-real-ip")
         if real_ip:
@@ -340,10 +517,18 @@ def get_audit_logger() -> AuditLogger:
     """Get global audit logger instance"""
     global _audit_logger
     if _audit_logger is None:
-        _audit_logger = AuditLogger()
+        with _audit_logger_lock:
+            if _audit_logger is None:
+                _audit_logger = AuditLogger()
     return _audit_logger
 
 
+async def shutdown_audit_logger():
+    """Write any audit events still queued"""
+    if _audit_logger is not None:
+        await _audit_logger.flush()
+
+
 # Convenience functions
 def log_authentication_success(user_id: str, ip_address: str, user_agent: str, **kwargs):
     """Log successful authentication"""
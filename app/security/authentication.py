@@ -8,10 +8,12 @@ import hashlib
 import hmac
 import logging
 import secrets
+import threading
+import time
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from enum import Enum
-from typing import Optional, Dict, List, Set
+from typing import Optional, Dict, List, Set, Tuple
 
 from fastapi import HTTPException, Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -23,6 +25,16 @@ logger = logging.getLogger(__name__)
 # Global instance
 _api_key_manager = None
 
+# HMAC-SHA256 block size and pads (RFC 2104)
+_HMAC_BLOCK_SIZE = 64
+_HMAC_IPAD = bytes(0x36 for _ in range(_HMAC_BLOCK_SIZE))
+_HMAC_OPAD = bytes(0x5c for _ in range(_HMAC_BLOCK_SIZE))
+
+# Validated raw keys are remembered for a short time so repeated requests with
+# the same key skip the HMAC. Only keys that exist are cached
+_VALIDATION_CACHE_SIZE = 10_000
+_VALIDATION_CACHE_TTL = 60.0
+
 
 class APIKeyPermission(Enum):
     """API Key permission levels"""
@@ -31,52 +43,98 @@ class APIKeyPermission(Enum):
     ADMIN = "admin"
 
 
-@dataclass
+@dataclass(slots=True)
 class APIKeyInfo:
-    """API Key information"""
+    """API Key information
+
+    Expiry and last use are kept as unix timestamps so validation only compares
+    floats; the datetime properties are for display and the admin API.
+    """
     key_id: str
-    key_hash: str
+    key_hash: bytes
     permissions: Set[APIKeyPermission]
     created_at: datetime
-    expires_at: Optional[datetime]
-    last_used: Optional[datetime]
+    expires_at_ts: Optional[float]
+    last_used_ts: Optional[float]
     usage_count: int
     is_active: bool
     description: str
 
+    @property
+    def expires_at(self) -> Optional[datetime]:
+        """Expiry time, or None if the key does not expire"""
+        if self.expires_at_ts is None:
+            return None
+        return datetime.fromtimestamp(self.expires_at_ts, timezone.utc)
+
+    @expires_at.setter
+    def expires_at(self, value: Optional[datetime]):
+        self.expires_at_ts = value.timestamp() if value else None
+
+    @property
+    def last_used(self) -> Optional[datetime]:
+        """Time of the last successful validation, or None if never used"""
+        if self.last_used_ts is None:
+            return None
+        return datetime.fromtimestamp(self.last_used_ts, timezone.utc)
+
 
 class APIKeyManager:
     """Manages API keys with secure generation, validation, and permissions"""
 
     def __init__(self, secret_key: str):
         self.secret_key = secret_key.encode('utf-8')
-        self.api_keys: Dict[str, APIKeyInfo] = {}
+        self._hmac_inner, self._hmac_outer = self._init_hmac_states(self.secret_key)
+        # Copy-on-write: writers publish a new dict, so lookups and iteration never
+        # need a lock or see a table that changes size under them
+        self.api_keys: Dict[bytes, APIKeyInfo] = {}
+        self._write_lock = threading.Lock()
+        # Raw API key -> (key info, monotonic time it was cached), oldest first
+        self._validation_cache: Dict[str, Tuple[APIKeyInfo, float]] = {}
+        # Admin keys are fixed at startup and never expire, so they are pinned by raw
+        # key and never need hashing or a cache entry
+        self._admin_keys: Dict[str, APIKeyInfo] = {}
         self._load_admin_keys()
 
     def _load_admin_keys(self):
         """Load admin API keys from configuration"""
+        api_keys = dict(self.api_keys)
+        admin_keys = dict(self._admin_keys)
+        now = datetime.now(timezone.utc)
         for admin_key in settings.admin_api_keys:
             if admin_key:
                 key_hash = self._hash_key(admin_key)
-                self.api_keys[key_hash] = APIKeyInfo(
-                    key_id=f"admin_{len(self.api_keys)}",
+                api_keys[key_hash] = admin_keys[admin_key] = APIKeyInfo(
+                    key_id=f"admin_{len(api_keys)}",
                     key_hash=key_hash,
                     permissions={APIKeyPermission.READ, APIKeyPermission.WRITE, APIKeyPermission.ADMIN},
-                    created_at=datetime.now(timezone.utc),
-                    expires_at=None,  # Admin keys don't expire
-                    last_used=None,
+                    created_at=now,
+                    expires_at_ts=None,  # Admin keys don't expire
+                    last_used_ts=None,
                     usage_count=0,
                     is_active=True,
                     description="Admin API Key"
                 )
-
-    def _hash_key(self, api_key: str) -> str:
-        """Hash an API key using HMAC-SHA256"""
-        return hmac.new(
-            self.secret_key,
-            api_key.encode('utf-8'),
-            hashlib.sha256
-        ).hexdigest()
+        self.api_keys = api_keys
+        self._admin_keys = admin_keys
+
+    @staticmethod
+    def _init_hmac_states(secret_key: bytes) -> Tuple["hashlib._Hash", "hashlib._Hash"]:
+        """Hash the padded secret once so each HMAC only copies the two SHA-256 states"""
+        if len(secret_key) > _HMAC_BLOCK_SIZE:
+            secret_key = hashlib.sha256(secret_key).digest()
+        secret_key = secret_key.ljust(_HMAC_BLOCK_SIZE, b"\0")
+        inner = hashlib.sha256(bytes(k ^ p for k, p in zip(secret_key, _HMAC_IPAD)))
+        outer = hashlib.sha256(bytes(k ^ p for k, p in zip(secret_key, _HMAC_OPAD)))
+        return inner, outer
+
+    def _hash_key(self, api_key: str) -> bytes:
+        """Hash an API key using HMAC-SHA256, returning the raw 32-byte digest"""
+        inner = self._hmac_inner.copy()
+        inner.update(api_key.encode('utf-8'))
+        outer = self._hmac_outer.copy()
+        outer.update(inner.digest())
+        return outer.digest()
 
     def generate_api_key(
             self,
@@ -89,25 +147,29 @@ class APIKeyManager:
         api_key = f"cfsk_{secrets.token_urlsafe(32)}"
         key_hash = self._hash_key(api_key)
 
-        # Calculate expiry
-        expires_at = None
+        # Calculate expiry from the same instant as the creation time
+        now = datetime.now(timezone.utc)
+        expires_at_ts = None
         if expires_in_days:
-            expires_at = datetime.now(timezone.utc) + timedelta(days=expires_in_days)
+            expires_at_ts = (now + timedelta(days=expires_in_days)).timestamp()
         elif settings.api_key_expiry_days > 0:
-            expires_at = datetime.now(timezone.utc) + timedelta(days=settings.api_key_expiry_days)
+            expires_at_ts = (now + timedelta(days=settings.api_key_expiry_days)).timestamp()
 
         # Store key info
-        self.api_keys[key_hash] = APIKeyInfo(
-            key_id=f"key_{len(self.api_keys)}",
-            key_hash=key_hash,
-            permissions=permissions,
-            created_at=datetime.now(timezone.utc),
-            expires_at=expires_at,
-            last_used=None,
-            usage_count=0,
-            is_active=True,
-            description=description
-        )
+        with self._write_lock:
+            api_keys = dict(self.api_keys)
+            api_keys[key_hash] = APIKeyInfo(
+                key_id=f"key_{len(api_keys)}",
+                key_hash=key_hash,
+                permissions=permissions,
+                created_at=now,
+                expires_at_ts=expires_at_ts,
+                last_used_ts=None,
+                usage_count=0,
+                is_active=True,
+                description=description
+            )
+            self.api_keys = api_keys
 
         logger.info(f"Generated API key with permissions: {[p.value for p in permissions]}")
         return api_key
@@ -121,8 +183,7 @@ class APIKeyManager:
         if not api_key:
             return None
 
-        key_hash = self._hash_key(api_key)
-        key_info = self.api_keys.get(key_hash)
+        key_info = self._lookup_key(api_key)
 
         if not key_info:
             return None
@@ -132,7 +193,8 @@ class APIKeyManager:
             return None
 
         # Check expiry
-        if key_info.expires_at and datetime.now(timezone.utc) > key_info.expires_at:
+        now = time.time()
+        if key_info.expires_at_ts is not None and now > key_info.expires_at_ts:
             key_info.is_active = False
             logger.warning(f"API key {key_info.key_id} has expired")
             return None
@@ -142,15 +204,43 @@ class APIKeyManager:
             return None
 
         # Update usage
-        key_info.last_used = datetime.now(timezone.utc)
+        key_info.last_used_ts = now
         key_info.usage_count += 1
 
         return key_info
 
+    def _lookup_key(self, api_key: str) -> Optional[APIKeyInfo]:
+        """Find the stored info for a raw API key, hashing it only on a cache miss"""
+        key_info = self._admin_keys.get(api_key)
+        if key_info is not None:
+            return key_info
+
+        now = time.monotonic()
+        cached = self._validation_cache.get(api_key)
+        if cached is not None and now - cached[1] < _VALIDATION_CACHE_TTL:
+            # Status and expiry live on the shared info object and are still checked by the caller
+            return cached[0]
+
+        key_hash = self._hash_key(api_key)
+        key_info = self.api_keys.get(key_hash)
+        if key_info is None or not hmac.compare_digest(key_info.key_hash, key_hash):
+            self._validation_cache.pop(api_key, None)
+            return None
+
+        self._validation_cache[api_key] = (key_info, now)
+        if len(self._validation_cache) > _VALIDATION_CACHE_SIZE:
+            del self._validation_cache[next(iter(self._validation_cache))]
+        return key_info
+
+    def invalidate(self, api_key: str):
+        """Drop a raw API key from the validation cache"""
+        self._validation_cache.pop(api_key, None)
+
     def revoke_api_key(self, api_key: str) -> bool:
         """Revoke an API key"""
         key_hash = self._hash_key(api_key)
         key_info = self.api_keys.get(key_hash)
+        self.invalidate(api_key)
 
         if key_info:
             key_info.is_active = False
@@ -177,20 +267,24 @@ class APIKeyManager:
 
     def cleanup_expired_keys(self) -> int:
         """Remove expired keys and return count of removed keys"""
-        now = datetime.now(timezone.utc)
-        expired_keys = []
-
-        for key_hash, key_info in self.api_keys.items():
-            if (key_info.expires_at and now > key_info.expires_at) or not key_info.is_active:
-                expired_keys.append(key_hash)
-
-        for key_hash in expired_keys:
-            del self.api_keys[key_hash]
+        now = time.time()
+
+        with self._write_lock:
+            # Build the remaining table in one pass instead of deleting key by key
+            api_keys = {
+                key_hash: key_info
+                for key_hash, key_info in self.api_keys.items()
+                if key_info.is_active and (key_info.expires_at_ts is None or now <= key_info.expires_at_ts)
+            }
+            removed = len(self.api_keys) - len(api_keys)
+            self.api_keys = api_keys
 
-        if expired_keys:
-            logger.info(f"Cleaned up {len(expired_keys)} expired API keys")
+        if removed:
+            # Cached entries may point at removed keys
+            self._validation_cache.clear()
+            logger.info(f"Cleaned up {removed} expired API keys")
 
-        return len(expired_keys)
+        return removed
 
 
 def get_api_key_manager() -> APIKeyManager:
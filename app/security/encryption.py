@@ -6,9 +6,14 @@ Provides encryption utilities for sensitive data storage and transmission.
 
 import base64
 import hashlib
+import hmac
+import ipaddress
 import json
 import logging
+import re
 import secrets
+import struct
+from functools import lru_cache
 from typing import Optional, Union, Any
 
 from cryptography.fernet import Fernet
@@ -16,9 +21,38 @@ from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
 from app.core.config import settings
+from app.utils.serialization import dumps_json
 
 logger = logging.getLogger(__name__)
 
+# Fernet tokens start with the version byte 0x80, which base64url-encodes to "g".
+# Tokens from before the outer base64 layer was dropped start with "Z0" instead
+_FERNET_TOKEN_PREFIX = b"g"
+
+# Detailed version numbers stripped from user agents
+_UA_VERSION4_RE = re.compile(r'\d+\.\d+\.\d+\.\d+')
+_UA_VERSION3_RE = re.compile(r'\d+\.\d+\.\d+')
+
+# Path segments masked in URLs, matched in a single pass. The trailing slash is
+# only looked ahead at so that adjacent sensitive segments are all masked
+_SENSITIVE_PATH_RE = re.compile(r'/(?:api/key|admin|user|auth)(?=/)')
+
+# Headers whose values are masked in log entries
+_SENSITIVE_HEADERS = frozenset({'authorization', 'x-api-key', 'cookie', 'x-auth-token'})
+
+
+@lru_cache(maxsize=16)
+def _derive_fernet(encryption_key: str, salt: bytes) -> Fernet:
+    """Derive the Fernet cipher for a key and salt, running PBKDF2 once per pair"""
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        iterations=100000,
+    )
+    key = base64.urlsafe_b64encode(kdf.derive(encryption_key.encode()))
+    return Fernet(key)
+
 
 class DataEncryption:
     """Data encryption utilities using Fernet (AES 128)"""
@@ -49,15 +83,8 @@ class DataEncryption:
                 salt_bytes = b'cfscraper_default_salt_change_me'
                 logger.warning("Using fallback salt - this is not secure!")
 
-            # Derive a proper key from the encryption key
-            kdf = PBKDF2HMAC(
-                algorithm=hashes.SHA256(),
-                length=32,
-                salt=salt_bytes,
-                iterations=100000,
-            )
-            key = base64.urlsafe_b64encode(kdf.derive(self.encryption_key.encode()))
-            self._fernet = Fernet(key)
+            # Derive a proper key from the encryption key, reusing earlier derivations
+            self._fernet = _derive_fernet(self.encryption_key, salt_bytes)
             self._init_error = None
         except Exception as e:
             logger.error(f"Failed to initialize encryption: {e}")
@@ -66,7 +93,7 @@ class DataEncryption:
             self._init_error = str(e)
 
     def encrypt(self, data: Union[str, dict, list]) -> Optional[str]:
-        """Encrypt data and return base64 encoded string"""
+        """Encrypt data and return the Fernet token, which is already base64url encoded"""
         if not self._fernet:
             error_msg = f"Encryption not available - {self._init_error or 'initialization failed'}"
             logger.error(error_msg)
@@ -75,22 +102,34 @@ class DataEncryption:
             return None
 
         try:
-            # Convert data to JSON string if not already a string
+            # Serialize data straight to JSON bytes if not already a string
             if isinstance(data, (dict, list)):
-                data_str = json.dumps(data)
+                data_bytes = dumps_json(data)
             else:
-                data_str = str(data)
+                data_bytes = str(data).encode()
 
-            # Encrypt and encode
-            encrypted_data = self._fernet.encrypt(data_str.encode())
-            return base64.urlsafe_b64encode(encrypted_data).decode()
+            # Encrypt
+            encrypted_data = self._fernet.encrypt(data_bytes)
+            return encrypted_data.decode('ascii')
 
         except Exception as e:
             logger.error(f"Encryption failed: {e}")
             return None
 
     def decrypt(self, encrypted_data: str) -> Optional[str]:
-        """Decrypt base64 encoded encrypted data"""
+        """Decrypt a Fernet token, also accepting legacy base64-wrapped tokens"""
+        decrypted_data = self._decrypt_bytes(encrypted_data)
+        if decrypted_data is None:
+            return None
+
+        try:
+            return decrypted_data.decode()
+        except UnicodeDecodeError as e:
+            logger.error(f"Decryption failed: {e}")
+            return None
+
+    def _decrypt_bytes(self, encrypted_data: str) -> Optional[bytes]:
+        """Decrypt a Fernet token to the raw plaintext bytes"""
         if not self._fernet:
             error_msg = f"Encryption not available - {self._init_error or 'initialization failed'}"
             logger.error(error_msg)
@@ -98,10 +137,11 @@ class DataEncryption:
             return None
 
         try:
-            # Decode and decrypt
-            encrypted_bytes = base64.urlsafe_b64decode(encrypted_data.encode())
-            decrypted_data = self._fernet.decrypt(encrypted_bytes)
-            return decrypted_data.decode()
+            encrypted_bytes = encrypted_data.encode('ascii')
+            if not encrypted_bytes.startswith(_FERNET_TOKEN_PREFIX):
+                # Legacy token wrapped in a second base64 layer
+                encrypted_bytes = base64.urlsafe_b64decode(encrypted_bytes)
+            return self._fernet.decrypt(encrypted_bytes)
 
         except Exception as e:
             logger.error(f"Decryption failed: {e}")
@@ -109,11 +149,13 @@ class DataEncryption:
 
     def decrypt_json(self, encrypted_data: str) -> Optional[Union[dict, list]]:
         """Decrypt and parse JSON data"""
-        decrypted_str = self.decrypt(encrypted_data)
-        if decrypted_str:
+        # json.loads reads the UTF-8 bytes directly, without an intermediate str
+        decrypted_data = self._decrypt_bytes(encrypted_data)
+        if decrypted_data:
             try:
-                return json.loads(decrypted_str)
-            except json.JSONDecodeError as e:
+                return json.loads(decrypted_data)
+            except ValueError as e:
+                # JSONDecodeError, or UnicodeDecodeError for invalid UTF-8
                 logger.error(f"Failed to parse decrypted JSON: {e}")
         return None
 
@@ -122,23 +164,25 @@ class DataEncryption:
         if salt is None:
             salt = secrets.token_hex(16)
 
-        # Combine data and salt
-        combined = f"{data}{salt}".encode()
-
-        # Create hash
-        hash_obj = hashlib.sha256(combined)
-        return f"{salt}:{hash_obj.hexdigest()}"
+        return f"{salt}:{self._salted_digest(data, salt)}"
 
     def verify_hash(self, data: str, hashed_data: str) -> bool:
         """Verify data against hash"""
         try:
             salt, hash_value = hashed_data.split(':', 1)
-            expected_hash = self.hash_data(data, salt)
-            return expected_hash == hashed_data
+            # Constant-time comparison so the check does not leak how many characters match
+            return hmac.compare_digest(self._salted_digest(data, salt), hash_value)
         except Exception as e:
             logger.error(f"Hash verification failed: {e}")
             return False
 
+    @staticmethod
+    def _salted_digest(data: str, salt: str) -> str:
+        """SHA-256 of data followed by salt, fed in two parts instead of one concatenated string"""
+        hash_obj = hashlib.sha256(data.encode())
+        hash_obj.update(salt.encode())
+        return hash_obj.hexdigest()
+
 
 # Global encryption instance
 _encryption_instance = None
@@ -199,22 +243,22 @@ class DataAnonymizer:
     """Anonymize sensitive data for logs and analytics"""
 
     @staticmethod
+    @lru_cache(maxsize=4096)
     def anonymize_ip(ip: str) -> str:
         """Anonymize IP address"""
         if not ip or ip == "unknown":
             return ip
 
-        parts = ip.split('.')
-        if len(parts) == 4:  # IPv4
-            return f"{parts[0]}.{parts[1]}.xxx.xxx"
+        try:
+            packed = ipaddress.ip_address(ip).packed
+        except ValueError:
+            return "xxx.xxx.xxx.xxx"
 
-        # IPv6 - keep first 4 groups
-        if ':' in ip:
-            parts = ip.split(':')
-            if len(parts) >= 4:
-                return ':'.join(parts[:4]) + '::xxxx'
+        if len(packed) == 4:  # IPv4 - keep the /16
+            return f"{packed[0]}.{packed[1]}.xxx.xxx"
 
-        return "xxx.xxx.xxx.xxx"
+        # IPv6 - keep the first 4 groups (/64), also when the address is written compressed
+        return "%x:%x:%x:%x::xxxx" % struct.unpack("!4H", packed[:8])
 
     @staticmethod
     def anonymize_email(email: str) -> str:
@@ -235,43 +279,42 @@ class DataAnonymizer:
             return url
 
         # Remove query parameters
-        if '?' in url:
-            url = url.split('?')[0]
+        query_start = url.find('?')
+        if query_start != -1:
+            url = url[:query_start]
 
         # Replace sensitive path segments
-        sensitive_patterns = [
-            '/api/key/',
-            '/admin/',
-            '/user/',
-            '/auth/'
-        ]
-
-        for pattern in sensitive_patterns:
-            if pattern in url:
-                url = url.replace(pattern, '/***/')
-
-        return url
+        return _SENSITIVE_PATH_RE.sub('/***', url)
 
     @staticmethod
+    @lru_cache(maxsize=1024)
     def anonymize_user_agent(user_agent: str) -> str:
         """Anonymize user agent string"""
         if not user_agent:
             return user_agent
 
         # Keep browser and OS info, remove detailed version numbers
-        import re
-
-        # Remove detailed version numbers
-        user_agent = re.sub(r'\d+\.\d+\.\d+\.\d+', 'x.x.x.x', user_agent)
-        user_agent = re.sub(r'\d+\.\d+\.\d+', 'x.x.x', user_agent)
+        user_agent = _UA_VERSION4_RE.sub('x.x.x.x', user_agent)
+        user_agent = _UA_VERSION3_RE.sub('x.x.x', user_agent)
 
         return user_agent
 
 
-def anonymize_log_data(data: dict) -> dict:
-    """Anonymize sensitive data in log entries"""
-    anonymizer = DataAnonymizer()
-    anonymized = data.copy()
+def anonymize_log_data(data: dict, in_place: bool = False) -> dict:
+    """
+    Anonymize sensitive data in log entries
+
+    Args:
+        data: Log entry to anonymize
+        in_place: Modify and return the entry itself instead of a copy, for
+            callers that own a freshly built entry
+
+    Returns:
+        The anonymized log entry
+    """
+    # Client IPs and user agents repeat across requests, so their anonymization is memoized
+    anonymizer = DataAnonymizer
+    anonymized = data if in_place else data.copy()
 
     # Anonymize common sensitive fields
     if 'ip' in anonymized:
@@ -287,11 +330,15 @@ def anonymize_log_data(data: dict) -> dict:
         anonymized['user_agent'] = anonymizer.anonymize_user_agent(anonymized['user_agent'])
 
     # Remove sensitive headers
-    if 'headers' in anonymized and isinstance(anonymized['headers'], dict):
-        sensitive_headers = ['authorization', 'x-api-key', 'cookie', 'x-auth-token']
-        for header in sensitive_headers:
-            if header in anonymized['headers']:
-                anonymized['headers'][header] = '***'
+    headers = anonymized.get('headers')
+    if isinstance(headers, dict):
+        sensitive_headers = _SENSITIVE_HEADERS.intersection(headers)
+        if sensitive_headers:
+            if not in_place:
+                # Leave the caller's headers untouched
+                headers = anonymized['headers'] = headers.copy()
+            for header in sensitive_headers:
+                headers[header] = '***'
 
     return anonymized
 
@@ -6,18 +6,73 @@ including clickjacking, MIME sniffing, XSS, and more.
 """
 
 import logging
-from typing import Callable
+from dataclasses import dataclass
 
 from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
 
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
-
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    """Middleware to add security headers to all responses"""
+# Response headers removed from every response (security through obscurity)
+_REMOVED_HEADERS = frozenset({b"server", b"x-powered-by"})
+
+# Endpoint-specific Content Security Policies
+_CSP_API = (
+    "default-src 'none'; "
+    "connect-src 'self'; "
+    "frame-ancestors 'none'; "
+    "base-uri 'none'"
+)
+_CSP_DOCS = (
+    "default-src 'self'; "
+    "script-src 'self' 'unsafe-inline' 'unsafe-eval' https://cdn.jsdelivr.net; "
+    "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net https://fonts.googleapis.com; "
+    "img-src 'self' data: https: https://fastapi.tiangolo.com; "
+    "font-src 'self' data: https://fonts.gstatic.com https://cdn.jsdelivr.net; "
+    "connect-src 'self'; "
+    "frame-ancestors 'none'"
+)
+_CSP_DEFAULT = (
+    "default-src 'self'; "
+    "script-src 'self' 'unsafe-inline'; "
+    "style-src 'self' 'unsafe-inline'; "
+    "img-src 'self' data: https:; "
+    "frame-ancestors 'none'; "
+    "base-uri 'self'"
+)
+
+# Basic security headers for add_security_headers, encoded once
+_BASIC_SECURITY_HEADERS = (
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"x-xss-protection", b"1; mode=block"),
+    (b"referrer-policy", b"strict-origin-when-cross-origin"),
+    (
+        b"content-security-policy",
+        b"default-src 'self'; "
+        b"script-src 'self' 'unsafe-inline'; "
+        b"style-src 'self' 'unsafe-inline'; "
+        b"img-src 'self' data: https:; "
+        b"frame-ancestors 'none'"
+    ),
+)
+_BASIC_HEADER_NAMES = frozenset(name for name, _ in _BASIC_SECURITY_HEADERS)
+
+# Encoded CSP header for each policy, so responses reuse one shared pair
+_CSP_HEADERS = {
+    policy: (b"content-security-policy", policy.encode("latin-1"))
+    for policy in (_CSP_API, _CSP_DOCS, _CSP_DEFAULT)
+}
+
+
+class SecurityHeadersMiddleware:
+    """Middleware to add security headers to all responses
+
+    Implemented as plain ASGI middleware: it only rewrites the headers of the
+    response start message, so the response body is passed through untouched
+    instead of being streamed through BaseHTTPMiddleware's task group.
+    """
 
     def __init__(
             self,
@@ -31,7 +86,7 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
             referrer_policy: str = "strict-origin-when-cross-origin",
             permissions_policy: str = None
     ):
-        super().__init__(app)
+        self.app = app
         self.hsts_max_age = hsts_max_age
         self.hsts_include_subdomains = hsts_include_subdomains
         self.hsts_preload = hsts_preload
@@ -41,6 +96,33 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
         self.referrer_policy = referrer_policy
         self.permissions_policy = permissions_policy or self._default_permissions_policy()
 
+        # Headers that do not depend on the request, encoded once
+        self._static_headers = [
+            # Clickjacking protection
+            (b"x-frame-options", self.frame_options.encode("latin-1")),
+            # MIME sniffing protection
+            (b"x-content-type-options", self.content_type_options.encode("latin-1")),
+            (b"referrer-policy", self.referrer_policy.encode("latin-1")),
+            (b"permissions-policy", self.permissions_policy.encode("latin-1")),
+            # Legacy, but still useful for older browsers
+            (b"x-xss-protection", b"1; mode=block"),
+            (b"cross-origin-embedder-policy", b"require-corp"),
+            (b"cross-origin-opener-policy", b"same-origin"),
+            (b"cross-origin-resource-policy", b"same-origin"),
+        ]
+
+        hsts_value = f"max-age={self.hsts_max_age}"
+        if self.hsts_include_subdomains:
+            hsts_value += "; includeSubDomains"
+        if self.hsts_preload:
+            hsts_value += "; preload"
+        self._hsts_header = (b"strict-transport-security", hsts_value.encode("latin-1"))
+
+        # Headers replaced or removed on every response
+        self._managed_headers = _REMOVED_HEADERS.union(
+            name for name, _ in self._static_headers
+        ).union((b"strict-transport-security", b"content-security-policy"))
+
     def _default_csp_policy(self) -> str:
         """Default Content Security Policy"""
         return (
@@ -68,60 +150,35 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
             "usb=()"
         )
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        """Add security headers to response"""
-        response = await call_next(request)
-
+    async def __call__(self, scope, receive, send):
+        """Add security headers to the response"""
         # Only add security headers if enabled
-        if not settings.security_headers_enabled:
-            return response
-
-        # HSTS (HTTP Strict Transport Security)
-        if request.url.scheme == "https":
-            hsts_value = f"max-age={self.hsts_max_age}"
-            if self.hsts_include_subdomains:
-                hsts_value += "; includeSubDomains"
-            if self.hsts_preload:
-                hsts_value += "; preload"
-            response.headers["Strict-Transport-Security"] = hsts_value
-
-        # Content Security Policy - use endpoint-specific policy
-        csp_policy = get_csp_policy_for_endpoint(str(request.url.path))
-        response.headers["Content-Security-Policy"] = csp_policy
-
-        # X-Frame-Options (clickjacking protection)
-        response.headers["X-Frame-Options"] = self.frame_options
-
-        # X-Content-Type-Options (MIME sniffing protection)
-        response.headers["X-Content-Type-Options"] = self.content_type_options
-
-        # Referrer Policy
-        response.headers["Referrer-Policy"] = self.referrer_policy
-
-        # Permissions Policy
-        response.headers["Permissions-Policy"] = self.permissions_policy
+        if scope["type"] != "http" or not settings.security_headers_enabled:
+            await self.app(scope, receive, send)
+            return
 
-        # X-XSS-Protection (legacy, but still useful for older browsers)
-        response.headers["X-XSS-Protection"] = "1; mode=block"
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = self._response_headers(scope, message.get("headers", ()))
+            await send(message)
 
-        # Cross-Origin Embedder Policy
-        response.headers["Cross-Origin-Embedder-Policy"] = "require-corp"
+        await self.app(scope, receive, send_wrapper)
 
-        # Cross-Origin Opener Policy
-        response.headers["Cross-Origin-Opener-Policy"] = "same-origin"
+    def _response_headers(self, scope, headers) -> list:
+        """Build the response headers with the security headers applied"""
+        # Drop headers set by the application that are replaced or removed here,
+        # in one pass; raw header names are always lower-case
+        managed = self._managed_headers
+        raw_headers = [header for header in headers if header[0] not in managed]
+        raw_headers.extend(self._static_headers)
 
-        # Cross-Origin Resource Policy
-        response.headers["Cross-Origin-Resource-Policy"] = "same-origin"
-
-        # Server header removal (security through obscurity)
-        if "server" in response.headers:
-            del response.headers["server"]
-
-        # X-Powered-By header removal
-        if "x-powered-by" in response.headers:
-            del response.headers["x-powered-by"]
+        # HSTS (HTTP Strict Transport Security)
+        if scope.get("scheme") == "https":
+            raw_headers.append(self._hsts_header)
 
-        return response
+        # Content Security Policy - use endpoint-specific policy
+        raw_headers.append(_CSP_HEADERS[get_csp_policy_for_endpoint(scope["path"])])
+        return raw_headers
 
 
 def add_security_headers(response: Response) -> Response:
@@ -129,23 +186,10 @@ def add_security_headers(response: Response) -> Response:
     if not settings.security_headers_enabled:
         return response
 
-    # Basic security headers
-    headers = {
-        "X-Content-Type-Options": "nosniff",
-        "X-Frame-Options": "DENY",
-        "X-XSS-Protection": "1; mode=block",
-        "Referrer-Policy": "strict-origin-when-cross-origin",
-        "Content-Security-Policy": (
-            "default-src 'self'; "
-            "script-src 'self' 'unsafe-inline'; "
-            "style-src 'self' 'unsafe-inline'; "
-            "img-src 'self' data: https:; "
-            "frame-ancestors 'none'"
-        )
-    }
-
-    for header, value in headers.items():
-        response.headers[header] = value
+    # Basic security headers, replacing any the response already has
+    raw_headers = [header for header in response.raw_headers if header[0] not in _BASIC_HEADER_NAMES]
+    raw_headers.extend(_BASIC_SECURITY_HEADERS)
+    response.raw_headers[:] = raw_headers
 
     return response
 
@@ -175,62 +219,29 @@ def get_csp_policy_for_endpoint(endpoint: str) -> str:
 
     # API endpoints can have more restrictive CSP
     if endpoint.startswith("/api/"):
-        return (
-            "default-src 'none'; "
-            "connect-src 'self'; "
-            "frame-ancestors 'none'; "
-            "base-uri 'none'"
-        )
+        return _CSP_API
 
     # Documentation endpoints might need more permissive CSP
-    if endpoint.startswith("/docs") or endpoint.startswith("/redoc"):
-        return (
-            "default-src 'self'; "
-            "script-src 'self' 'unsafe-inline' 'unsafe-eval' https://cdn.jsdelivr.net; "
-            "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net https://fonts.googleapis.com; "
-            "img-src 'self' data: https: https://fastapi.tiangolo.com; "
-            "font-src 'self' data: https://fonts.gstatic.com https://cdn.jsdelivr.net; "
-            "connect-src 'self'; "
-            "frame-ancestors 'none'"
-        )
+    if endpoint.startswith(("/docs", "/redoc")):
+        return _CSP_DOCS
 
     # Default policy
-    return (
-        "default-src 'self'; "
-        "script-src 'self' 'unsafe-inline'; "
-        "style-src 'self' 'unsafe-inline'; "
-        "img-src 'self' data: https:; "
-        "frame-ancestors 'none'; "
-        "base-uri 'self'"
-    )
+    return _CSP_DEFAULT
 
 
+@dataclass(slots=True, frozen=True)
 class SecurityHeadersConfig:
     """Configuration for security headers"""
-
-    def __init__(
-            self,
-            hsts_enabled: bool = True,
-            hsts_max_age: int = 31536000,
-            hsts_include_subdomains: bool = True,
-            hsts_preload: bool = True,
-            csp_enabled: bool = True,
-            csp_report_only: bool = False,
-            frame_options: str = "DENY",
-            content_type_options: bool = True,
-            xss_protection: bool = True,
-            referrer_policy: str = "strict-origin-when-cross-origin"
-    ):
-        self.hsts_enabled = hsts_enabled
-        self.hsts_max_age = hsts_max_age
-        self.hsts_include_subdomains = hsts_include_subdomains
-        self.hsts_preload = hsts_preload
-        self.csp_enabled = csp_enabled
-        self.csp_report_only = csp_report_only
-        self.frame_options = frame_options
-        self.content_type_options = content_type_options
-        self.xss_protection = xss_protection
-        self.referrer_policy = referrer_policy
+    hsts_enabled: bool = True
+    hsts_max_age: int = 31536000
+    hsts_include_subdomains: bool = True
+    hsts_preload: bool = True
+    csp_enabled: bool = True
+    csp_report_only: bool = False
+    frame_options: str = "DENY"
+    content_type_options: bool = True
+    xss_protection: bool = True
+    referrer_policy: str = "strict-origin-when-cross-origin"
 
 
 def create_security_headers_middleware(config: SecurityHeadersConfig = None) -> SecurityHeadersMiddleware:
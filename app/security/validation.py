@@ -6,15 +6,212 @@ to prevent common attack vectors like XSS, SQL injection, and path traversal.
 """
 
 import html
+import ipaddress
 import logging
 import re
+import socket
+from functools import lru_cache
 from typing import Any, Dict, List, Optional
 from urllib.parse import urlparse
 
-from pydantic import BaseModel, field_validator, Field, model_validator
+from pydantic import BaseModel, field_validator, Field
+
+from app.models.job import ScraperType
 
 logger = logging.getLogger(__name__)
 
+# Matches an escaped character in a regex pattern
+_ESCAPED_CHAR_RE = re.compile(r"\\(.)")
+
+# Null bytes and control characters removed by sanitize_input. ASCII strings are
+# cleaned with a 128-entry str.translate table; other strings use the regex, as
+# translate falls back to a slow per-character path for non-ASCII text
+_CONTROL_CHARS = frozenset([*range(0x00, 0x09), 0x0B, 0x0C, *range(0x0E, 0x20), 0x7F])
+_CONTROL_CHARS_TABLE = [None if code in _CONTROL_CHARS else code for code in range(128)]
+_CONTROL_CHARS_RE = re.compile(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]')
+
+# Dangerous JavaScript patterns removed by prevent_xss, applied in order
+_XSS_REMOVAL_RES = (
+    re.compile(r'javascript:', re.IGNORECASE),
+    re.compile(r'vbscript:', re.IGNORECASE),
+    re.compile(r'on\w+\s*=', re.IGNORECASE),
+)
+
+# Dangerous SQL keywords and patterns removed by prevent_sql_injection, applied in order
+_SQL_REMOVAL_RES = (
+    re.compile(r'\b(DROP|DELETE|INSERT|UPDATE|CREATE|ALTER|EXEC)\b', re.IGNORECASE),
+    re.compile(r'--', re.IGNORECASE),
+    re.compile(r'/\*.*?\*/', re.IGNORECASE),
+    re.compile(r';\s*$', re.IGNORECASE),
+)
+
+
+# Characters with a special meaning in regex patterns
+_REGEX_META = frozenset(".^$*+?{}[]|()\\")
+
+
+def _split_alternatives(pattern: str) -> List[str]:
+    """Split a regex pattern at its top-level | separators"""
+    alternatives = []
+    depth = 0
+    in_class = False
+    start = 0
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 1
+        elif in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            alternatives.append(pattern[start:i])
+            start = i + 1
+        i += 1
+    alternatives.append(pattern[start:])
+    return alternatives
+
+
+def _group_end(pattern: str) -> Optional[int]:
+    """Return the index of the parenthesis closing the group the pattern starts with"""
+    depth = 0
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 1
+        elif in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    return None
+
+
+def _literal_prefix(pattern: str) -> str:
+    """Return the literal text every match of the pattern starts with"""
+    chars = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            if i + 1 == len(pattern) or pattern[i + 1].isalnum():
+                break
+            char = pattern[i + 1]
+            end = i + 2
+        elif char in _REGEX_META:
+            break
+        else:
+            end = i + 1
+        quantifier = pattern[end:end + 1]
+        if quantifier in ("?", "*", "{"):
+            # The character is optional
+            break
+        chars.append(char)
+        if quantifier == "+":
+            break
+        i = end
+    return "".join(chars)
+
+
+def _required_literals(pattern: str) -> Optional[tuple]:
+    """
+    Find literals one of which occurs in every match of a regex pattern
+
+    Handles the constructs the detection patterns are built from: top-level
+    alternation, wrapping groups, leading word boundaries and literal prefixes.
+
+    Returns:
+        Tuple of literals, or None if the pattern has no required literal
+    """
+    literals = []
+    for alternative in _split_alternatives(pattern):
+        while alternative.startswith("\\b"):
+            alternative = alternative[2:]
+        if alternative.startswith("("):
+            end = _group_end(alternative)
+            if end is None or alternative[end + 1:end + 2] in ("?", "*", "{"):
+                return None
+            found = _required_literals(alternative[1:end])
+            if found is None:
+                return None
+            literals.extend(found)
+        else:
+            prefix = _literal_prefix(alternative)
+            if not prefix:
+                return None
+            literals.append(prefix)
+    return tuple(literals)
+
+
+def _compile_checks(patterns: List[str], ignore_case: bool) -> tuple:
+    """
+    Prepare detection patterns once
+
+    Patterns that are plain literals are matched with substring checks, which
+    need no regex engine. The other patterns are compiled, and the literals
+    one of which each must contain are kept as a prefilter: the regex only
+    runs when the text contains one of them. With ignore_case, literals are
+    lower-cased and matched against the lower-cased text; as re folds some
+    non-ASCII characters onto ASCII letters (such as the long s), this is
+    only exact for ASCII text, and other text goes through the regexes alone.
+
+    Returns:
+        Tuple of the (literal, pattern) pairs, the (required literals,
+        compiled regex, pattern) triples, the (compiled regex, pattern) pairs
+        of all patterns, and whether the literal checks apply to any text
+    """
+    flags = re.IGNORECASE if ignore_case else 0
+    literals = []
+    regexes = []
+    for pattern in patterns:
+        literal = _ESCAPED_CHAR_RE.sub(r"\1", pattern)
+        if re.escape(literal) == pattern:
+            literals.append((literal.lower() if ignore_case else literal, pattern))
+        else:
+            required = _required_literals(pattern)
+            if required is not None and ignore_case:
+                required = tuple(item.lower() for item in required)
+            regexes.append((required, re.compile(pattern, flags), pattern))
+    all_regexes = tuple((re.compile(pattern, flags), pattern) for pattern in patterns)
+    return tuple(literals), tuple(regexes), all_regexes, not ignore_case
+
+
+def _find_pattern(text: str, checks: tuple) -> Optional[str]:
+    """Return the first pattern found in the text, or None"""
+    literals, regexes, all_regexes, any_text = checks
+    if any_text or text.isascii():
+        for literal, pattern in literals:
+            if literal in text:
+                return pattern
+        for required, regex, pattern in regexes:
+            if required is not None:
+                for literal in required:
+                    if literal in text:
+                        break
+                else:
+                    continue
+            if regex.search(text):
+                return pattern
+        return None
+
+    for regex, pattern in all_regexes:
+        if regex.search(text):
+            return pattern
+    return None
+
 
 class SecurityValidator:
     """Security validation utilities"""
@@ -60,55 +257,39 @@ class SecurityValidator:
         r";\s*\w+",
     ]
 
+    # Prepared forms of the patterns above, built once at import
+    _SQL_INJECTION_CHECKS = _compile_checks(SQL_INJECTION_PATTERNS, ignore_case=True)
+    _XSS_CHECKS = _compile_checks(XSS_PATTERNS, ignore_case=True)
+    _PATH_TRAVERSAL_CHECKS = _compile_checks(PATH_TRAVERSAL_PATTERNS, ignore_case=True)
+    _COMMAND_INJECTION_CHECKS = _compile_checks(COMMAND_INJECTION_PATTERNS, ignore_case=False)
+
     @classmethod
     def detect_sql_injection(cls, text: str) -> bool:
         """Detect potential SQL injection attempts"""
         if not text:
             return False
-
-        text_lower = text.lower()
-        for pattern in cls.SQL_INJECTION_PATTERNS:
-            if re.search(pattern, text_lower, re.IGNORECASE):
-                logger.warning(f"Potential SQL injection detected: {pattern}")
-                return True
-        return False
+        return cls._report(_find_pattern(text.lower(), cls._SQL_INJECTION_CHECKS), "SQL injection")
 
     @classmethod
     def detect_xss(cls, text: str) -> bool:
         """Detect potential XSS attempts"""
         if not text:
             return False
-
-        text_lower = text.lower()
-        for pattern in cls.XSS_PATTERNS:
-            if re.search(pattern, text_lower, re.IGNORECASE):
-                logger.warning(f"Potential XSS detected: {pattern}")
-                return True
-        return False
+        return cls._report(_find_pattern(text.lower(), cls._XSS_CHECKS), "XSS")
 
     @classmethod
     def detect_path_traversal(cls, text: str) -> bool:
         """Detect potential path traversal attempts"""
         if not text:
             return False
-
-        for pattern in cls.PATH_TRAVERSAL_PATTERNS:
-            if re.search(pattern, text, re.IGNORECASE):
-                logger.warning(f"Potential path traversal detected: {pattern}")
-                return True
-        return False
+        return cls._report(_find_pattern(text.lower(), cls._PATH_TRAVERSAL_CHECKS), "path traversal")
 
     @classmethod
     def detect_command_injection(cls, text: str) -> bool:
         """Detect potential command injection attempts"""
         if not text:
             return False
-
-        for pattern in cls.COMMAND_INJECTION_PATTERNS:
-            if re.search(pattern, text):
-                logger.warning(f"Potential command injection detected: {pattern}")
-                return True
-        return False
+        return cls._report(_find_pattern(text, cls._COMMAND_INJECTION_CHECKS), "command injection")
 
     @classmethod
     def is_safe_string(cls, text: str) -> bool:
@@ -116,22 +297,49 @@ class SecurityValidator:
         if not text:
             return True
 
-        return not any([
-            cls.detect_sql_injection(text),
-            cls.detect_xss(text),
-            cls.detect_path_traversal(text),
-            cls.detect_command_injection(text)
-        ])
+        # Cheapest and most often firing checks first: the command injection
+        # character class alone also matches most SQL and XSS payloads
+        if cls._report(_find_pattern(text, cls._COMMAND_INJECTION_CHECKS), "command injection"):
+            return False
+
+        # Lower-case once for all case-insensitive checks, and stop at the first hit
+        text_lower = text.lower()
+        return not (
+                cls._report(_find_pattern(text_lower, cls._PATH_TRAVERSAL_CHECKS), "path traversal") or
+                cls._report(_find_pattern(text_lower, cls._XSS_CHECKS), "XSS") or
+                cls._report(_find_pattern(text_lower, cls._SQL_INJECTION_CHECKS), "SQL injection")
+        )
+
+    @staticmethod
+    def _report(pattern: Optional[str], attack: str) -> bool:
+        """Log a detected pattern and return whether one was found"""
+        if pattern is None:
+            return False
+        logger.warning(f"Potential {attack} detected: {pattern}")
+        return True
 
 
 def sanitize_input(value: Any) -> Any:
     """Sanitize input value to prevent attacks"""
     if isinstance(value, str):
+        # Most values (methods, ids, plain text) need no escaping, stripping or
+        # truncation; control characters are never printable
+        if (
+                len(value) <= 10000 and
+                '<' not in value and '>' not in value and '&' not in value and
+                '"' not in value and "'" not in value and
+                value.isprintable()
+        ):
+            return value
+
         # HTML escape
         value = html.escape(value)
 
         # Remove null bytes and control characters
-        value = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]', '', value)
+        if value.isascii():
+            value = value.translate(_CONTROL_CHARS_TABLE)
+        else:
+            value = _CONTROL_CHARS_RE.sub('', value)
 
         # Limit length
         if len(value) > 10000:
@@ -148,11 +356,42 @@ def sanitize_input(value: Any) -> Any:
     return value
 
 
+@lru_cache(maxsize=1024)
+def _is_internal_host(hostname: str) -> bool:
+    """Check whether a URL hostname is localhost or an IP address outside the public internet"""
+    # Resolvers ignore a trailing dot, so 'localhost.' names the same host
+    hostname = hostname.rstrip('.').lower()
+    try:
+        ip = ipaddress.ip_address(hostname)
+    except ValueError:
+        # Resolvers also accept the inet_aton forms of an IPv4 address
+        # ('127.1', '2130706433', '0x7f000001', '0177.0.0.1')
+        try:
+            ip = ipaddress.IPv4Address(socket.inet_aton(hostname))
+        except OSError:
+            return hostname == 'localhost' or hostname.endswith('.localhost')
+
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return (
+            ip.is_private or ip.is_loopback or ip.is_link_local or
+            ip.is_multicast or ip.is_reserved or ip.is_unspecified
+    )
+
+
 def validate_url(url: str) -> str:
     """Validate and sanitize URL"""
     if not url:
         raise ValueError("URL cannot be empty")
 
+    # The same target URLs are submitted over and over, so results are memoized;
+    # rejected URLs raise and are not cached
+    return _validate_url_cached(url, getattr(validate_url, '_allow_localhost', False))
+
+
+@lru_cache(maxsize=4096)
+def _validate_url_cached(url: str, allow_localhost: bool) -> str:
+    """Validate a non-empty URL"""
     # Parse URL
     try:
         parsed = urlparse(url)
@@ -175,14 +414,9 @@ def validate_url(url: str) -> str:
         raise ValueError("URL must have a valid hostname")
 
     # Prevent localhost/internal network access in production
-    if not getattr(validate_url, '_allow_localhost', False):
+    if not allow_localhost:
         hostname = parsed.hostname
-        if hostname and (
-                hostname in ['localhost', '127.0.0.1', '0.0.0.0'] or
-                hostname.startswith('192.168.') or
-                hostname.startswith('10.') or
-                hostname.startswith('172.')
-        ):
+        if hostname and _is_internal_host(hostname):
             raise ValueError("Access to internal networks is not allowed")
 
     return url
@@ -193,30 +427,48 @@ def validate_headers(headers: Dict[str, str]) -> Dict[str, str]:
     if not headers:
         return {}
 
-    validated_headers = {}
+    # Scrapers send the same identity headers with every job, so results are
+    # memoized; a fresh dict is returned so callers cannot alter the cached result.
+    # The key holds the strings that are validated: raw values would let equal
+    # but differently rendered values share an entry (1 == True)
+    items = tuple((str(key), str(value)) for key, value in headers.items())
+    return dict(_validate_header_items(items))
+
 
-    for key, value in headers.items():
-        # Sanitize key and value
-        key = sanitize_input(str(key))
-        value = sanitize_input(str(value))
+@lru_cache(maxsize=1024)
+def _validate_header_items(items: tuple) -> tuple:
+    """Validate and sanitize header (key, value) string pairs, returning the pairs that are kept"""
+    # Sanitize keys and values
+    sanitized = [(sanitize_input(key), sanitize_input(value)) for key, value in items]
 
+    # Scan all headers at once. Sanitizing removed control characters, so the
+    # separators cannot be part of a field; a pattern can still match across
+    # fields, which only costs the per-header checks
+    joined = "\x01".join(f"{key}\x02{value}" for key, value in sanitized)
+    scan_headers = (_find_pattern(joined.lower(), SecurityValidator._XSS_CHECKS) is not None or
+                    _find_pattern(joined, SecurityValidator._COMMAND_INJECTION_CHECKS) is not None)
+
+    validated_headers = []
+
+    for key, value in sanitized:
         # Check for dangerous patterns
-        if SecurityValidator.detect_xss(key) or SecurityValidator.detect_xss(value):
-            logger.warning(f"Skipping header with XSS content: {key}")
-            continue
+        if scan_headers:
+            if SecurityValidator.detect_xss(key) or SecurityValidator.detect_xss(value):
+                logger.warning(f"Skipping header with XSS content: {key}")
+                continue
 
-        if SecurityValidator.detect_command_injection(key) or SecurityValidator.detect_command_injection(value):
-            logger.warning(f"Skipping header with command injection: {key}")
-            continue
+            if SecurityValidator.detect_command_injection(key) or SecurityValidator.detect_command_injection(value):
+                logger.warning(f"Skipping header with command injection: {key}")
+                continue
 
         # Limit header length
         if len(key) > 100 or len(value) > 1000:
             logger.warning(f"Skipping oversized header: {key}")
             continue
 
-        validated_headers[key] = value
+        validated_headers.append((key, value))
 
-    return validated_headers
+    return tuple(validated_headers)
 
 
 def prevent_xss(text: str) -> str:
@@ -228,9 +480,8 @@ def prevent_xss(text: str) -> str:
     text = html.escape(text)
 
     # Remove dangerous JavaScript patterns
-    text = re.sub(r'javascript:', '', text, flags=re.IGNORECASE)
-    text = re.sub(r'vbscript:', '', text, flags=re.IGNORECASE)
-    text = re.sub(r'on\w+\s*=', '', text, flags=re.IGNORECASE)
+    for pattern in _XSS_REMOVAL_RES:
+        text = pattern.sub('', text)
 
     return text
 
@@ -244,33 +495,19 @@ def prevent_sql_injection(text: str) -> str:
     text = text.replace("'", "''")
 
     # Remove dangerous SQL keywords and patterns
-    dangerous_patterns = [
-        r'\b(DROP|DELETE|INSERT|UPDATE|CREATE|ALTER|EXEC)\b',
-        r'--',
-        r'/\*.*?\*/',
-        r';\s*$'
-    ]
-
-    for pattern in dangerous_patterns:
-        text = re.sub(pattern, '', text, flags=re.IGNORECASE)
+    for pattern in _SQL_REMOVAL_RES:
+        text = pattern.sub('', text)
 
     return text
 
 
 class SecureBaseModel(BaseModel):
-    """Base model with security validation"""
+    """Base model for request bodies
 
-    @model_validator(mode='before')
-    @classmethod
-    def validate_security(cls, values):
-        """Apply security validation to all fields"""
-        if isinstance(values, dict):
-            for key, value in values.items():
-                if isinstance(value, str):
-                    if not SecurityValidator.is_safe_string(value):
-                        raise ValueError(f"Field '{key}' contains potentially dangerous content")
-                    values[key] = sanitize_input(value)
-        return values
+    Fields are not scanned as a whole; models attach security validators to
+    the free-text fields that carry user input, while fields constrained by a
+    pattern are left to it.
+    """
 
 
 from typing import Annotated
@@ -303,7 +540,7 @@ class SecureScrapeRequest(SecureBaseModel):
     method: str = Field(default="GET", pattern=r"^(GET|POST|PUT|DELETE|HEAD|OPTIONS)$")
     headers: Optional[SecureHeadersField] = None
     data: Optional[Dict[str, Any]] = None
-    scraper_type: str = Field(pattern=r"^(selenium|cloudscraper)$")
+    scraper_type: ScraperType
     tags: Optional[List[str]] = Field(default=None, max_items=10)
     priority: int = Field(default=0, ge=-10, le=10)
 
@@ -121,7 +121,7 @@ class AsyncJobExecutor:
                             job_id=job.id,
                             task_id=task_id,
                             status_code=result.status_code,
-                            response_headers=result.headers,
+                            response_headers=dict(result.headers),
                             response_content=result.content,
                             response_time=int(result.response_time),
                             content_length=len(result.content),
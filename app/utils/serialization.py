@@ -0,0 +1,43 @@
+"""
+JSON serialization helpers.
+
+orjson is used when it is installed; otherwise the standard library json
+module is used with the same compact, UTF-8 output.
+"""
+
+import json
+from typing import Any, Callable, Optional
+
+try:
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+def dumps_json(obj: Any, sort_keys: bool = False, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """
+    Serialize an object to compact JSON bytes
+
+    Args:
+        obj: Object to serialize
+        sort_keys: Whether to sort dictionary keys
+        default: Fallback for objects that are not natively serializable
+
+    Returns:
+        UTF-8 encoded JSON
+    """
+    if HAS_ORJSON:
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=default, option=option)
+
+    return json.dumps(
+        obj,
+        sort_keys=sort_keys,
+        default=default,
+        separators=(",", ":"),
+        ensure_ascii=False
+    ).encode()
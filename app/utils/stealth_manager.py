@@ -289,8 +289,10 @@ class CaptchaDetector:
         "__fxdriver_evaluate", "__driver_unwrapped",
     ]
 
-    def __init__(self):
-        self._lock = asyncio.Lock()
+    # (pattern, lowercased pattern) pairs, lowercased once instead of on every scan.
+    # Plain substring tests beat a combined regex here: each is a single C-level scan
+    _LOWERED_INDICATORS = tuple(zip(CAPTCHA_INDICATORS, map(str.lower, CAPTCHA_INDICATORS)))
+    _LOWERED_JS_PATTERNS = tuple(zip(JS_DETECTION_PATTERNS, map(str.lower, JS_DETECTION_PATTERNS)))
 
     async def detect_captcha(self, content: str, url: str = "") -> Dict[str, Any]:
         """
@@ -303,69 +305,67 @@ class CaptchaDetector:
         Returns:
             Dictionary with detection results
         """
-        async with self._lock:
-            detection_result = {
-                "has_captcha": False,
-                "captcha_type": None,
-                "confidence": 0.0,
-                "indicators": [],
-                "suggested_action": "continue"
-            }
-
-            content_lower = content.lower()
-            indicators_found = []
-
-            # Check for text-based indicators
-            for indicator in self.CAPTCHA_INDICATORS:
-                if indicator.lower() in content_lower:
-                    indicators_found.append(indicator)
-
-            # Check for specific captcha services
-            captcha_type = None
-            if any("recaptcha" in ind for ind in indicators_found):
-                captcha_type = "recaptcha"
-            elif any("hcaptcha" in ind for ind in indicators_found):
-                captcha_type = "hcaptcha"
-            elif any("cloudflare" in ind for ind in indicators_found):
-                captcha_type = "cloudflare"
-            elif any("captcha" in ind for ind in indicators_found):
-                captcha_type = "generic"
-
-            # Calculate confidence based on number of indicators
-            confidence = min(len(indicators_found) * 0.3, 1.0)
-
-            # Determine if captcha is present
-            has_captcha = len(indicators_found) > 0 or confidence > 0.5
-
-            # Suggest action based on detection
-            suggested_action = "continue"
-            if has_captcha:
-                if captcha_type == "cloudflare":
-                    suggested_action = "wait_and_retry"
-                elif captcha_type in ["recaptcha", "hcaptcha"]:
-                    suggested_action = "manual_intervention"
-                else:
-                    suggested_action = "retry_with_delay"
-
-            detection_result.update({
-                "has_captcha": has_captcha,
-                "captcha_type": captcha_type,
-                "confidence": confidence,
-                "indicators": indicators_found,
-                "suggested_action": suggested_action
-            })
+        detection_result = {
+            "has_captcha": False,
+            "captcha_type": None,
+            "confidence": 0.0,
+            "indicators": [],
+            "suggested_action": "continue"
+        }
 
-            if has_captcha:
-                logger.warning(f"Captcha detected on {url}: {captcha_type} (confidence: {confidence:.2f})")
+        content_lower = content.lower()
 
-            return detection_result
+        # Check for text-based indicators
+        indicators_found = [
+            indicator for indicator, lowered in self._LOWERED_INDICATORS if lowered in content_lower
+        ]
+
+        # Check for specific captcha services
+        captcha_type = None
+        if any("recaptcha" in ind for ind in indicators_found):
+            captcha_type = "recaptcha"
+        elif any("hcaptcha" in ind for ind in indicators_found):
+            captcha_type = "hcaptcha"
+        elif any("cloudflare" in ind for ind in indicators_found):
+            captcha_type = "cloudflare"
+        elif any("captcha" in ind for ind in indicators_found):
+            captcha_type = "generic"
+
+        # Calculate confidence based on number of indicators
+        confidence = min(len(indicators_found) * 0.3, 1.0)
+
+        # Determine if captcha is present
+        has_captcha = len(indicators_found) > 0 or confidence > 0.5
+
+        # Suggest action based on detection
+        suggested_action = "continue"
+        if has_captcha:
+            if captcha_type == "cloudflare":
+                suggested_action = "wait_and_retry"
+            elif captcha_type in ["recaptcha", "hcaptcha"]:
+                suggested_action = "manual_intervention"
+            else:
+                suggested_action = "retry_with_delay"
+
+        detection_result.update({
+            "has_captcha": has_captcha,
+            "captcha_type": captcha_type,
+            "confidence": confidence,
+            "indicators": indicators_found,
+            "suggested_action": suggested_action
+        })
+
+        if has_captcha:
+            logger.warning(f"Captcha detected on {url}: {captcha_type} (confidence: {confidence:.2f})")
+
+        return detection_result
 
     async def detect_js_detection(self, content: str) -> bool:
         """Detect JavaScript-based bot detection"""
         content_lower = content.lower()
 
-        for pattern in self.JS_DETECTION_PATTERNS:
-            if pattern.lower() in content_lower:
+        for pattern, lowered in self._LOWERED_JS_PATTERNS:
+            if lowered in content_lower:
                 logger.warning(f"JavaScript bot detection pattern found: {pattern}")
                 return True
 
@@ -409,6 +409,9 @@ class JSBypassManager:
         """,
     ]
 
+    # STEALTH_SCRIPTS joined into a single script, built on first use
+    _stealth_source: Optional[str] = None
+
     def __init__(self):
         pass
 
@@ -416,6 +419,16 @@ class JSBypassManager:
         """Get JavaScript scripts for stealth mode"""
         return self.STEALTH_SCRIPTS.copy()
 
+    def get_stealth_source(self) -> str:
+        """Get all stealth scripts as one script, for injection with a single call"""
+        if JSBypassManager._stealth_source is None:
+            # Each script runs in its own block so one failing script (or a
+            # repeated const declaration) does not stop the others
+            JSBypassManager._stealth_source = "(() => {%s})();" % "".join(
+                f"try {{{script}}} catch (e) {{}}" for script in self.STEALTH_SCRIPTS
+            )
+        return JSBypassManager._stealth_source
+
     async def inject_stealth_scripts(self, driver):
         """Inject stealth scripts into a Selenium driver"""
         try:
@@ -427,9 +440,15 @@ class JSBypassManager:
 
 
 # Add captcha detector and JS bypass manager to stealth manager
+_captcha_detector: Optional[CaptchaDetector] = None
+
+
 def get_captcha_detector() -> CaptchaDetector:
     """Get captcha detector instance"""
-    return CaptchaDetector()
+    global _captcha_detector
+    if _captcha_detector is None:
+        _captcha_detector = CaptchaDetector()
+    return _captcha_detector
 
 
 def get_js_bypass_manager() -> JSBypassManager:
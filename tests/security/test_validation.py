@@ -1,13 +1,18 @@
 """
 Security and input validation tests
 """
+import asyncio
+import hashlib
+import hmac
 import time
 from unittest.mock import Mock, patch
 
 import pytest
 
+from app.security.audit import AuditJSONHandler, AuditLogger
 from app.security.authentication import APIKeyManager, APIKeyPermission
-from app.security.encryption import DataEncryption, anonymize_log_data
+from app.security.encryption import DataAnonymizer, DataEncryption, anonymize_log_data
+from app.security.headers import SecurityHeadersMiddleware
 # Import security modules for testing
 from app.security.validation import SecurityValidator, sanitize_input, validate_url
 
@@ -562,6 +567,22 @@ class TestSecurityValidation:
         for input_str in safe_inputs:
             assert not SecurityValidator.detect_path_traversal(input_str), f"False positive for safe input: {input_str}"
 
+    def test_literal_prefilters(self):
+        """Test regexes are prefiltered by the literals their matches must contain"""
+        from app.security.validation import _required_literals
+
+        assert _required_literals(r"(\b(OR|AND)\s+\d+)") == ("OR", "AND")
+        assert _required_literals(r"<iframe[^>]*>") == ("<iframe",)
+        assert _required_literals(r"(;|\|\||&&)") == (";", "||", "&&")
+        assert _required_literals(r"[;&|]") is None
+        assert _required_literals(r"(ab)?c") is None
+        assert _required_literals(r"ab?c") == ("a",)
+
+        # re folds the long s onto "s", which plain lower-casing does not
+        assert SecurityValidator.detect_xss("javaſcript:alert")
+        assert SecurityValidator.detect_path_traversal("/etc/paſſwd")
+        assert SecurityValidator.detect_sql_injection("ſELECT name")
+
     def test_input_sanitization(self):
         """Test input sanitization"""
         # Test string sanitization
@@ -614,6 +635,103 @@ class TestSecurityValidation:
             with pytest.raises(ValueError):
                 validate_url(url)
 
+    def test_url_validation_blocks_internal_networks(self):
+        """Test internal addresses are rejected by IP range, not by hostname prefix"""
+        internal_urls = [
+            "http://localhost:8000",
+            "http://127.0.0.1/admin",
+            "http://0.0.0.0",
+            "http://10.0.0.5",
+            "http://172.20.1.1",
+            "http://192.168.1.1",
+            "http://169.254.169.254/latest/meta-data",
+            "http://[::1]/",
+            "http://[fd00::1]/",
+            "http://127.1/",
+            "http://2130706433/",
+            "http://0x7f000001/",
+            "http://0177.0.0.1/",
+            "http://localhost./",
+        ]
+        for url in internal_urls:
+            with pytest.raises(ValueError, match="internal networks"):
+                validate_url(url)
+
+        # Public addresses and hostnames that only look like private ranges are allowed
+        for url in ["http://172.32.0.1", "http://10.example.com", "http://8.8.8.8"]:
+            assert validate_url(url) == url
+
+    def test_header_validation_is_memoized(self):
+        """Test repeated header dicts are validated once and callers get their own copy"""
+        from app.security.validation import _validate_header_items, validate_headers
+
+        headers = {"User-Agent": "memo-test-agent", "X-Bad": "value; rm -rf /"}
+        _validate_header_items.cache_clear()
+
+        first = validate_headers(headers)
+        first["X-Added"] = "caller change"
+        second = validate_headers(headers)
+
+        assert second == {"User-Agent": "memo-test-agent"}
+        assert _validate_header_items.cache_info().hits == 1
+
+        # Values are cached by their string form, which is what is validated
+        assert validate_headers({"X-Flag": 1}) == {"X-Flag": "1"}
+        assert validate_headers({"X-Flag": True}) == {"X-Flag": "True"}
+
+        # Unhashable values are validated by their string form too
+        class Unhashable:
+            __hash__ = None
+
+            def __str__(self):
+                return "plain"
+
+        assert validate_headers({"X-Value": Unhashable()}) == {"X-Value": "plain"}
+
+    def test_header_validation_checks_each_header_on_match(self):
+        """Test only the offending header is dropped when the combined scan fires"""
+        headers = {
+            "User-Agent": "scan-test-agent",
+            "Referer": "javascript:alert",
+            "Accept": "text/html",
+            "X-Long": "a" * 1001
+        }
+
+        from app.security.validation import validate_headers
+        assert validate_headers(headers) == {"User-Agent": "scan-test-agent", "Accept": "text/html"}
+        assert validate_headers({"Accept": "text/html", "X-Long": "a" * 1001}) == {"Accept": "text/html"}
+
+    def test_scrape_request_validates_free_text_fields(self):
+        """Test only URL, tags and data are scanned in scrape requests"""
+        from pydantic import ValidationError
+        from app.security.validation import SecureScrapeRequest
+
+        request = SecureScrapeRequest(
+            url="https://example.com/search?q=a&page=2",
+            scraper_type="cloudscraper",
+            tags=["news"],
+            data={"comment": "<b>hi</b>"}
+        )
+        assert request.url == "https://example.com/search?q=a&page=2"
+        assert request.data == {"comment": "&lt;b&gt;hi&lt;/b&gt;"}
+
+        with pytest.raises(ValidationError):
+            SecureScrapeRequest(url="https://example.com", scraper_type="cloudscraper",
+                                tags=["<script>alert(1)</script>"])
+        with pytest.raises(ValidationError):
+            SecureScrapeRequest(url="https://example.com/<script>alert(1)</script>", scraper_type="cloudscraper")
+        with pytest.raises(ValidationError):
+            SecureScrapeRequest(url="https://example.com", scraper_type="requests; ls")
+
+    def test_scrape_request_accepts_every_scraper_type(self):
+        """Test that every registered scraper type can be requested"""
+        from app.models.job import ScraperType
+        from app.security.validation import SecureScrapeRequest
+
+        for scraper_type in ScraperType:
+            request = SecureScrapeRequest(url="https://example.com", scraper_type=scraper_type.value)
+            assert request.scraper_type == scraper_type
+
 
 @pytest.mark.security
 class TestAPIKeyAuthentication:
@@ -700,6 +818,68 @@ class TestAPIKeyAuthentication:
         key_info = manager.validate_api_key(api_key, APIKeyPermission.READ)
         assert key_info is None
 
+    def test_api_key_table_is_copy_on_write(self):
+        """Test that adding or cleaning keys never mutates a table being read"""
+        manager = APIKeyManager("test-secret-key")
+        api_key = manager.generate_api_key(permissions={APIKeyPermission.READ})
+
+        keys = iter(manager.api_keys.values())
+        manager.generate_api_key(permissions={APIKeyPermission.READ})
+        manager.revoke_api_key(api_key)
+        manager.cleanup_expired_keys()
+
+        # Iterating the table published before the writes still works
+        assert len(list(keys)) == 1
+        assert len(manager.api_keys) == 1
+
+    def test_admin_keys_skip_hashing(self):
+        """Test configured admin keys validate without hashing and can still be revoked"""
+        admin_key = "admin-key-" + "x" * 32
+        with patch("app.security.authentication.settings.admin_api_keys", [admin_key]):
+            manager = APIKeyManager("test-secret-key")
+
+        with patch.object(manager, "_hash_key", wraps=manager._hash_key) as hash_key:
+            key_info = manager.validate_api_key(admin_key, APIKeyPermission.ADMIN)
+        assert key_info is manager.api_keys[manager._hash_key(admin_key)]
+        assert hash_key.call_count == 0
+
+        manager.revoke_api_key(admin_key)
+        assert manager.validate_api_key(admin_key, APIKeyPermission.ADMIN) is None
+
+    def test_api_key_hash_matches_hmac(self):
+        """Test the precomputed HMAC states give standard HMAC-SHA256 digests"""
+        for secret in ("test-secret-key", "s" * 100):
+            manager = APIKeyManager(secret)
+            expected = hmac.new(secret.encode(), b"cfsk_example", hashlib.sha256).digest()
+            assert manager._hash_key("cfsk_example") == expected
+            # The precomputed states are not consumed by hashing
+            assert manager._hash_key("cfsk_example") == expected
+
+    def test_api_key_validation_is_cached(self):
+        """Test repeated validation of the same key hashes it only once"""
+        manager = APIKeyManager("test-secret-key")
+        api_key = manager.generate_api_key(permissions={APIKeyPermission.READ})
+
+        with patch.object(manager, "_hash_key", wraps=manager._hash_key) as hash_key:
+            assert manager.validate_api_key(api_key, APIKeyPermission.READ) is not None
+            assert manager.validate_api_key(api_key, APIKeyPermission.READ) is not None
+            assert manager.validate_api_key("cfsk_unknown", APIKeyPermission.READ) is None
+            assert manager.validate_api_key("cfsk_unknown", APIKeyPermission.READ) is None
+
+        # One hash for the valid key, and unknown keys are never cached
+        assert hash_key.call_count == 3
+
+        # Usage is recorded as a timestamp and exposed as a datetime
+        key_info = manager.validate_api_key(api_key, APIKeyPermission.READ)
+        assert key_info.last_used_ts is not None
+        assert abs(key_info.last_used.timestamp() - key_info.last_used_ts) < 1e-3
+
+        # Permission checks still apply to cached keys
+        assert manager.validate_api_key(api_key, APIKeyPermission.ADMIN) is None
+
+        manager.revoke_api_key(api_key)
+        assert manager.validate_api_key(api_key, APIKeyPermission.READ) is None
+
 
 @pytest.mark.security
 class TestDataEncryption:
@@ -718,6 +898,31 @@ class TestDataEncryption:
         decrypted = encryption.decrypt(encrypted)
         assert decrypted == original_data
 
+    def test_encrypted_data_is_a_plain_fernet_token(self):
+        """Test tokens are not wrapped in a second base64 layer, and legacy tokens still decrypt"""
+        import base64
+
+        encryption = DataEncryption("test-encryption-key")
+        encrypted = encryption.encrypt("sensitive data")
+        assert encrypted.startswith("gAAAAA")
+
+        legacy = base64.urlsafe_b64encode(encrypted.encode()).decode()
+        assert encryption.decrypt(legacy) == "sensitive data"
+
+    def test_key_rotation_reuses_derived_keys(self):
+        """Test that the expensive key derivation runs once per key"""
+        from app.security.encryption import _derive_fernet, rotate_encryption_key
+
+        encrypted = DataEncryption("rotation-old-key").encrypt("sensitive data")
+        rotated = rotate_encryption_key("rotation-old-key", "rotation-new-key", encrypted)
+        misses = _derive_fernet.cache_info().misses
+
+        rotated_again = rotate_encryption_key("rotation-old-key", "rotation-new-key", encrypted)
+
+        assert _derive_fernet.cache_info().misses == misses
+        assert DataEncryption("rotation-new-key").decrypt(rotated) == "sensitive data"
+        assert DataEncryption("rotation-new-key").decrypt(rotated_again) == "sensitive data"
+
     def test_json_encryption_decryption(self):
         """Test JSON data encryption and decryption"""
         encryption = DataEncryption("test-encryption-key")
@@ -776,6 +981,115 @@ class TestDataEncryption:
         assert anonymized["headers"]["authorization"] == "***"
         assert anonymized["headers"]["x-api-key"] == "***"
 
+    def test_ip_anonymization(self):
+        """Test IPv4 and IPv6 addresses keep only their network prefix"""
+        assert DataAnonymizer.anonymize_ip("192.168.1.100") == "192.168.xxx.xxx"
+        assert DataAnonymizer.anonymize_ip("2001:db8:85a3:8d3:1319:8a2e:370:7348") == "2001:db8:85a3:8d3::xxxx"
+        assert DataAnonymizer.anonymize_ip("2001:db8::1") == "2001:db8:0:0::xxxx"
+        assert DataAnonymizer.anonymize_ip("not-an-ip") == "xxx.xxx.xxx.xxx"
+        assert DataAnonymizer.anonymize_ip("unknown") == "unknown"
+
+    def test_url_anonymization(self):
+        """Test sensitive path segments and query parameters are removed from URLs"""
+        assert DataAnonymizer.anonymize_url("https://example.com/api/key/abc?token=1") == "https://example.com/***/abc"
+        assert DataAnonymizer.anonymize_url("https://example.com/admin/user/42") == "https://example.com/***/***/42"
+        assert DataAnonymizer.anonymize_url("https://example.com/users/42") == "https://example.com/users/42"
+
+    def test_log_data_anonymization_copy_and_in_place(self):
+        """Test the input entry is only modified when anonymizing in place"""
+        log_data = {"ip": "192.168.1.100", "headers": {"cookie": "session=1"}}
+
+        anonymized = anonymize_log_data(log_data)
+        assert log_data == {"ip": "192.168.1.100", "headers": {"cookie": "session=1"}}
+        assert anonymized == {"ip": "192.168.xxx.xxx", "headers": {"cookie": "***"}}
+
+        assert anonymize_log_data(log_data, in_place=True) is log_data
+        assert log_data == anonymized
+
+    def test_user_agent_anonymization_is_memoized(self):
+        """Test that repeated user agents are anonymized once"""
+        user_agent = "Mozilla/5.0 Chrome/91.0.4472.124 memo-test"
+        DataAnonymizer.anonymize_user_agent.cache_clear()
+
+        first = anonymize_log_data({"user_agent": user_agent})
+        second = anonymize_log_data({"user_agent": user_agent})
+
+        assert first["user_agent"] == second["user_agent"] == "Mozilla/5.0 Chrome/x.x.x.x memo-test"
+        assert DataAnonymizer.anonymize_user_agent.cache_info().hits == 1
+
+
+@pytest.mark.security
+class TestAuditLogging:
+    """Test audit logging"""
+
+    async def test_events_are_written_in_background(self):
+        """Test that events are queued on the request path and written later"""
+        logger = AuditLogger()
+
+        with patch.object(logger, '_write_event') as mock_write:
+            for _ in range(3):
+                logger.log_api_access("/api/v1/jobs", "GET", 200, "10.0.0.1", "test-agent")
+            assert mock_write.call_count == 0
+
+            await asyncio.sleep(0.1)
+            assert mock_write.call_count == 3
+
+            logger.log_api_access("/api/v1/jobs", "GET", 200, "10.0.0.1", "test-agent")
+            await logger.flush()
+            assert mock_write.call_count == 4
+
+    def test_events_outside_event_loop_are_written_directly(self):
+        """Test that events logged without a running loop are not queued"""
+        logger = AuditLogger()
+
+        with patch.object(logger, '_write_event') as mock_write:
+            logger.log_api_access("/api/v1/jobs", "GET", 200, "10.0.0.1", "test-agent")
+
+        mock_write.assert_called_once()
+
+    def test_json_handler_writes_audit_data(self, tmp_path):
+        """Test that audit records are written as JSON lines with their event data"""
+        import json
+        import logging
+
+        path = tmp_path / "audit.log"
+        with open(path, "wb") as f:
+            handler = AuditJSONHandler(f.fileno())
+            record = logging.LogRecord("audit", logging.WARNING, __file__, 1, "AUDIT", None, None)
+            record.audit_data = {"event_type": "auth_failure", "status_code": 401}
+            handler.emit(record)
+
+        line = json.loads(path.read_bytes().splitlines()[0])
+        assert line == {"event_type": "auth_failure", "status_code": 401, "level": "WARNING"}
+
+    def test_json_handler_without_stderr_descriptor(self):
+        """Test that the handler writes to stderr when it has no file descriptor"""
+        import io
+        import json
+        import logging
+
+        stream = io.StringIO()
+        with patch('sys.stderr', stream):
+            handler = AuditJSONHandler()
+        record = logging.LogRecord("audit", logging.INFO, __file__, 1, "AUDIT", None, None)
+        record.audit_data = {"event_type": "api_access"}
+        handler.emit(record)
+
+        assert json.loads(stream.getvalue()) == {"event_type": "api_access", "level": "INFO"}
+
+    def test_integrity_hash_does_not_depend_on_orjson(self):
+        """Test that the integrity hash uses one fixed serialization"""
+        import json
+        from datetime import datetime
+
+        logger = AuditLogger()
+        event_data = {"message": "ok", "details": {"at": datetime(2024, 1, 2, 3, 4, 5)}}
+        expected = hashlib.sha256(json.dumps(event_data, sort_keys=True, default=str).encode()).hexdigest()
+
+        for has_orjson in (True, False):
+            with patch('app.utils.serialization.HAS_ORJSON', has_orjson):
+                assert logger._calculate_integrity_hash(event_data) == expected
+
 
 @pytest.mark.security
 class TestSecurityHeaders:
@@ -802,6 +1116,42 @@ class TestSecurityHeaders:
         # For now, we'll just verify the middleware logic
         pass
 
+    def test_middleware_replaces_application_headers(self):
+        """Test headers set by the application are replaced, not duplicated"""
+        from fastapi import FastAPI
+        from fastapi.responses import PlainTextResponse
+        from fastapi.testclient import TestClient
+
+        app = FastAPI()
+        app.add_middleware(SecurityHeadersMiddleware)
+
+        @app.get("/api/v1/item")
+        def item():
+            return PlainTextResponse("ok", headers={"X-Frame-Options": "SAMEORIGIN", "X-Powered-By": "test"})
+
+        with patch("app.security.headers.settings.security_headers_enabled", True):
+            response = TestClient(app, base_url="https://testserver").get("/api/v1/item")
+
+        assert response.headers.get_list("x-frame-options") == ["DENY"]
+        assert "x-powered-by" not in response.headers
+        assert response.headers["strict-transport-security"].startswith("max-age=31536000")
+        assert response.headers["content-security-policy"].startswith("default-src 'none'")
+        assert response.text == "ok"
+
+    def test_add_security_headers_to_response(self):
+        """Test the basic security headers are added to a single response"""
+        from fastapi.responses import PlainTextResponse
+
+        from app.security.headers import add_security_headers
+
+        response = PlainTextResponse("ok", headers={"X-Frame-Options": "SAMEORIGIN"})
+        with patch("app.security.headers.settings.security_headers_enabled", True):
+            add_security_headers(response)
+
+        assert response.headers.getlist("x-frame-options") == ["DENY"]
+        assert response.headers["x-content-type-options"] == "nosniff"
+        assert "frame-ancestors 'none'" in response.headers["content-security-policy"]
+
     def test_csp_header_content(self, client):
         """Test Content Security Policy header content"""
         response = client.get("/")
@@ -1,7 +1,9 @@
 """
 Unit tests for scraper classes
 """
+import json
 import time
+from collections import OrderedDict
 from datetime import datetime
 from unittest.mock import Mock, AsyncMock, patch
 
@@ -69,6 +71,22 @@ class TestScraperResult:
         assert result_dict["metadata"] == {"test": "value"}
         assert "timestamp" in result_dict
 
+    def test_scraper_result_to_json(self):
+        """Test ScraperResult JSON serialization"""
+        result = ScraperResult(
+            status_code=200,
+            content=b"test",
+            headers={"type": "html"},
+            response_time=1000.0
+        )
+
+        data = json.loads(result.to_json())
+
+        assert data["content"] == "test"
+        assert data["timestamp"] == result.timestamp.isoformat()
+        assert result.timestamp_iso is result.timestamp_iso
+        assert "metadata" not in data
+
 
 class TestBaseScraper:
     """Test BaseScraper abstract class"""
@@ -99,12 +117,34 @@ class TestBaseScraper:
                 pass
 
         scraper = TestScraper()
-        start_time = time.time() - 1.5  # 1.5 seconds ago
-        response_time = scraper._measure_time(start_time)
+        start_ns = time.monotonic_ns() - 1_500_000_000  # 1.5 seconds ago
+        response_time = scraper._measure_time(start_ns)
 
         # Should be approximately 1500ms
         assert 1400 <= response_time <= 1600
 
+    @patch.object(BaseScraper, '_response_cache', OrderedDict())
+    @patch.object(BaseScraper, '_response_cache_bytes', 0)
+    @patch.object(BaseScraper, '_response_cache_max_bytes', 100)
+    def test_response_cache_is_bounded_by_body_size(self):
+        """Test that cached responses are evicted once their bodies exceed the byte budget"""
+
+        class TestScraper(BaseScraper):
+            async def scrape(self, url, method="GET", headers=None, data=None, params=None):
+                return ScraperResult(200, "test", {}, 1000.0)
+
+            async def close(self):
+                pass
+
+        scraper = TestScraper()
+        headers = {"ETag": '"v1"'}
+        for name in ("a", "b", "c"):
+            scraper._cache_response(name, headers, ScraperResult(200, b"x" * 40, {}, 1.0))
+        scraper._cache_response("large", headers, ScraperResult(200, b"x" * 101, {}, 1.0))
+
+        assert list(BaseScraper._response_cache) == ["b", "c"]
+        assert BaseScraper._response_cache_bytes == 80
+
     def test_handle_error(self):
         """Test _handle_error method"""
 
@@ -126,6 +166,124 @@ class TestBaseScraper:
         assert "Test error" in result.error
         assert "https://example.com" in result.error
 
+    async def test_identical_requests_are_coalesced(self):
+        """Test that concurrent identical GETs share one upstream request"""
+        import asyncio
+
+        calls = []
+        release = asyncio.Event()
+
+        class TestScraper(BaseScraper):
+            async def scrape(self, url, method="GET", headers=None, data=None, params=None):
+                return await self._run_scrape(url, method, headers, data, params, self._fetch)
+
+            async def _fetch(self):
+                calls.append(1)
+                await release.wait()
+                return ScraperResult(200, "shared", {}, 1.0)
+
+            async def close(self):
+                pass
+
+        scraper = TestScraper()
+        first = asyncio.create_task(scraper.scrape("https://example.com/coalesce"))
+        second = asyncio.create_task(TestScraper().scrape("https://example.com/coalesce"))
+        await asyncio.sleep(0)
+        release.set()
+
+        results = await asyncio.gather(first, second)
+
+        assert len(calls) == 1
+        assert results[0] is results[1]
+        assert not BaseScraper._inflight
+
+    async def test_cancelled_request_does_not_cancel_coalesced_requests(self):
+        """Test that cancelling one of the requests sharing a fetch leaves the others running"""
+        import asyncio
+
+        calls = []
+        cancelled = []
+        release = asyncio.Event()
+
+        class TestScraper(BaseScraper):
+            async def scrape(self, url, method="GET", headers=None, data=None, params=None):
+                return await self._run_scrape(url, method, headers, data, params, self._fetch)
+
+            async def _fetch(self):
+                calls.append(1)
+                try:
+                    await release.wait()
+                except asyncio.CancelledError:
+                    cancelled.append(1)
+                    raise
+                return ScraperResult(200, "shared", {}, 1.0)
+
+            async def close(self):
+                pass
+
+        leader = asyncio.create_task(TestScraper().scrape("https://example.com/cancel"))
+        waiter = asyncio.create_task(TestScraper().scrape("https://example.com/cancel"))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        result = await waiter
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+        assert result.content == "shared"
+        assert len(calls) == 1
+        assert not cancelled
+
+        # The fetch is cancelled once no request waits for it anymore
+        release.clear()
+        only = asyncio.create_task(TestScraper().scrape("https://example.com/cancel"))
+        await asyncio.sleep(0)
+        only.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await only
+        await asyncio.sleep(0)
+
+        assert cancelled == [1]
+        assert not BaseScraper._inflight
+
+    async def test_requests_with_different_settings_are_not_coalesced(self):
+        """Test that scrapers configured differently do not share a result"""
+        import asyncio
+
+        release = asyncio.Event()
+
+        class TestScraper(BaseScraper):
+            _SETTINGS_ATTRS = ("timeout", "wait_for_selector")
+
+            def __init__(self, wait_for_selector=None):
+                super().__init__()
+                self.wait_for_selector = wait_for_selector
+
+            async def scrape(self, url, method="GET", headers=None, data=None, params=None):
+                return await self._run_scrape(url, method, headers, data, params, self._fetch)
+
+            async def _fetch(self):
+                await release.wait()
+                return ScraperResult(200, f"rendered {self.wait_for_selector}", {}, 1.0)
+
+            async def close(self):
+                pass
+
+        first = asyncio.create_task(TestScraper().scrape("https://example.com/settings"))
+        second = asyncio.create_task(TestScraper("#app").scrape("https://example.com/settings"))
+        await asyncio.sleep(0)
+        release.set()
+
+        results = await asyncio.gather(first, second)
+
+        assert results[0].content == "rendered None"
+        assert results[1].content == "rendered #app"
+        # The domain's semaphore is dropped once no scrape uses it
+        assert "example.com" not in BaseScraper._domain_semaphores
+        assert "example.com" not in BaseScraper._domain_users
+
 
 @pytest.mark.unit
 class TestCloudScraperScraper:
@@ -173,7 +331,8 @@ class TestCloudScraperScraper:
 
         mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.text = "<html>test content</html>"
+        mock_response.content = b"<html>test content</html>"
+        mock_response.encoding = "utf-8"
         mock_response.headers = {"content-type": "text/html"}
 
         # Mock proxy and user agent
@@ -187,8 +346,10 @@ class TestCloudScraperScraper:
 
         scraper = CloudScraperScraper()
 
-        # Mock the _make_request method to return our mock response
-        with patch.object(scraper, '_make_request', return_value=mock_response):
+        # Skip the async fast path and mock the _make_request method to return our mock response
+        mock_session.cookies = []
+        with patch.object(scraper, '_make_async_request', AsyncMock(return_value=None)), \
+                patch.object(scraper, '_make_request', return_value=mock_response):
             result = await scraper.scrape("https://example.com")
 
         assert result.status_code == 200
@@ -210,7 +371,8 @@ class TestCloudScraperScraper:
         scraper = CloudScraperScraper()
 
         # Mock the _make_request method to raise an exception
-        with patch.object(scraper, '_make_request', side_effect=Exception("Network error")):
+        with patch.object(scraper, '_make_async_request', AsyncMock(return_value=None)), \
+                patch.object(scraper, '_make_request', side_effect=Exception("Network error")):
             result = await scraper.scrape("https://example.com")
 
         assert result.status_code == 0
@@ -220,6 +382,196 @@ class TestCloudScraperScraper:
         assert "Network error" in result.error
         assert result.is_success() is False
 
+    @patch('app.scrapers.cloudscraper_scraper.HAS_CLOUDSCRAPER', True)
+    @patch('app.scrapers.cloudscraper_scraper.cloudscraper')
+    async def test_cloudscraper_async_fast_path(self, mock_cloudscraper):
+        """Test that unchallenged responses skip cloudscraper"""
+        import httpx
+        from app.scrapers.cloudscraper_scraper import CloudScraperScraper
+
+        mock_session = Mock()
+        mock_cloudscraper.create_scraper.return_value = mock_session
+
+        scraper = CloudScraperScraper(use_stealth_mode=False, use_user_agent_rotation=False)
+        fast_response = httpx.Response(200, text="<html>fast</html>")
+
+        with patch.object(scraper._async_client, 'send', AsyncMock(return_value=fast_response)), \
+                patch.object(scraper, '_make_request') as mock_make_request:
+            result = await scraper.scrape("https://example.com")
+
+        assert result.status_code == 200
+        assert result.content == "<html>fast</html>"
+        mock_make_request.assert_not_called()
+
+        await scraper.close()
+
+    @patch('app.scrapers.cloudscraper_scraper.HAS_CLOUDSCRAPER', True)
+    @patch('app.scrapers.cloudscraper_scraper.cloudscraper')
+    async def test_cloudscraper_challenge_falls_back(self, mock_cloudscraper):
+        """Test that a Cloudflare challenge page is retried through cloudscraper"""
+        import httpx
+        from app.scrapers.cloudscraper_scraper import CloudScraperScraper
+
+        mock_session = Mock()
+        mock_session.cookies = []
+        mock_cloudscraper.create_scraper.return_value = mock_session
+
+        scraper = CloudScraperScraper(use_stealth_mode=False, use_user_agent_rotation=False)
+        challenge = httpx.Response(200, text="<title>Just a moment...</title><script>window._cf_chl_opt={}</script>")
+
+        solved = Mock()
+        solved.status_code = 200
+        solved.content = b"<html>solved</html>"
+        solved.encoding = "utf-8"
+        solved.headers = {}
+
+        with patch.object(scraper._async_client, 'send', AsyncMock(return_value=challenge)), \
+                patch.object(scraper, '_make_request', return_value=solved) as mock_make_request:
+            result = await scraper.scrape("https://example.com/challenge")
+
+        assert result.content == "<html>solved</html>"
+        mock_make_request.assert_called_once()
+
+        await scraper.close()
+
+    @patch('app.scrapers.cloudscraper_scraper.HAS_CLOUDSCRAPER', True)
+    @patch('app.scrapers.cloudscraper_scraper.cloudscraper')
+    @patch('app.scrapers.cloudscraper_scraper._CLEARANCE_CACHE', OrderedDict())
+    async def test_cloudscraper_clearance_is_shared(self, mock_cloudscraper):
+        """Test that clearance solved by one scraper is reused by the next one"""
+        import httpx
+        from app.scrapers.cloudscraper_scraper import CloudScraperScraper
+
+        mock_session = Mock()
+        mock_session.cookies = [Mock(domain=".example.com", value="solved")]
+        mock_session.cookies[0].name = "cf_clearance"
+        mock_cloudscraper.create_scraper.return_value = mock_session
+
+        solved = Mock()
+        solved.status_code = 200
+        solved.content = b"<html>solved</html>"
+        solved.encoding = "utf-8"
+        solved.headers = {}
+
+        challenge = httpx.Response(503, text="<title>Just a moment...</title>")
+        first = CloudScraperScraper(use_stealth_mode=False, use_user_agent_rotation=False)
+        with patch.object(first._async_client, 'send', AsyncMock(return_value=challenge)), \
+                patch.object(first, '_make_request', return_value=solved):
+            await first.scrape("https://example.com/a", headers={"User-Agent": "solver-agent"})
+        await first.close()
+
+        second = CloudScraperScraper(use_stealth_mode=False, use_user_agent_rotation=False)
+        mock_send = AsyncMock(return_value=httpx.Response(200, text="<html>fast</html>"))
+        with patch.object(second._async_client, 'send', mock_send), \
+                patch.object(second, '_make_request') as mock_make_request:
+            result = await second.scrape(
+                "https://example.com/b", headers={"User-Agent": "other-agent", "Cookie": "session=abc"}
+            )
+        await second.close()
+
+        assert result.content == "<html>fast</html>"
+        mock_make_request.assert_not_called()
+        request = mock_send.call_args.args[0]
+        assert request.headers["Cookie"] == "session=abc; cf_clearance=solved"
+        assert request.headers["User-Agent"] == "solver-agent"
+
+    @patch('app.scrapers.cloudscraper_scraper.HAS_CLOUDSCRAPER', True)
+    @patch('app.scrapers.cloudscraper_scraper.cloudscraper')
+    @patch('app.scrapers.cloudscraper_scraper._CLEARANCE_CACHE', OrderedDict())
+    def test_cloudscraper_clearance_matches_cookie_domain(self, mock_cloudscraper):
+        """Test that clearance is only stored for hosts its cookie domain covers"""
+        from app.scrapers import cloudscraper_scraper
+        from app.scrapers.cloudscraper_scraper import CloudScraperScraper
+
+        mock_session = Mock()
+        mock_session.cookies = [Mock(domain=".example.com", value="solved")]
+        mock_session.cookies[0].name = "cf_clearance"
+        mock_cloudscraper.create_scraper.return_value = mock_session
+
+        scraper = CloudScraperScraper(use_stealth_mode=False, use_user_agent_rotation=False)
+        for domain in ("badexample.com", "example.com", "www.example.com:8443"):
+            scraper._store_clearance(domain, {"User-Agent": "solver-agent"})
+
+        assert list(cloudscraper_scraper._CLEARANCE_CACHE) == ["example.com", "www.example.com:8443"]
+
+    @patch('app.scrapers.cloudscraper_scraper.HAS_CLOUDSCRAPER', True)
+    @patch('app.scrapers.cloudscraper_scraper.cloudscraper')
+    async def test_cloudscraper_post_skips_async_fast_path(self, mock_cloudscraper):
+        """Test that requests with side effects are sent once, through cloudscraper"""
+        from app.scrapers.cloudscraper_scraper import CloudScraperScraper
+
+        mock_session = Mock()
+        mock_session.cookies = []
+        mock_cloudscraper.create_scraper.return_value = mock_session
+
+        scraper = CloudScraperScraper(use_stealth_mode=False, use_user_agent_rotation=False)
+
+        posted = Mock()
+        posted.status_code = 200
+        posted.content = b"<html>posted</html>"
+        posted.encoding = "utf-8"
+        posted.headers = {}
+
+        with patch.object(scraper._async_client, 'send', AsyncMock()) as mock_send, \
+                patch.object(scraper, '_make_request', return_value=posted) as mock_make_request:
+            result = await scraper.scrape("https://example.com/form", method="POST", data={"a": "1"})
+
+        assert result.content == "<html>posted</html>"
+        mock_send.assert_not_called()
+        mock_make_request.assert_called_once()
+
+        await scraper.close()
+
+    @patch('app.scrapers.cloudscraper_scraper.HAS_CLOUDSCRAPER', True)
+    @patch('app.scrapers.cloudscraper_scraper.cloudscraper')
+    async def test_cloudscraper_rejects_oversized_body(self, mock_cloudscraper):
+        """Test that responses larger than max_response_bytes are abandoned"""
+        import httpx
+        from app.scrapers.cloudscraper_scraper import CloudScraperScraper, settings
+
+        mock_cloudscraper.create_scraper.return_value = Mock()
+
+        scraper = CloudScraperScraper(use_stealth_mode=False, use_user_agent_rotation=False)
+        large_response = httpx.Response(200, content=b"x" * 100)
+
+        with patch.object(settings, 'max_response_bytes', 10), \
+                patch.object(scraper._async_client, 'send', AsyncMock(return_value=large_response)):
+            result = await scraper.scrape("https://example.com")
+
+        assert result.status_code == 0
+        assert "exceeds the 10 byte limit" in result.error
+
+        await scraper.close()
+
+    @patch('app.scrapers.cloudscraper_scraper.HAS_CLOUDSCRAPER', True)
+    @patch('app.scrapers.cloudscraper_scraper.cloudscraper')
+    @patch.object(BaseScraper, '_response_cache', OrderedDict())
+    async def test_cloudscraper_not_modified_uses_cache(self, mock_cloudscraper):
+        """Test that a 304 response returns the cached result"""
+        import httpx
+        from app.scrapers.cloudscraper_scraper import CloudScraperScraper
+
+        mock_cloudscraper.create_scraper.return_value = Mock()
+
+        scraper = CloudScraperScraper(use_stealth_mode=False, use_user_agent_rotation=False)
+        responses = [
+            httpx.Response(200, text="<html>cached</html>", headers={"ETag": '"v1"'}),
+            httpx.Response(304)
+        ]
+        mock_send = AsyncMock(side_effect=responses)
+
+        with patch.object(scraper._async_client, 'send', mock_send):
+            first = await scraper.scrape("https://example.com")
+            second = await scraper.scrape("https://example.com")
+
+        assert first.content == "<html>cached</html>"
+        assert second.status_code == 200
+        assert second.content == "<html>cached</html>"
+        assert second.metadata["not_modified"] is True
+        assert mock_send.call_args.args[0].headers["If-None-Match"] == '"v1"'
+
+        await scraper.close()
+
     @patch('app.scrapers.cloudscraper_scraper.HAS_CLOUDSCRAPER', True)
     @patch('app.scrapers.cloudscraper_scraper.cloudscraper')
     async def test_cloudscraper_close(self, mock_cloudscraper):
@@ -248,7 +600,6 @@ class TestSeleniumScraper:
 
         assert scraper.timeout == 60
         assert scraper.headless is False
-        assert scraper.driver is None
         assert scraper.use_proxy_rotation is True
         assert scraper.use_user_agent_rotation is True
         assert scraper.use_stealth_mode is True
@@ -322,17 +673,186 @@ class TestSeleniumScraper:
         assert result.is_success() is False
 
     @patch('app.scrapers.selenium_scraper.HAS_SELENIUM', True)
-    async def test_selenium_close(self):
-        """Test Selenium scraper close method"""
+    async def test_selenium_encodes_params(self):
+        """Test that query parameters are URL-encoded and appended to the URL"""
         from app.scrapers.selenium_scraper import SeleniumScraper
 
-        scraper = SeleniumScraper()
+        scraper = SeleniumScraper(use_stealth_mode=False, use_user_agent_rotation=False)
+
+        with patch.object(scraper, '_scrape_with_selenium', return_value="<html></html>") as mock_scrape:
+            await scraper.scrape("https://example.com/search?page=1", params={"q": "a b&c"})
+
+        assert mock_scrape.call_args.args[0] == "https://example.com/search?page=1&q=a+b%26c"
+
+    @patch('app.scrapers.selenium_scraper.HAS_SELENIUM', True)
+    def test_selenium_reuses_pooled_driver(self):
+        """Test that drivers are returned to the pool and reused"""
+        from app.scrapers.driver_pool import DriverPool
+        from app.scrapers.selenium_scraper import SeleniumScraper
+
+        scraper = SeleniumScraper(use_stealth_mode=False)
         mock_driver = Mock()
-        scraper.driver = mock_driver
+        mock_driver.execute_cdp_cmd.return_value = {"result": {"value": "<html>pooled</html>"}}
+        pool = DriverPool(max_size=1)
 
-        await scraper.close()
+        with patch('app.scrapers.selenium_scraper.get_driver_pool', return_value=pool), \
+                patch.object(scraper, '_create_driver', return_value=mock_driver) as mock_create:
+            assert scraper._scrape_with_selenium("https://example.com") == "<html>pooled</html>"
+            assert scraper._scrape_with_selenium("https://example.com/next") == "<html>pooled</html>"
 
+        mock_create.assert_called_once()
+        assert mock_driver.delete_all_cookies.call_count == 2
+        assert pool.size == 1
+
+        pool.shutdown()
         mock_driver.quit.assert_called_once()
+        assert pool.size == 0
+
+    def test_selenium_applies_stealth_once_per_driver(self):
+        """Test that stealth features are applied only on the first lease of a driver"""
+        from app.scrapers.driver_pool import DriverPool
+        from app.scrapers.selenium_scraper import SeleniumScraper
+
+        scraper = SeleniumScraper(use_stealth_mode=True)
+        mock_driver = Mock()
+        mock_driver.execute_cdp_cmd.return_value = {"result": {"value": "<html></html>"}}
+        pool = DriverPool(max_size=1)
+
+        with patch('app.scrapers.selenium_scraper.get_driver_pool', return_value=pool), \
+                patch.object(scraper, '_create_driver', return_value=mock_driver), \
+                patch.object(scraper, '_apply_stealth_features') as mock_stealth:
+            scraper._scrape_with_selenium("https://example.com")
+            scraper._scrape_with_selenium("https://example.com/next")
+
+        mock_stealth.assert_called_once_with(mock_driver, None)
+        pool.shutdown()
+
+    def test_selenium_resets_user_agent_between_leases(self):
+        """Test that a lease without a user agent clears the previous lease's override"""
+        from app.scrapers.driver_pool import DriverPool
+        from app.scrapers.selenium_scraper import SeleniumScraper
+
+        scraper = SeleniumScraper(use_stealth_mode=False)
+        mock_driver = Mock()
+        mock_driver.execute_cdp_cmd.return_value = {"result": {"value": "<html></html>"}}
+        pool = DriverPool(max_size=1)
+
+        with patch('app.scrapers.selenium_scraper.get_driver_pool', return_value=pool), \
+                patch.object(scraper, '_create_driver', return_value=mock_driver):
+            scraper._scrape_with_selenium("https://example.com", user_agent="Custom/1.0")
+            scraper._scrape_with_selenium("https://example.com/next")
+
+        overrides = [
+            c.args[1]["userAgent"] for c in mock_driver.execute_cdp_cmd.call_args_list
+            if c.args[0] == "Network.setUserAgentOverride"
+        ]
+        assert overrides == ["Custom/1.0", ""]
+        pool.shutdown()
+
+    def test_selenium_pool_key_includes_stealth_mode(self):
+        """Test that stealth and non-stealth scrapers do not share pooled drivers"""
+        from app.scrapers.driver_pool import DriverPool
+        from app.scrapers.selenium_scraper import SeleniumScraper
+
+        stealth_driver, plain_driver = Mock(), Mock()
+        for driver in (stealth_driver, plain_driver):
+            driver.execute_cdp_cmd.return_value = {"result": {"value": "<html></html>"}}
+        pool = DriverPool(max_size=2)
+        stealth_scraper = SeleniumScraper(use_stealth_mode=True)
+        plain_scraper = SeleniumScraper(use_stealth_mode=False)
+
+        with patch('app.scrapers.selenium_scraper.get_driver_pool', return_value=pool), \
+                patch.object(stealth_scraper, '_create_driver', return_value=stealth_driver), \
+                patch.object(stealth_scraper, '_apply_stealth_features'), \
+                patch.object(plain_scraper, '_create_driver', return_value=plain_driver):
+            stealth_scraper._scrape_with_selenium("https://example.com")
+            plain_scraper._scrape_with_selenium("https://example.com")
+
+        stealth_driver.get.assert_called_once_with("https://example.com")
+        plain_driver.get.assert_called_once_with("https://example.com")
+        pool.shutdown()
+
+    def test_selenium_stealth_scripts_injected_in_one_call(self):
+        """Test that stealth scripts are registered with a single CDP command"""
+        from app.scrapers.selenium_scraper import SeleniumScraper
+
+        scraper = SeleniumScraper()
+        mock_driver = Mock()
+
+        scraper._apply_stealth_features(mock_driver)
+
+        mock_driver.execute_cdp_cmd.assert_called_once()
+        command, payload = mock_driver.execute_cdp_cmd.call_args.args
+        assert command == "Page.addScriptToEvaluateOnNewDocument"
+        assert "navigator, 'webdriver'" in payload["source"]
+        mock_driver.execute_script.assert_not_called()
+
+    def test_driver_pool_evicts_least_recently_used(self):
+        """Test that a full pool quits the least recently released idle driver"""
+        from app.scrapers.driver_pool import DriverPool
+
+        pool = DriverPool(max_size=2)
+        first, second, third = Mock(), Mock(), Mock()
+
+        pool.release("a", pool.acquire("a", lambda: first))
+        pool.release("b", pool.acquire("b", lambda: second))
+        pool.release("a", pool.acquire("a", lambda: Mock()))
+
+        assert pool.acquire("c", lambda: third) is third
+        second.quit.assert_called_once()
+        first.quit.assert_not_called()
+        assert pool.size == 2
+
+
+@pytest.mark.unit
+class TestPlaywrightScraper:
+    """Test PlaywrightScraper class"""
+
+    @patch('app.scrapers.playwright_scraper.HAS_PLAYWRIGHT', False)
+    def test_playwright_missing_dependency(self):
+        """Test PlaywrightScraper with missing dependency"""
+        from app.scrapers.playwright_scraper import PlaywrightScraper
+
+        with pytest.raises(ImportError, match="playwright is not installed"):
+            PlaywrightScraper()
+
+    @patch('app.scrapers.playwright_scraper.HAS_PLAYWRIGHT', True)
+    async def test_playwright_successful_scrape(self):
+        """Test a scrape in a fresh browser context"""
+        from app.scrapers.playwright_scraper import PlaywrightScraper
+
+        scraper = PlaywrightScraper(use_stealth_mode=False, use_user_agent_rotation=False)
+
+        mock_response = Mock()
+        mock_response.status = 200
+        mock_response.all_headers = AsyncMock(return_value={"content-type": "text/html"})
+        mock_page = Mock()
+        mock_page.goto = AsyncMock(return_value=mock_response)
+        mock_page.content = AsyncMock(return_value="<html>rendered</html>")
+        mock_context = Mock()
+        mock_context.new_page = AsyncMock(return_value=mock_page)
+        mock_context.close = AsyncMock()
+        mock_browser = Mock()
+        mock_browser.new_context = AsyncMock(return_value=mock_context)
+
+        with patch('app.scrapers.playwright_scraper.get_browser', AsyncMock(return_value=mock_browser)):
+            result = await scraper.scrape("https://example.com/page", params={"q": "a b"})
+
+        assert result.status_code == 200
+        assert result.content == "<html>rendered</html>"
+        assert result.headers == {"content-type": "text/html"}
+        assert mock_page.goto.call_args.args[0] == "https://example.com/page?q=a+b"
+        mock_context.close.assert_awaited_once()
+
+    @patch('app.scrapers.playwright_scraper.HAS_PLAYWRIGHT', True)
+    async def test_playwright_rejects_post(self):
+        """Test that only GET requests are supported"""
+        from app.scrapers.playwright_scraper import PlaywrightScraper
+
+        scraper = PlaywrightScraper()
+
+        with pytest.raises(ValueError, match="only supports GET"):
+            await scraper.scrape("https://example.com", method="POST")
 
 
 @pytest.mark.unit
@@ -390,6 +910,12 @@ class TestScraperFactory:
         with pytest.raises(ValueError, match="Selenium is not available"):
             ScraperFactory.create_scraper(ScraperType.SELENIUM)
 
+    @patch('app.scrapers.factory.HAS_PLAYWRIGHT', False)
+    def test_create_unavailable_playwright(self):
+        """Test creating Playwright scraper when not available"""
+        with pytest.raises(ValueError, match="Playwright is not available"):
+            ScraperFactory.create_scraper(ScraperType.PLAYWRIGHT)
+
     def test_register_custom_scraper(self):
         """Test registering a custom scraper"""
 